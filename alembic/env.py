@@ -7,7 +7,7 @@ import sys
 # Add the project root to the sys.path
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from app.db import sync_engine
+from app.db import get_sync_engine
 from app.config import get_settings
 from app.models import *
 
@@ -53,7 +53,7 @@ def run_migrations_offline() -> None:
 def run_migrations_online() -> None:
     """Run migrations in 'online' mode."""
     logger.info("Running migrations in 'online' mode")
-    with sync_engine.connect() as connection:
+    with get_sync_engine().connect() as connection:
         context.configure(
             connection=connection, 
             target_metadata=target_metadata,
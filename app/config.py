@@ -1,5 +1,6 @@
 from functools import lru_cache
 from enum import Enum
+from typing import Dict, List, Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Environment(str, Enum):
@@ -18,6 +19,79 @@ class Settings(BaseSettings):
     sync_database_url: str
     secret_key: str
 
+    # Connection pool per engine (primary and each replica), per worker process
+    db_pool_size: int = 20
+    # Extra connections opened under load beyond db_pool_size, closed again when returned
+    db_max_overflow: int = 10
+    # How long a checkout waits for a free connection before failing
+    db_pool_timeout_seconds: float = 30.0
+    # Connections older than this are replaced on checkout
+    db_pool_recycle_seconds: int = 1800
+    # Test each connection with a round trip on checkout
+    db_pool_pre_ping: bool = False
+
+    # Read replicas used by get_read_session; empty sends every read to the primary
+    read_replica_urls: List[str] = []
+    read_replica_strategy: Literal["round_robin", "least_latency"] = "round_robin"
+    # Replicas are probed this often for round-trip latency and replication lag
+    read_replica_probe_interval_seconds: float = 5.0
+    # A replica further behind than this is skipped until it catches up
+    read_replica_max_lag_seconds: float = 10.0
+    # After a write, the same principal's reads stay on the primary for this long (a cookie for anonymous clients)
+    read_your_writes_seconds: float = 5.0
+
+    # How long a worker trusts its cached copy before re-reading the version row
+    cache_version_check_seconds: float = 1.0
+
+    # Cache-Control for catalog reads, by route ("product", "products", "categories"); others get "no-cache"
+    cache_control: Dict[str, str] = {
+        "product": "public, max-age=60",
+        "products": "public, max-age=30",
+        "categories": "public, max-age=300",
+    }
+
+    # Serialized products kept per worker for GET /products/{id}
+    product_cache_size: int = 10_000
+    # Longest a cached product is kept; entries are keyed by ETag, so this only bounds memory held by unused ones
+    product_cache_ttl_seconds: float = 30.0
+    # Also share serialized products between workers through an unlogged Postgres table
+    product_cache_shared: bool = False
+
+    # Resolved users (id, active flag, roles, permissions) kept between requests
+    principal_cache_ttl_seconds: float = 30.0
+    principal_cache_size: int = 10_000
+
+    # bcrypt work factor; hashes with a different cost are upgraded on login
+    bcrypt_rounds: int = 12
+    # bcrypt runs off the event loop on this many threads (or processes)
+    password_hash_workers: int = 4
+    password_hash_executor: Literal["thread", "process"] = "thread"
+    # Hash/verify calls allowed to wait for a worker before shedding load with 503
+    password_hash_max_waiting: int = 64
+
+    # Rate limits are written "<requests>/<second|minute|hour>"; a caller may burst the whole amount at once
+    rate_limit_enabled: bool = True
+    # "local" keeps buckets per worker; "database" shares them across workers through Postgres
+    rate_limit_backend: Literal["local", "database"] = "local"
+    # Login attempts per client IP, and per account from any IP
+    rate_limit_login_per_ip: str = "20/minute"
+    rate_limit_login_per_account: str = "5/minute"
+    # Catalog requests per caller (bearer token, or client IP when anonymous)
+    rate_limit_catalog: str = "600/minute"
+
+    # How long a cart holds reserved stock without activity
+    reservation_ttl_seconds: int = 900
+    # Expired reservations are released in batches of this size every interval
+    reservation_sweep_interval_seconds: float = 5.0
+    reservation_sweep_batch_size: int = 500
+
+    # Sales rollups are brought up to date this often
+    analytics_rollup_interval_seconds: float = 60.0
+    # Changes younger than this are left for the next run, so transactions still in flight are not skipped
+    analytics_rollup_lag_seconds: float = 30.0
+    # Hourly buckets recomputed per statement
+    analytics_rollup_batch_buckets: int = 200
+
 
 @lru_cache()
 def get_settings() -> Settings:
@@ -1,49 +1,414 @@
+import asyncio
+import bisect
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+from functools import lru_cache
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
-from sqlalchemy.exc import SQLAlchemyError
-from sqlmodel import SQLModel, create_engine
+from sqlalchemy import Engine, delete, event, func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlmodel import Session, SQLModel, create_engine
 from app.logging_config.logger import logger
-from fastapi import HTTPException, status
-from typing import AsyncGenerator
+from fastapi import HTTPException, Request, status
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, List, Optional
 
 from app.config import get_settings
+from app.models.read_your_writes import RecentWrite
 
 settings = get_settings()
 
-async_engine = create_async_engine(
-    settings.database_url,
-    echo=False,
-    pool_size=20,
-    max_overflow=10,
-    pool_timeout=30,
-    pool_recycle=1800
-)
+
+class PoolMetrics:
+    """Checkout waits and connection churn for one engine's pool.
+
+    Waits cover the whole checkout: queueing for a free connection, opening
+    a new one under overflow, and the pre-ping when enabled.
+    """
+
+    # Upper bounds, in milliseconds, of the checkout wait histogram buckets
+    WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+    def __init__(self):
+        self.wait_counts = [0] * (len(self.WAIT_BUCKETS_MS) + 1)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+        self.connects = 0
+        self.invalidations = 0
+
+    def observe_wait(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.wait_seconds_total += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+        self.wait_counts[bisect.bisect_left(self.WAIT_BUCKETS_MS, seconds * 1000)] += 1
+
+    def stats(self, pool: "InstrumentedPool") -> Dict[str, Any]:
+        capacity = pool.size() + pool._max_overflow
+        checked_out = pool.checkedout()
+        histogram, cumulative = {}, 0
+        for bound, count in zip((*map(str, self.WAIT_BUCKETS_MS), "+Inf"), self.wait_counts):
+            cumulative += count
+            histogram[bound] = cumulative
+        return {
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": checked_out,
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "saturation": checked_out / capacity if capacity else 0.0,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "avg_wait_ms": 1000 * self.wait_seconds_total / self.checkouts if self.checkouts else 0.0,
+            "max_wait_ms": 1000 * self.max_wait_seconds,
+            # Cumulative: checkouts that waited at most this many milliseconds
+            "wait_histogram_ms": histogram,
+        }
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that times every checkout into its PoolMetrics"""
+
+    metrics: PoolMetrics
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        self.metrics.observe_wait(time.perf_counter() - start)
+        return connection
+
+    def recreate(self) -> "InstrumentedPool":
+        # Engine.dispose() swaps in a fresh pool; the counters carry over
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def create_pooled_engine(url: str) -> AsyncEngine:
+    engine = create_async_engine(
+        url,
+        echo=False,
+        poolclass=InstrumentedPool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_recycle=settings.db_pool_recycle_seconds,
+        pool_pre_ping=settings.db_pool_pre_ping
+    )
+    metrics = engine.sync_engine.pool.metrics = PoolMetrics()
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _count_connect(dbapi_connection, connection_record) -> None:
+        metrics.connects += 1
+
+    @event.listens_for(engine.sync_engine, "invalidate")
+    def _count_invalidate(dbapi_connection, connection_record, exception) -> None:
+        metrics.invalidations += 1
+
+    return engine
+
+async_engine = create_pooled_engine(settings.database_url)
+
+read_engines: List[AsyncEngine] = [create_pooled_engine(url) for url in settings.read_replica_urls]
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Live occupancy and checkout metrics of this worker's pools, by engine"""
+    engines = {"primary": async_engine}
+    engines.update((f"replica_{i}", engine) for i, engine in enumerate(read_engines, 1))
+    return {name: engine.sync_engine.pool.metrics.stats(engine.sync_engine.pool) for name, engine in engines.items()}
+
+
+class WriteTrackingSession(Session):
+    """Notes whether the transaction wrote anything, so committing it can pin the client's reads to the primary"""
+
+# Session.info key holding the request state a commit records its time in
+READ_YOUR_WRITES_KEY = "read_your_writes_state"
+# Request state key: wall-clock time of the request's last commit that wrote something
+COMMITTED_AT_KEY = "committed_at"
+# Cookie carrying that time back to anonymous clients, so whichever worker serves them next knows they wrote
+READ_YOUR_WRITES_COOKIE = "read_your_writes"
+
+# Set per request: the client's cookie says it wrote less than read_your_writes_seconds ago
+pinned_to_primary: ContextVar[bool] = ContextVar("pinned_to_primary", default=False)
+# Set per request: the authenticated principal, whose recent writes are looked up when a read session opens
+read_principal: ContextVar[Optional[str]] = ContextVar("read_principal", default=None)
+
+@event.listens_for(WriteTrackingSession, "do_orm_execute")
+def _note_dml(orm_execute_state) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+@event.listens_for(WriteTrackingSession, "after_flush")
+def _note_flush(session, flush_context) -> None:
+    session.info["wrote"] = True
+
+@event.listens_for(WriteTrackingSession, "after_commit")
+def _remember_write(session) -> None:
+    state = session.info.get(READ_YOUR_WRITES_KEY)
+    if session.info.pop("wrote", False) and state is not None:
+        state[COMMITTED_AT_KEY] = time.time()
+
+@event.listens_for(WriteTrackingSession, "after_rollback")
+def _forget_writes(session) -> None:
+    session.info.pop("wrote", None)
+
 
 AsyncSessionLocal = async_sessionmaker(
     bind=async_engine,
     expire_on_commit=False,
-    class_=AsyncSession
+    class_=AsyncSession,
+    sync_session_class=WriteTrackingSession
 )
-async def get_session() -> AsyncGenerator[AsyncSession, None]:
-    async with AsyncSessionLocal() as session:
+
+
+class ReplicaRouter:
+    """Picks a read replica per session, skipping replicas that are down or lagging.
+
+    A background task probes every replica each `probe_interval` seconds for
+    its round-trip time (smoothed) and replication lag. `least_latency`
+    always picks the fastest healthy replica; `round_robin` rotates through
+    the healthy ones.
+    """
+
+    # Weight of the newest probe in the smoothed latency
+    LATENCY_SMOOTHING = 0.3
+
+    def __init__(self, engines: List[AsyncEngine], strategy: str, probe_interval: float, max_lag: float):
+        self.engines = engines
+        self.strategy = strategy
+        self.probe_interval = probe_interval
+        self.max_lag = max_lag
+        # Healthy until a probe says otherwise, so reads use replicas from the start
+        self._healthy: List[AsyncEngine] = list(engines)
+        self._latency: Dict[AsyncEngine, float] = {}
+        self._counter = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+    def pick(self) -> Optional[AsyncEngine]:
+        """A replica to read from, or None to use the primary"""
+        healthy = self._healthy
+        if not healthy:
+            return None
+        if self.strategy == "least_latency":
+            return min(healthy, key=lambda engine: self._latency.get(engine, 0.0))
+        return healthy[next(self._counter) % len(healthy)]
+
+    async def probe(self) -> None:
+        results = await asyncio.gather(*(self._probe(engine) for engine in self.engines))
+        self._healthy = [engine for engine, healthy in zip(self.engines, results) if healthy]
+
+    async def _probe(self, engine: AsyncEngine) -> bool:
+        # Replay lag only counts while WAL is waiting to be applied; an idle primary leaves replicas fully caught up
+        lag = func.coalesce(
+            literal_column(
+                "CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+                " ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp()) END"
+            ),
+            0
+        )
+        start = time.perf_counter()
+        try:
+            async with engine.connect() as conn:
+                result = await conn.execute(select(lag))
+                replica_lag = float(result.scalar_one())
+        except Exception as e:
+            logger.warning(f"Read replica {engine.url.host} failed its probe: {e}")
+            return False
+
+        elapsed = time.perf_counter() - start
+        previous = self._latency.get(engine)
+        self._latency[engine] = elapsed if previous is None else previous + self.LATENCY_SMOOTHING * (elapsed - previous)
+        if replica_lag > self.max_lag:
+            logger.warning(f"Read replica {engine.url.host} is {replica_lag:.1f}s behind; skipping it")
+            return False
+        return True
+
+    def start(self) -> None:
+        if self.engines and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="replica-probe")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.probe()
+            except Exception as e:
+                logger.exception(f"Read replica probe failed: {e}")
+            await asyncio.sleep(self.probe_interval)
+
+
+replica_router = ReplicaRouter(
+    read_engines,
+    settings.read_replica_strategy,
+    settings.read_replica_probe_interval_seconds,
+    settings.read_replica_max_lag_seconds
+)
+
+class RecentWrites:
+    """When each principal last wrote, in the recent_write table on the primary, shared by every worker"""
+
+    # Rows older than the window are deleted at most this often
+    PRUNE_INTERVAL_SECONDS = 300.0
+
+    def __init__(self, window: float):
+        self.window = window
+        self._pruned_at = time.monotonic()
+
+    async def record(self, principal: str) -> None:
+        """Note that `principal` just committed a write; failures are logged, not raised"""
+        table = RecentWrite.__table__
+        statement = insert(table).values(principal=principal, written_at=func.now()).on_conflict_do_update(
+            index_elements=[table.c.principal], set_={"written_at": func.now()}
+        )
         try:
-            yield session
+            async with async_engine.begin() as conn:
+                await conn.execute(statement)
+                if time.monotonic() - self._pruned_at > self.PRUNE_INTERVAL_SECONDS:
+                    self._pruned_at = time.monotonic()
+                    await conn.execute(delete(table).where(table.c.written_at < func.now() - timedelta(seconds=self.window)))
         except SQLAlchemyError as e:
-            await session.rollback() 
-            logger.exception(f"Database connection failed: {str(e)}")
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="Database connection failed."
-            )
+            logger.warning(f"Could not record a write for read-your-writes: {e}")
+
+    async def wrote_recently(self, principal: str) -> bool:
+        """Whether `principal` wrote within the window; true when the table can't be read, as the primary is always safe"""
+        table = RecentWrite.__table__
+        try:
+            async with async_engine.connect() as conn:
+                result = await conn.execute(select(literal_column("1")).where(
+                    table.c.principal == principal,
+                    table.c.written_at > func.now() - timedelta(seconds=self.window)
+                ))
+                return result.first() is not None
+        except SQLAlchemyError as e:
+            logger.warning(f"Could not look up recent writes; reading from the primary: {e}")
+            return True
+
+
+recent_writes = RecentWrites(settings.read_your_writes_seconds)
+
+async def _read_engine() -> Optional[AsyncEngine]:
+    """The replica to read from, or None for the primary"""
+    if pinned_to_primary.get():
+        return None
+    engine = replica_router.pick()
+    principal = read_principal.get()
+    # Only asked when a replica would otherwise serve the read
+    if engine is not None and principal is not None and await recent_writes.wrote_recently(principal):
+        return None
+    return engine
+
+@asynccontextmanager
+async def open_read_session() -> AsyncIterator[AsyncSession]:
+    """A session on a read replica, or on the primary when none is usable or the client wrote recently"""
+    engine = await _read_engine()
+    async with (AsyncSessionLocal(bind=engine) if engine is not None else AsyncSessionLocal()) as session:
+        yield session
+
+async def get_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as session, _guarded(session):
+        session.info[READ_YOUR_WRITES_KEY] = request.scope.setdefault("state", {})
+        yield session
+
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    """Session for read-only handlers; may trail the primary by up to read_replica_max_lag_seconds"""
+    async with open_read_session() as session, _guarded(session):
+        yield session
+
+
+class ReadYourWritesMiddleware:
+    """Keeps a principal's reads on the primary for read_your_writes_seconds after they write, on any worker.
+
+    `principal_of` names the authenticated caller, if any. Their commits are
+    recorded in RecentWrites before the response starts, and their read
+    sessions, streamed exports included, check it before using a replica.
+    Anonymous callers get a cookie with the commit time instead, and
+    requests that bring back a recent one are pinned to the primary.
+    """
+
+    def __init__(self, app: ASGIApp, principal_of: Callable[[HTTPConnection], Optional[str]] = lambda connection: None):
+        self.app = app
+        self.principal_of = principal_of
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not read_engines:
+            await self.app(scope, receive, send)
+            return
+
+        connection = HTTPConnection(scope)
+        principal = self.principal_of(connection)
+        try:
+            wrote_at = float(connection.cookies.get(READ_YOUR_WRITES_COOKIE, 0))
+        except ValueError:
+            wrote_at = 0.0
+        state = scope.setdefault("state", {})
+
+        async def send_after_write(message: Message) -> None:
+            committed_at = state.get(COMMITTED_AT_KEY)
+            if message["type"] == "http.response.start" and committed_at is not None:
+                if principal is not None:
+                    await recent_writes.record(principal)
+                else:
+                    cookie = (
+                        f"{READ_YOUR_WRITES_COOKIE}={committed_at:.3f}; Max-Age={math.ceil(settings.read_your_writes_seconds)}; "
+                        "Path=/; HttpOnly; SameSite=lax"
+                    )
+                    message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        pinned = pinned_to_primary.set(time.time() - wrote_at < settings.read_your_writes_seconds)
+        caller = read_principal.set(principal)
+        try:
+            await self.app(scope, receive, send_after_write)
         finally:
-            await session.close()
+            read_principal.reset(caller)
+            pinned_to_primary.reset(pinned)
+
+@asynccontextmanager
+async def _guarded(session: AsyncSession) -> AsyncIterator[None]:
+    try:
+        yield
+    except SQLAlchemyError as e:
+        await session.rollback()
+        logger.exception(f"Database connection failed: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database connection failed."
+        )
+    finally:
+        await session.close()
 
     
-sync_engine = create_engine(
-    settings.sync_database_url,
-    echo=False
-)
+@lru_cache
+def get_sync_engine() -> Engine:
+    """Blocking engine for migrations; created on first use so the app never opens it"""
+    return create_engine(settings.sync_database_url, echo=False)
 
 async def create_db_and_tables():
     async with async_engine.begin() as conn:
-        await conn.run_sync(SQLModel.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+async def drop_db_and_tables():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.drop_all)
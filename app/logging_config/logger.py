@@ -1,5 +1,10 @@
+import atexit
 import json
 import os
+import queue
+import sys
+import threading
+from typing import TextIO
 from loguru import logger
 
 # Load config
@@ -7,6 +12,58 @@ CONFIG_PATH = os.path.join(os.path.dirname(__file__), "config.json")
 with open(CONFIG_PATH, "r") as f:
     config = json.load(f)
 
+class BatchedStreamSink:
+    """Loguru sink that hands messages to a background thread which writes them in batches.
+
+    Logging calls never block on the terminal: when the queue is full the
+    message is dropped and counted instead.
+    """
+
+    def __init__(self, stream: TextIO, max_batch: int = 256, max_queue: int = 10_000, flush_interval: float = 0.2):
+        self.stream = stream
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, message: str) -> None:
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=2)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stopping = batch[-1] is None
+            try:
+                self.stream.write("".join(message for message in batch if message is not None))
+                self.stream.flush()
+            except (OSError, ValueError):
+                # The stream was closed under us, e.g. at interpreter exit; nothing left to write to
+                return
+            if stopping:
+                return
+
+def _is_access_log(record) -> bool:
+    return record["extra"].get("access_log", False)
+
 # Ensure log directory exists
 os.makedirs(config["log_dir"], exist_ok=True)
 log_path = os.path.join(config["log_dir"], config["log_file"])
@@ -23,9 +80,22 @@ logger.add(
     colorize=True
 )
 
+console_sink = BatchedStreamSink(sys.stdout)
+atexit.register(console_sink.stop)
+
 logger.add(
-    lambda msg: print(msg, end=""), # Print to terminal
+    console_sink, # Print to terminal
     level=config["log_level"],
     format=config["format"],
+    filter=lambda record: not _is_access_log(record),
     colorize=True
-)
\ No newline at end of file
+)
+
+# Access records are already JSON; write them one per line without decoration
+logger.add(
+    console_sink,
+    level=config["log_level"],
+    format="{message}",
+    filter=_is_access_log,
+    colorize=False
+)
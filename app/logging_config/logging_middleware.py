@@ -1,20 +1,91 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
-from loguru import logger
+import json
+import random
+import re
 import time
+from typing import Mapping, Optional
+from uuid import uuid4
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from loguru import logger
+
+REQUEST_ID_HEADER = b"x-request-id"
+# Client supplied ids are echoed into logs and responses, so only accept safe ones
+VALID_REQUEST_ID = re.compile(r"[A-Za-z0-9._\-]{1,128}")
+
+class LoggingMiddleware:
+    """Pure ASGI access logging: one structured JSON record per sampled request.
+
+    Every response carries an X-Request-ID (the client's, when valid, or a new
+    one), also exposed to handlers as `request.state.request_id`. Requests are
+    sampled per path prefix (longest prefix wins); server errors and requests
+    slower than `slow_request_ms` are always logged.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        sample_rates: Optional[Mapping[str, float]] = None,
+        default_sample_rate: float = 1.0,
+        slow_request_ms: float = 1000.0
+    ):
+        self.app = app
+        self.default_sample_rate = default_sample_rate
+        self.slow_request_ns = int(slow_request_ms * 1_000_000)
+        self.sample_rates = sorted((sample_rates or {}).items(), key=lambda item: len(item[0]), reverse=True)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter_ns()
+        request_id = self._request_id(scope)
+        scope.setdefault("state", {})["request_id"] = request_id
+        status_code = 500
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        request_id = request.headers.get("X-Request-ID", "N/A")
-        client_ip = request.client.host
-        logger.info(f"Incoming request: {request.method} {request.url} | Request ID: {request_id} | Client IP: {client_ip}")
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER, request_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
 
-        start_time = time.time()
-        response = await call_next(request)
-        process_time = time.time() - start_time
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            elapsed_ns = time.perf_counter_ns() - start
+            if self._should_log(scope["path"], status_code, elapsed_ns):
+                client = scope.get("client")
+                record = {
+                    "request_id": request_id,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    "duration_ms": round(elapsed_ns / 1_000_000, 3),
+                    "client_ip": client[0] if client else None,
+                }
+                logger.bind(access_log=True).log(
+                    "ERROR" if status_code >= 500 else "INFO",
+                    json.dumps(record, separators=(",", ":"))
+                )
 
-        logger.info(f"Response: {response.status_code} | Process Time: {process_time:.2f}s")
+    @staticmethod
+    def _request_id(scope: Scope) -> str:
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                candidate = value.decode("latin-1")
+                if VALID_REQUEST_ID.fullmatch(candidate):
+                    return candidate
+                break
+        return uuid4().hex
 
-        return response
-        
\ No newline at end of file
+    def _should_log(self, path: str, status_code: int, elapsed_ns: int) -> bool:
+        if status_code >= 500 or elapsed_ns >= self.slow_request_ns:
+            return True
+        rate = self.default_sample_rate
+        for prefix, prefix_rate in self.sample_rates:
+            if path.startswith(prefix):
+                rate = prefix_rate
+                break
+        return rate >= 1.0 or random.random() < rate
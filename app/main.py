@@ -4,14 +4,27 @@ from fastapi.responses import JSONResponse
 from starlette.exceptions import HTTPException
 import traceback
 
-from app.db import async_engine, sync_engine, create_db_and_tables, drop_db_and_tables
+from app.db import async_engine, read_engines, replica_router, AsyncSessionLocal, ReadYourWritesMiddleware, create_db_and_tables, drop_db_and_tables
 from app.routers.admin import router as admin_router
+from app.routers.analytics import router as analytics_router
 from app.routers.auth import router as auth_router
 from app.routers.users import router as users_router
 from app.routers.categories import router as categories_router
 from app.routers.products import router as products_router
+from app.routers.variants import router as variants_router
+from app.routers.images import router as images_router
+from app.routers.orders import router as orders_router
+from app.routers.cart import router as cart_router
+from app.routers.payments import router as payments_router
+from app.services.search import setup_search_indexes
+from app.security.auth import token_subject
+from app.security.permission_matrix import permission_matrix
+from app.security.hashing import password_hasher
+from app.security.rate_limit import RateLimitHeadersMiddleware
+from app.services.reservations import reservation_sweeper
+from app.services.analytics import rollup_job
 from app.logging_config.logging_middleware import LoggingMiddleware
-from app.logging_config.logger import logger
+from app.logging_config.logger import logger, config as logging_config
 from app.config import Environment, get_settings
 
 settings = get_settings()
@@ -20,17 +33,31 @@ settings = get_settings()
 async def lifespan(app: FastAPI):
     if settings.environment == Environment.DEV:
         await create_db_and_tables()
+        async with async_engine.begin() as conn:
+            await setup_search_indexes(conn)
         # await drop_db_and_tables()
+
+    async with AsyncSessionLocal() as session:
+        await permission_matrix.reload(session)
+    replica_router.start()
+    reservation_sweeper.start()
+    rollup_job.start()
         
     yield
     
+    await rollup_job.stop()
+    await reservation_sweeper.stop()
+    await replica_router.stop()
+    password_hasher.shutdown()
     await async_engine.dispose()
-    if sync_engine:
-        sync_engine.dispose()
+    for engine in read_engines:
+        await engine.dispose()
 
 
 app = FastAPI(lifespan=lifespan)
-app.add_middleware(LoggingMiddleware)
+app.add_middleware(RateLimitHeadersMiddleware)
+app.add_middleware(ReadYourWritesMiddleware, principal_of=token_subject)
+app.add_middleware(LoggingMiddleware, **logging_config.get("access_log", {}))
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
@@ -38,6 +65,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
     return JSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail},
+        headers=exc.headers,
     )
 
 @app.exception_handler(Exception)
@@ -58,4 +86,10 @@ app.include_router(admin_router, prefix="/api/v1", tags=["Admin"])
 app.include_router(auth_router, prefix="/api/v1", tags=["Auth"])
 app.include_router(users_router, prefix="/api/v1", tags=["Users"])
 app.include_router(categories_router, prefix="/api/v1",tags=["Categories"])
-app.include_router(products_router, prefix="/api/v1", tags=["Products"])
\ No newline at end of file
+app.include_router(products_router, prefix="/api/v1", tags=["Products"])
+app.include_router(variants_router, prefix="/api/v1", tags=["Variants"])
+app.include_router(images_router, prefix="/api/v1", tags=["Images"])
+app.include_router(orders_router, prefix="/api/v1", tags=["Orders"])
+app.include_router(cart_router, prefix="/api/v1", tags=["Cart"])
+app.include_router(payments_router, prefix="/api/v1", tags=["Payments"])
+app.include_router(analytics_router, prefix="/api/v1", tags=["Analytics"])
\ No newline at end of file
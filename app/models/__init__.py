@@ -1,7 +1,12 @@
-from .product import Product, ProductVariant, ProductImage, Category
+from .product import Product, ProductVariant, ProductImage, Category, ProductSearchDocument
 from .order import OrderItem, Order
 from .payment import Payment, PaymentStatus
 from .user import User, RoleHierarchy, UserRole, RolePermission, Role, Permission, PermissionAuditLog
+from .cache import CacheVersion, ProductCacheEntry
+from .rate_limit import RateLimitBucket
+from .read_your_writes import RecentWrite
+from .reservation import StockReservation
+from .analytics import SalesRollup, VariantSalesRollup, CategorySalesRollup, RollupWatermark
 
 
-__all__ = ["Product", "ProductVariant", "ProductImage", "Category", "OrderItem", "Order", "Payment", "PaymentStatus", "User", "RoleHierarchy", "UserRole", "RolePermission", "Role", "Permission", "PermissionAuditLog"]
\ No newline at end of file
+__all__ = ["Product", "ProductVariant", "ProductImage", "Category", "ProductSearchDocument", "OrderItem", "Order", "Payment", "PaymentStatus", "User", "RoleHierarchy", "UserRole", "RolePermission", "Role", "Permission", "PermissionAuditLog", "CacheVersion", "ProductCacheEntry", "RateLimitBucket", "RecentWrite", "StockReservation", "SalesRollup", "VariantSalesRollup", "CategorySalesRollup", "RollupWatermark"]
\ No newline at end of file
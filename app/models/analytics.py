@@ -0,0 +1,48 @@
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+from sqlmodel import SQLModel, Field, Column, UUID as SQLModelUUID, DateTime, Numeric
+from app.schemas.analytics_schema import RollupGranularity
+from app.schemas.order_schema import OrderStatus, order_status_enum
+
+# Rollup rows are keyed by (granularity, bucket_start, ...) so a time range is one primary key range scan
+
+class SalesRollup(SQLModel, table=True):
+    """Orders, units, revenue and payments per time bucket and order status"""
+    __tablename__ = "sales_rollup"
+
+    granularity: RollupGranularity = Field(primary_key=True)
+    bucket_start: datetime = Field(sa_column=Column(DateTime(timezone=True), primary_key=True))
+    status: OrderStatus = Field(sa_column=Column(order_status_enum, primary_key=True))
+    order_count: int = 0
+    units_sold: int = 0
+    revenue: Decimal = Field(default=Decimal(0), sa_column=Column(Numeric(14, 2), nullable=False))
+    paid_amount: Decimal = Field(default=Decimal(0), sa_column=Column(Numeric(14, 2), nullable=False))
+
+class VariantSalesRollup(SQLModel, table=True):
+    """Units and revenue per time bucket and variant, excluding cancelled orders"""
+    __tablename__ = "variant_sales_rollup"
+
+    granularity: RollupGranularity = Field(primary_key=True)
+    bucket_start: datetime = Field(sa_column=Column(DateTime(timezone=True), primary_key=True))
+    # No foreign key: history outlives deleted variants
+    variant_id: UUID = Field(sa_column=Column(SQLModelUUID(as_uuid=True), primary_key=True))
+    units_sold: int = 0
+    revenue: Decimal = Field(default=Decimal(0), sa_column=Column(Numeric(14, 2), nullable=False))
+
+class CategorySalesRollup(SQLModel, table=True):
+    """Units and revenue per time bucket and category, excluding cancelled orders"""
+    __tablename__ = "category_sales_rollup"
+
+    granularity: RollupGranularity = Field(primary_key=True)
+    bucket_start: datetime = Field(sa_column=Column(DateTime(timezone=True), primary_key=True))
+    category_id: UUID = Field(sa_column=Column(SQLModelUUID(as_uuid=True), primary_key=True))
+    units_sold: int = 0
+    revenue: Decimal = Field(default=Decimal(0), sa_column=Column(Numeric(14, 2), nullable=False))
+
+class RollupWatermark(SQLModel, table=True):
+    """Changes up to `watermark` are already folded into the rollups"""
+    __tablename__ = "rollup_watermark"
+
+    name: str = Field(primary_key=True, max_length=50)
+    watermark: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
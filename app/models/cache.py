@@ -0,0 +1,31 @@
+from datetime import datetime
+from uuid import UUID
+from sqlalchemy import LargeBinary
+from sqlmodel import SQLModel, Field, Column, DateTime
+from app.models.unlogged import UNLOGGED
+from app.utils.datetime_now import datetime_now
+
+class CacheVersion(SQLModel, table=True):
+    """Monotonic version per cached resource, bumped in the same transaction as every write to it"""
+    __tablename__ = "cache_version"
+
+    name: str = Field(primary_key=True, max_length=50)
+    version: int = Field(default=0)
+    updated_at: datetime = Field(
+        default_factory=datetime_now,
+        sa_column=Column(DateTime(timezone=True), nullable=False)
+    )
+
+class ProductCacheEntry(SQLModel, table=True):
+    """Serialized ProductRead shared by all workers when the product cache's shared store is on.
+
+    Unlogged: it is only a cache, so it skips the WAL and is emptied after a crash.
+    """
+    __tablename__ = "product_cache_entry"
+    __table_args__ = UNLOGGED
+
+    product_id: UUID = Field(primary_key=True)
+    # ETag the body was built for; any other tag means the entry is stale
+    etag: str = Field(max_length=100)
+    body: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    expires_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False, index=True))
@@ -1,16 +1,31 @@
-from sqlmodel import SQLModel, Field, Relationship, Column, UUID as SQLModelUUID, text, Numeric, ForeignKey
+from sqlmodel import SQLModel, Field, Relationship, Column, UUID as SQLModelUUID, text, Numeric, ForeignKey, DateTime, Index
 from datetime import datetime
 from decimal import Decimal
 from uuid import UUID
 from typing import Optional, List, TYPE_CHECKING
+from pydantic import ConfigDict
+from sqlalchemy import func, select
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import column_property
 from app.utils.datetime_now import datetime_now
+from app.models.payment import Payment
 from app.schemas.order_schema import OrderBase, OrderStatus
+from app.schemas.payment_schema import PaymentStatus
 
 if TYPE_CHECKING:
-    from app.models import Payment, PaymentStatus
     from app.models import ProductVariant
 
 class Order(OrderBase, table=True):
+    model_config = ConfigDict(ignored_types=(hybrid_property,))
+    __table_args__ = (
+        # Keyset pagination over (created_at, id), alone or within a status or customer
+        Index("ix_order_created_at_id", "created_at", "id"),
+        Index("ix_order_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_order_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Finds orders changed since the analytics watermark; new orders have no updated_at
+        Index("ix_order_changed_at", text("coalesce(updated_at, created_at)")),
+    )
+
     id: Optional[UUID] = Field(
         default=None,
         sa_column=Column(
@@ -19,8 +34,22 @@ class Order(OrderBase, table=True):
             server_default=text("gen_random_uuid()")
         )
     )
-    created_at: datetime = Field(default_factory=datetime_now)
-    updated_at: Optional[datetime] = Field(default=None)
+    user_id: Optional[UUID] = Field(
+        default=None,
+        sa_column=Column(
+            SQLModelUUID(as_uuid=True),
+            ForeignKey("user.id", ondelete="SET NULL"),
+            nullable=True
+        ) # Keep order history even if the customer account is removed
+    )
+    created_at: datetime = Field(
+        default_factory=datetime_now,
+        sa_column=Column(DateTime(timezone=True), nullable=False)
+    )
+    updated_at: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
 
     # Relationships
     payments: List["Payment"] = Relationship(
@@ -46,21 +75,34 @@ class Order(OrderBase, table=True):
         self.payments.append(payment)
         return payment
 
-    def calculate_total_paid(self) -> Decimal:
-        return sum(p.amount for p in self.payments if p.status == PaymentStatus.SUCCESS)
-
-    def calculate_total_refunded(self) -> Decimal:
-        return sum(p.amount for p in self.payments if p.status == PaymentStatus.REFUNDED)
-
-    @property
+    @hybrid_property
     def total_due(self) -> Decimal:
-        return self.total_amount - self.calculate_total_paid()
+        return self.total_amount - self.total_paid
 
-    @property
+    @hybrid_property
     def is_fully_paid(self) -> bool:
-        return self.total_due <= Decimal(0)
+        return self.total_due <= 0
+
+def _payments_total(status: PaymentStatus):
+    return (
+        select(func.coalesce(func.sum(Payment.amount), 0))
+        .where(Payment.order_id == Order.id, Payment.status == status)
+        .correlate_except(Payment)
+        .scalar_subquery()
+    )
+
+# Summed in SQL as each order loads (one index range scan per order), and
+# usable in WHERE/ORDER BY, e.g. select(Order).where(Order.is_fully_paid.is_(False)).
+# They hold the values of the last load: after adding or changing payments,
+# refresh the order (await session.refresh(order)) before reading them.
+Order.total_paid = column_property(_payments_total(PaymentStatus.SUCCESS))
+Order.total_refunded = column_property(_payments_total(PaymentStatus.REFUNDED))
 
 class OrderItem(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_orderitem_order_id", "order_id"),
+    )
+
     id: Optional[UUID] = Field(
         default=None,
         sa_column=Column(
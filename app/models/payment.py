@@ -1,4 +1,4 @@
-from sqlmodel import Field, Relationship, Column, UUID as SQLModelUUID, text, ForeignKey
+from sqlmodel import Field, Relationship, Column, UUID as SQLModelUUID, text, ForeignKey, Index, DateTime
 from datetime import datetime
 from uuid import UUID
 from typing import Optional, TYPE_CHECKING
@@ -9,6 +9,13 @@ if TYPE_CHECKING:
     from app.models import Order
 
 class Payment(PaymentBase, table=True):
+    __table_args__ = (
+        # Serves the per-order paid/refunded totals on Order
+        Index("ix_payment_order_id_status", "order_id", "status"),
+        # Finds payments changed since the analytics watermark
+        Index("ix_payment_updated_at", "updated_at"),
+    )
+
     id: Optional[UUID] = Field(
         default=None,
         sa_column=Column(
@@ -17,8 +24,14 @@ class Payment(PaymentBase, table=True):
             server_default=text("gen_random_uuid()")
         )
     )
-    created_at: datetime = Field(default_factory=datetime_now)
-    updated_at: datetime = Field(default_factory=datetime_now)
+    created_at: datetime = Field(
+        default_factory=datetime_now,
+        sa_column=Column(DateTime(timezone=True), nullable=False)
+    )
+    updated_at: datetime = Field(
+        default_factory=datetime_now,
+        sa_column=Column(DateTime(timezone=True), nullable=False)
+    )
 
     order: "Order" = Relationship(back_populates="payments")
     order_id: UUID = Field(
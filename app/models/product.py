@@ -2,7 +2,10 @@ from decimal import Decimal
 from datetime import datetime
 from uuid import UUID
 from typing import Optional, List, Dict, TYPE_CHECKING
-from sqlmodel import SQLModel, Field, Relationship, Column, UUID as SQLModelUUID, text, JSON, Column, Numeric, ForeignKey
+from sqlmodel import SQLModel, Field, Relationship, Column, UUID as SQLModelUUID, text, JSON, Column, Numeric, ForeignKey, Index, DateTime, Text, CheckConstraint
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import column_property
 from app.utils.datetime_now import datetime_now
 from app.schemas.product_schema import ProductBase, ProductStatus
 
@@ -10,6 +13,11 @@ if TYPE_CHECKING:
     from app.models import OrderItem
 
 class ProductCategory(SQLModel, table=True):
+    __table_args__ = (
+        # The primary key only covers lookups by product_id
+        Index("ix_productcategory_category_id", "category_id"),
+    )
+
     product_id: UUID = Field( 
         sa_column=Column(
             SQLModelUUID(as_uuid=True),
@@ -26,6 +34,14 @@ class ProductCategory(SQLModel, table=True):
     )
 
 class Product(ProductBase, table=True):
+    __table_args__ = (
+        # Keyset pagination over (created_at, id)
+        Index("ix_product_created_at_id", "created_at", "id"),
+        Index("ix_product_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_product_base_price_id", "base_price", "id"),
+        Index("ix_product_name_id", "name", "id"),
+    )
+
     id: Optional[UUID] = Field(
         default=None,
         sa_column=Column(
@@ -34,8 +50,14 @@ class Product(ProductBase, table=True):
             server_default=text("gen_random_uuid()")
         )
     )
-    created_at: datetime = Field(default_factory=datetime_now)
-    updated_at: Optional[datetime] = Field(default=None)
+    created_at: datetime = Field(
+        default_factory=datetime_now,
+        sa_column=Column(DateTime(timezone=True), nullable=False)
+    )
+    updated_at: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
 
     # Relationships
     variants: List["ProductVariant"] = Relationship(
@@ -87,6 +109,11 @@ class Product(ProductBase, table=True):
             variant.archive()
     
 class Category(SQLModel, table=True):
+    __table_args__ = (
+        # Prefix range scans for subtree queries
+        Index("ix_category_path", "path"),
+    )
+
     id: Optional[UUID] = Field(
         default=None,
         sa_column=Column(
@@ -97,6 +124,10 @@ class Category(SQLModel, table=True):
     )
     name: str = Field(index=True, max_length=50)
     parent_id: Optional[UUID] = Field(default=None, foreign_key="category.id")
+    # Materialized path: hex ids from the root down to this category, each followed by "/".
+    # Byte ordering on Postgres keeps in_subtree's range scans exact; other dialects keep their default
+    path: str = Field(default="", sa_column=Column(Text().with_variant(Text(collation="C"), "postgresql"), nullable=False))
+    depth: int = Field(default=0)
     
     products: List["Product"] = Relationship(
         back_populates="categories",
@@ -109,6 +140,23 @@ class Category(SQLModel, table=True):
 
 class ProductVariant(SQLModel, table=True):
     __tablename__ = "product_variant"
+    __table_args__ = (
+        # Loading a product's variants, and the stock digest in its validators
+        Index("ix_product_variant_product_id", "product_id"),
+        # Serves attribute containment filters (attributes @> '{"color": "red"}')
+        Index(
+            "ix_product_variant_attributes",
+            "attributes",
+            postgresql_using="gin",
+            postgresql_ops={"attributes": "jsonb_path_ops"}
+        ),
+        # Last line of defence against overselling; checkout already guards its UPDATE
+        CheckConstraint("stock_quantity >= 0", name="ck_product_variant_stock_non_negative"),
+        CheckConstraint(
+            "reserved_quantity >= 0 AND reserved_quantity <= stock_quantity",
+            name="ck_product_variant_reserved_within_stock"
+        ),
+    )
     id: Optional[UUID] = Field(
         default=None,
         sa_column=Column(
@@ -125,7 +173,7 @@ class ProductVariant(SQLModel, table=True):
     )
     sku: str = Field(unique=True, index=True, max_length=50)
     attributes: Dict[str, str] = Field(
-        sa_column=Column(JSON),
+        sa_column=Column(JSON().with_variant(JSONB(), "postgresql")),
         default={}
     )
     price_offset: Decimal = Field(
@@ -133,6 +181,10 @@ class ProductVariant(SQLModel, table=True):
         sa_column=Column(Numeric(10, 2), nullable=False)
     )
     stock_quantity: int = Field(default=0, ge=0)
+    # Sum of the live StockReservation quantities for this variant
+    reserved_quantity: int = Field(default=0, ge=0, sa_column_kwargs={"server_default": text("0")})
+    # Number of VariantStockShard rows holding part of the stock; 0 keeps all stock on this row
+    stock_shards: int = Field(default=0, ge=0, sa_column_kwargs={"server_default": text("0")})
 
     product: Product = Relationship(back_populates="variants")
     order_items: List["OrderItem"] = Relationship(back_populates="variant")
@@ -147,13 +199,46 @@ class ProductVariant(SQLModel, table=True):
         return self.product.base_price + self.price_offset
     
     def adjust_stock(self, quantity: int):
-        if self.stock_quantity + quantity < 0:
+        if self.stock_quantity + quantity < self.reserved_quantity:
             raise ValueError("Insufficient stock")
         self.stock_quantity += quantity
 
+    @property
+    def total_stock(self) -> int:
+        return self.stock_quantity + self.shard_quantity
+
+    @property
+    def available_quantity(self) -> int:
+        return self.total_stock - self.reserved_quantity
+
     @property
     def is_in_stock(self) -> bool:
-        return self.stock_quantity > 0
+        return self.available_quantity > 0
+
+class VariantStockShard(SQLModel, table=True):
+    """Slice of a hot variant's unreserved stock, so concurrent checkouts lock different rows"""
+    __tablename__ = "variant_stock_shard"
+    __table_args__ = (
+        CheckConstraint("quantity >= 0", name="ck_variant_stock_shard_non_negative"),
+    )
+
+    variant_id: UUID = Field(
+        sa_column=Column(
+            SQLModelUUID(as_uuid=True),
+            ForeignKey("product_variant.id", ondelete="CASCADE"),
+            primary_key=True
+        )
+    )
+    shard: int = Field(primary_key=True)
+    quantity: int = Field(default=0, ge=0)
+
+# Stock held in shards, loaded with every variant (a primary key range lookup)
+ProductVariant.shard_quantity = column_property(
+    select(func.coalesce(func.sum(VariantStockShard.quantity), 0))
+    .where(VariantStockShard.variant_id == ProductVariant.id)
+    .correlate_except(VariantStockShard)
+    .scalar_subquery()
+)
 
 class ProductImage(SQLModel, table=True):
     id: Optional[UUID] = Field(
@@ -177,8 +262,22 @@ class ProductImage(SQLModel, table=True):
     
     product: Product = Relationship(back_populates="images")
 
-    def set_as_primary(self):
-        self.sort_order = 0
-        for img in self.product.images:
-            if img.id != self.id:
-                img.sort_order += 1
\ No newline at end of file
+class ProductSearchDocument(SQLModel, table=True):
+    """Denormalized text of a product and its variants, kept for full-text search"""
+    __tablename__ = "product_search_document"
+    __table_args__ = (
+        Index(
+            "ix_product_search_document_fts",
+            text("to_tsvector('simple', document)"),
+            postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
+
+    product_id: UUID = Field(
+        sa_column=Column(
+            SQLModelUUID(as_uuid=True),
+            ForeignKey("product.id", ondelete="CASCADE"),
+            primary_key=True
+        )
+    )
+    document: str = Field(default="", sa_column=Column(Text, nullable=False))
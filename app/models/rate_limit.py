@@ -0,0 +1,16 @@
+from datetime import datetime
+from sqlmodel import SQLModel, Field, Column, DateTime
+from app.utils.datetime_now import datetime_now
+
+class RateLimitBucket(SQLModel, table=True):
+    """Token bucket shared by all workers when rate limits use the database backend"""
+    __tablename__ = "rate_limit_bucket"
+
+    key: str = Field(primary_key=True, max_length=200)
+    tokens: float
+    # Tokens handed out by the most recent take, returned alongside what is left
+    granted: int = Field(default=0)
+    updated_at: datetime = Field(
+        default_factory=datetime_now,
+        sa_column=Column(DateTime(timezone=True), nullable=False, index=True)
+    )
@@ -0,0 +1,15 @@
+from datetime import datetime
+from sqlmodel import SQLModel, Field, Column, DateTime
+from app.models.unlogged import UNLOGGED
+
+class RecentWrite(SQLModel, table=True):
+    """When each principal last committed a write, so every worker keeps their reads on the primary for a while.
+
+    Unlogged: losing it in a crash only lets a few reads go to a replica early.
+    """
+    __tablename__ = "recent_write"
+    __table_args__ = UNLOGGED
+
+    # Subject of the principal's access token
+    principal: str = Field(primary_key=True, max_length=255)
+    written_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False, index=True))
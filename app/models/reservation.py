@@ -0,0 +1,33 @@
+from datetime import datetime
+from uuid import UUID
+from sqlmodel import SQLModel, Field, Column, UUID as SQLModelUUID, ForeignKey, DateTime, Index, text
+from app.utils.datetime_now import datetime_now
+
+class StockReservation(SQLModel, table=True):
+    """Stock a customer's cart holds until `expires_at`; counted in ProductVariant.reserved_quantity"""
+    __tablename__ = "stock_reservation"
+    __table_args__ = (
+        # The sweeper walks reservations in expiry order
+        Index("ix_stock_reservation_expires_at", "expires_at"),
+    )
+
+    user_id: UUID = Field(
+        sa_column=Column(
+            SQLModelUUID(as_uuid=True),
+            ForeignKey("user.id", ondelete="CASCADE"),
+            primary_key=True
+        )
+    )
+    variant_id: UUID = Field(
+        sa_column=Column(
+            SQLModelUUID(as_uuid=True),
+            ForeignKey("product_variant.id", ondelete="CASCADE"),
+            primary_key=True
+        )
+    )
+    quantity: int = Field(ge=1)
+    expires_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+    created_at: datetime = Field(
+        default_factory=datetime_now,
+        sa_column=Column(DateTime(timezone=True), nullable=False, server_default=text("now()"))
+    )
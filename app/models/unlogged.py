@@ -0,0 +1,13 @@
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateTable
+
+# __table_args__ of tables that are only caches: unlogged on Postgres, so
+# they skip the WAL and are emptied after a crash; ordinary tables elsewhere
+UNLOGGED = {"info": {"unlogged": True}}
+
+@compiles(CreateTable, "postgresql")
+def _create_unlogged(create: CreateTable, compiler, **kw) -> str:
+    statement = compiler.visit_create_table(create, **kw)
+    if create.element.info.get("unlogged"):
+        statement = statement.replace("CREATE TABLE", "CREATE UNLOGGED TABLE", 1)
+    return statement
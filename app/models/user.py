@@ -2,10 +2,10 @@ from datetime import datetime
 from sqlmodel import SQLModel, Field, text, UUID as SQLModelUUID, Column, JSON, Relationship, DateTime
 from pydantic import EmailStr
 from uuid import UUID
-from typing import List, Optional
+from typing import FrozenSet, List, Optional
 from app.utils.datetime_now import datetime_now
 from sqlalchemy.dialects.postgresql import ENUM
-from app.permissions import RoleType, PermissionsType
+from app.permissions import RoleType, PermissionsType, PERMISSION_BITS, permissions_from_mask
 
 user_role_enum = ENUM(
     "customer", "support_staff", "store_manager", "super_admin",
@@ -19,6 +19,21 @@ class TokenData(SQLModel):
     roles: List[RoleType] = []
     exp: datetime
 
+class Principal(SQLModel):
+    """Authenticated user resolved from a token, cached between requests"""
+    id: UUID
+    email: str
+    is_active: bool
+    roles: FrozenSet[RoleType] = frozenset()
+    permission_mask: int = 0
+
+    def has_permission(self, permission: PermissionsType) -> bool:
+        return bool(self.permission_mask & PERMISSION_BITS[permission])
+
+    @property
+    def permissions(self) -> FrozenSet[PermissionsType]:
+        return permissions_from_mask(self.permission_mask)
+
 class RoleHierarchy(SQLModel, table=True):
     parent_role_id: UUID = Field(foreign_key="role.id", primary_key=True)
     child_role_id: UUID = Field(foreign_key="role.id", primary_key=True)
@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import Dict, FrozenSet, Iterable
 
 class PermissionsType(str, Enum):
     """Granular permissions for different resources"""
@@ -20,6 +21,7 @@ class PermissionsType(str, Enum):
     CATEGORY_MANAGE_HIERARCHY = "category:manage_hierarchy"
 
     # Order permissions
+    # Any customer's orders; customers read their own without it
     ORDER_READ = "order:read"
     ORDER_MANAGE = "order:manage"
     ORDER_UPDATE_STATUS = "order:update_status"
@@ -71,6 +73,7 @@ DEFAULT_ROLE_PERMISSIONS = {
         PermissionsType.CATEGORY_READ,
         PermissionsType.CATEGORY_WRITE,
         PermissionsType.CATEGORY_DELETE,
+        PermissionsType.CATEGORY_EXPORT,
         PermissionsType.CATEGORY_MANAGE_HIERARCHY,
         
         # Order
@@ -88,7 +91,13 @@ DEFAULT_ROLE_PERMISSIONS = {
         PermissionsType.PAYMENT_READ,
         PermissionsType.PAYMENT_PROCESS,
         PermissionsType.PAYMENT_REFUND,
-        PermissionsType.PAYMENT_VIEW_SENSITIVE
+        PermissionsType.PAYMENT_EXPORT,
+        PermissionsType.PAYMENT_VIEW_SENSITIVE,
+
+        # Reports and analytics
+        PermissionsType.REPORT_EXPORT,
+        PermissionsType.ANALYTICS_VIEW,
+        PermissionsType.ANALYTICS_EXPORT
     ],
     RoleType.STORE_MANAGER: [
         # Product
@@ -101,6 +110,7 @@ DEFAULT_ROLE_PERMISSIONS = {
         # Category
         PermissionsType.CATEGORY_READ,
         PermissionsType.CATEGORY_WRITE,
+        PermissionsType.CATEGORY_EXPORT,
         
         # Order
         PermissionsType.ORDER_READ,
@@ -108,7 +118,11 @@ DEFAULT_ROLE_PERMISSIONS = {
         PermissionsType.ORDER_MANAGE_ITEMS,
         
         # Payment
-        PermissionsType.PAYMENT_READ
+        PermissionsType.PAYMENT_READ,
+
+        # Reports and analytics
+        PermissionsType.REPORT_EXPORT,
+        PermissionsType.ANALYTICS_VIEW
     ],
     RoleType.SUPPORT_STAFF: [
         PermissionsType.ORDER_READ,
@@ -117,10 +131,23 @@ DEFAULT_ROLE_PERMISSIONS = {
         PermissionsType.PAYMENT_READ
     ],
     RoleType.CUSTOMER: [
-        PermissionsType.ORDER_READ,
+        # No ORDER_READ: it reads every customer's orders; /orders/me and the owner check cover their own
         PermissionsType.PAYMENT_READ,
         # Limited product access
         PermissionsType.PRODUCT_READ
     ]
 }
-    
\ No newline at end of file
+
+# Each permission owns one bit so a set of permissions is a single int
+PERMISSION_BITS: Dict[PermissionsType, int] = {
+    permission: 1 << i for i, permission in enumerate(PermissionsType)
+}
+
+def permission_mask(permissions: Iterable[PermissionsType]) -> int:
+    mask = 0
+    for permission in permissions:
+        mask |= PERMISSION_BITS[permission]
+    return mask
+
+def permissions_from_mask(mask: int) -> FrozenSet[PermissionsType]:
+    return frozenset(permission for permission, bit in PERMISSION_BITS.items() if mask & bit)
@@ -1,18 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from collections import defaultdict
+from typing import List
+from uuid import UUID
+from fastapi import APIRouter, Body, Depends, HTTPException, status
 from app.security.auth import RoleType
-from app.security.auth import get_current_user
-from app.models.user import User
-from app.db import get_session
+from app.security.auth import get_current_user, PermissionChecker, principal_cache
+from app.security.permission_matrix import permission_matrix
+from app.security.hashing import password_hasher
+from app.security.rate_limit import rate_limiter
+from app.services.product_cache import product_cache
+from app.models.user import Principal, Role, UserRole
+from app.permissions import PermissionsType, permissions_from_mask
+from app.schemas.user_schema import EffectivePermissionsRead
+from app.db import get_session, pool_stats
 from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import select
+
+MAX_EFFECTIVE_PERMISSION_USERS = 500
 
 router = APIRouter()
 
-def super_Admin_only(user: User = Depends(get_current_user)):
+def super_Admin_only(user: Principal = Depends(get_current_user)):
     """Middleware to check if user is a super admin"""
-    is_super_Admin = any(
-        role.name == RoleType.SUPER_ADMIN for role in user.roles
-    )
-    if not is_super_Admin:
+    if RoleType.SUPER_ADMIN not in user.roles:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Super Admin access required"
@@ -28,4 +37,50 @@ async def get_system_status(
         await session.exec("SELECT 1")
         return {"status": "healthy"}
     except Exception as e:
-        return {"status": "unhealthy", "error": str(e)}
\ No newline at end of file
+        return {"status": "unhealthy", "error": str(e)}
+
+@router.get("/admin/metrics", dependencies=[Depends(super_Admin_only)], summary="Get runtime metrics")
+async def get_metrics():
+    """Get in-process runtime metrics for this worker"""
+    return {
+        "password_hashing": password_hasher.stats(),
+        "database_pools": pool_stats(),
+        "rate_limits": rate_limiter.stats(),
+        "product_cache": product_cache.stats(),
+    }
+
+@router.post("/admin/permissions/reload", dependencies=[Depends(super_Admin_only)], summary="Recompile role permissions")
+async def reload_permissions(session: AsyncSession = Depends(get_session)):
+    """Recompile the role permission matrix after role, permission or hierarchy changes"""
+    await permission_matrix.publish(session)
+    principal_cache.clear()
+    return {"message": "Permissions reloaded"}
+
+@router.post(
+    "/admin/users/effective-permissions",
+    response_model=List[EffectivePermissionsRead],
+    dependencies=[Depends(PermissionChecker([PermissionsType.USER_READ]))],
+    summary="Get effective permissions for many users"
+)
+async def read_effective_permissions(
+    user_ids: List[UUID] = Body(max_length=MAX_EFFECTIVE_PERMISSION_USERS),
+    session: AsyncSession = Depends(get_session)
+):
+    """Resolve the roles of all requested users in one query and expand them through the permission matrix"""
+    result = await session.exec(
+        select(UserRole.user_id, Role.name)
+        .join(Role, Role.id == UserRole.role_id)
+        .where(UserRole.user_id.in_(user_ids))
+    )
+    roles_by_user = defaultdict(set)
+    for user_id, role in result.all():
+        roles_by_user[user_id].add(role)
+
+    return [
+        EffectivePermissionsRead(
+            user_id=user_id,
+            roles=sorted(roles_by_user[user_id]),
+            permissions=sorted(permissions_from_mask(permission_matrix.mask_for(roles_by_user[user_id])))
+        )
+        for user_id in dict.fromkeys(user_ids)
+    ]
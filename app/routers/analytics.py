@@ -1,32 +1,67 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from app.models.user import User, Role
-from sqlmodel import select
+from datetime import datetime
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlmodel.ext.asyncio.session import AsyncSession
-from app.db import get_session
-from app.security.auth import get_current_user
+from app.db import get_read_session
 from app.permissions import PermissionsType
+from app.schemas.analytics_schema import RollupGranularity, SalesSeries, TopCategory, TopVariant
+from app.security.auth import PermissionChecker
+from app.services.analytics import (
+    BUCKET_SIZES, SALES_EXPORT_COLUMNS, export_sales, floor_bucket, sales_series, top_categories, top_variants
+)
+from app.utils.datetime_now import datetime_now
+from app.utils.export import ExportFormat, export_response
 
 router = APIRouter()
 
-async def vaidate_analytics_access(
-    user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session)
-):
-    """Check if the user has permission to access analytics"""
-    result = await session.exec(select(Role).where(Role.name == PermissionsType.ANALYTICS_VIEW))
-    analytics_permisssion = result.first()
+# Default window, in buckets, ending with the current one
+DEFAULT_BUCKETS = {RollupGranularity.HOUR: 48, RollupGranularity.DAY: 30}
+MAX_BUCKETS = 2000
+
+def analytics_range(
+    granularity: RollupGranularity = Query(default=RollupGranularity.DAY),
+    start: Optional[datetime] = Query(default=None, description="Inclusive; rounded down to its bucket"),
+    end: Optional[datetime] = Query(default=None, description="Exclusive; rounded up to a bucket boundary")
+) -> Tuple[RollupGranularity, datetime, datetime]:
+    """Resolve the requested window to whole UTC buckets"""
+    size = BUCKET_SIZES[granularity]
+    end = end or datetime_now()
+    end_bucket = floor_bucket(end, granularity)
+    end = end_bucket if end_bucket == end else end_bucket + size
+    start = floor_bucket(start, granularity) if start else end - size * DEFAULT_BUCKETS[granularity]
+    if start >= end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must be before end")
+    if (end - start) / size > MAX_BUCKETS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {MAX_BUCKETS} buckets per request")
+    return granularity, start, end
+
+@router.get("/analytics/sales", response_model=SalesSeries, summary="Orders, units and revenue per time bucket", dependencies=[Depends(PermissionChecker([PermissionsType.ANALYTICS_VIEW]))])
+async def read_sales(window: Tuple[RollupGranularity, datetime, datetime] = Depends(analytics_range), session: AsyncSession = Depends(get_read_session)):
+    """Served from the hourly/daily rollups, which trail live orders by up to a refresh interval"""
+    granularity, start, end = window
+    return SalesSeries(granularity=granularity, start=start, end=end, buckets=await sales_series(session, granularity, start, end))
 
-    has_permission: False
-    for role in user.roles:
-        if analytics_permisssion in role.permissions:
-            has_permission = True
-            break
+@router.get("/analytics/top-variants", response_model=List[TopVariant], summary="Best-selling variants by units", dependencies=[Depends(PermissionChecker([PermissionsType.ANALYTICS_VIEW]))])
+async def read_top_variants(
+    window: Tuple[RollupGranularity, datetime, datetime] = Depends(analytics_range),
+    limit: int = Query(default=10, ge=1, le=100),
+    session: AsyncSession = Depends(get_read_session)
+):
+    return await top_variants(session, *window, limit)
 
-    if not has_permission:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No access to analytics")
-    
-    return user
+@router.get("/analytics/top-categories", response_model=List[TopCategory], summary="Best-selling categories by revenue", dependencies=[Depends(PermissionChecker([PermissionsType.ANALYTICS_VIEW]))])
+async def read_top_categories(
+    window: Tuple[RollupGranularity, datetime, datetime] = Depends(analytics_range),
+    limit: int = Query(default=10, ge=1, le=100),
+    session: AsyncSession = Depends(get_read_session)
+):
+    return await top_categories(session, *window, limit)
 
-@router.get("/analytics", summary="Get analytics data", dependencies=[Depends(vaidate_analytics_access)])
-async def get_analytics_data():
-    return {"data": "analytics data"}
\ No newline at end of file
+@router.get("/analytics/sales/export", summary="Export the sales rollups as CSV, NDJSON or Parquet", dependencies=[Depends(PermissionChecker([PermissionsType.ANALYTICS_EXPORT]))])
+async def export_sales_file(
+    window: Tuple[RollupGranularity, datetime, datetime] = Depends(analytics_range),
+    export_format: ExportFormat = Query(default=ExportFormat.CSV, alias="format"),
+    compress: bool = Query(default=False, alias="gzip")
+):
+    """One row per bucket and order status"""
+    return export_response(export_sales(*window), export_format, SALES_EXPORT_COLUMNS, "sales", compress)
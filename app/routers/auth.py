@@ -1,22 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from app.security.auth import create_access_token, create_refresh_token, refresh_access_token
-from app.security.hashing import verify_password
+from app.security.hashing import password_hasher
+from app.security.rate_limit import LOGIN_PER_ACCOUNT, LOGIN_PER_IP, RateLimit, enforce
 from app.models.user import User
 from app.db import get_session
 from app.schemas.user_schema import LoginAccessTokenRead
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
+from sqlalchemy.orm import selectinload
 
 router = APIRouter()
-@router.post("/auth/token", summary="Get a token", response_model=LoginAccessTokenRead)
-async def login_for_access_token(session: AsyncSession = Depends(get_session), form_data: OAuth2PasswordRequestForm = Depends()):
+@router.post("/auth/token", summary="Get a token", response_model=LoginAccessTokenRead, dependencies=[Depends(RateLimit(LOGIN_PER_IP, per_ip=True))])
+async def login_for_access_token(request: Request, session: AsyncSession = Depends(get_session), form_data: OAuth2PasswordRequestForm = Depends()):
     """Authenticate a user and return an access token and refresh token"""
-    result = await session.exec(select(User).where(User.email == form_data.username))
+    # Checked before bcrypt runs, so guessing at one account from many IPs stays cheap to refuse
+    await enforce(request, LOGIN_PER_ACCOUNT, form_data.username.lower())
+    result = await session.exec(select(User).where(User.email == form_data.username).options(selectinload(User.roles)))
     user = result.first()
 
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
+
+    is_valid, new_hash = await password_hasher.verify_and_update(form_data.password, user.hashed_password)
+    if not is_valid:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
+
+    # Transparently upgrade hashes created with an older work factor
+    if new_hash:
+        user.hashed_password = new_hash
+        session.add(user)
+        await session.commit()
     
     access_token = create_access_token(data={"sub": user.email, "roles": [role.name for role in user.roles]})
     refresh_token = create_refresh_token(data={"sub": user.email})
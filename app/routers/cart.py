@@ -0,0 +1,51 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db import get_session
+from app.models.reservation import StockReservation
+from app.models.user import Principal
+from app.schemas.order_schema import ReservationItem, ReservationRead
+from app.security.auth import get_current_user
+from app.services.inventory import InsufficientStock, VariantUnavailable
+from app.services.reservations import release_all, reserve_stock
+
+router = APIRouter()
+
+@router.get("/cart/reservations", response_model=List[ReservationRead], summary="Get the stock held by the current user's cart")
+async def read_reservations(principal: Principal = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
+    result = await session.exec(
+        select(StockReservation)
+        .where(StockReservation.user_id == principal.id)
+        .order_by(StockReservation.variant_id)
+    )
+    return result.all()
+
+@router.put("/cart/reservations", response_model=List[ReservationRead], summary="Reserve stock for the current user's cart")
+async def update_reservations(
+    items: List[ReservationItem],
+    principal: Principal = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Set the reserved quantity per variant (0 releases it) and extend every reservation in the cart"""
+    if len(items) > 100:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Too many items")
+    quantities = {item.variant_id: item.quantity for item in items}
+
+    try:
+        reservations = await reserve_stock(session, principal.id, quantities)
+    except VariantUnavailable as e:
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except InsufficientStock as e:
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    await session.commit()
+    return reservations
+
+@router.delete("/cart/reservations", status_code=status.HTTP_204_NO_CONTENT, summary="Release all stock held by the current user's cart")
+async def delete_reservations(principal: Principal = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
+    await release_all(session, principal.id)
+    await session.commit()
+    return
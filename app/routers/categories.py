@@ -1,38 +1,63 @@
-from uuid import UUID
-from fastapi import APIRouter, status, Depends, HTTPException
+from typing import Optional
+from uuid import UUID, uuid4
+from fastapi import APIRouter, status, Depends, HTTPException, Query, Request
+from fastapi.responses import Response
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
 from sqlalchemy.exc import IntegrityError
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 from app.models.product import Category
-from app.schemas.product_schema import CategoryCreate, CategoryRead, CategoryUpdate
-from app.db import get_session
+from app.permissions import PermissionsType
+from app.security.auth import PermissionChecker
+from app.security.rate_limit import CATALOG, RateLimit
+from app.schemas.product_schema import CategoryCreate, CategoryRead, CategoryUpdate, CategoryTreeNode, ProductFilter, ProductPage, ProductSort
+from app.services.cache_versions import CATEGORY_TREE, bump_version, version_tracker
+from app.services.category_cache import category_tree_cache
+from app.services.category_tree import CATEGORY_EXPORT_COLUMNS, export_categories, place_category, move_category, detach_category, subtree_statement, ancestors_statement
+from app.services.product_query import list_products
+from app.utils.conditional import cache_headers, is_not_modified, make_etag
+from app.utils.export import ExportFormat, export_response
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.db import get_read_session, get_session
 
-router = APIRouter()
-
-limiter = Limiter(key_func=get_remote_address)
+router = APIRouter(dependencies=[Depends(RateLimit(CATALOG))])
 
 @router.post("/categories", response_model=CategoryRead, status_code=status.HTTP_201_CREATED, summary="Create a new category")
 async def create_category(category_in: CategoryCreate, session: AsyncSession = Depends(get_session)):
     category = Category.model_validate(category_in)
+    # Assign the id up front so the materialized path can be written in the same INSERT
+    category.id = uuid4()
+    await place_category(session, category)
     session.add(category)
     try:
+        await bump_version(session, CATEGORY_TREE)
         await session.commit()
         await session.refresh(category)
     except IntegrityError:
         await session.rollback()
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Category already exists")
+    category_tree_cache.invalidate()
     return category
 
-@router.get("/categories", response_model=list[CategoryRead], summary="Get all categories")
-# @limiter.limit("10/minute")
-async def read_categories(session: AsyncSession = Depends(get_session)):
-    categories = await session.exec(select(Category))
-    return categories.all()
+@router.get("/categories", response_model=list[CategoryTreeNode], summary="Get the category tree")
+async def read_categories(request: Request, session: AsyncSession = Depends(get_read_session)):
+    """Serve the whole tree from the in-process cache as pre-serialized JSON, or 304 when the client's copy is current"""
+    version, last_modified = await version_tracker.get(session, CATEGORY_TREE)
+    etag = make_etag(version)
+    headers = cache_headers("categories", etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=await category_tree_cache.get(session), media_type="application/json", headers=headers)
+
+@router.get("/categories/export", summary="Export categories as CSV, NDJSON or Parquet", dependencies=[Depends(PermissionChecker([PermissionsType.CATEGORY_EXPORT]))])
+async def export_categories_file(
+    export_format: ExportFormat = Query(default=ExportFormat.NDJSON, alias="format"),
+    compress: bool = Query(default=False, alias="gzip")
+):
+    """Stream every category, parents before their children"""
+    return export_response(export_categories(), export_format, CATEGORY_EXPORT_COLUMNS, "categories", compress)
 
 @router.get("/categories/{category_id}", response_model=CategoryRead, summary="Get a category by ID")
-async def read_category(category_id: str, session: AsyncSession = Depends(get_session)):
+async def read_category(category_id: str, session: AsyncSession = Depends(get_read_session)):
     try:
         category_id = UUID(category_id)
     except ValueError:
@@ -55,12 +80,16 @@ async def update_category(category_id: str, category_in: CategoryUpdate, session
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
     
     update_data = category_in.model_dump(exclude_unset=True)
+    if "parent_id" in update_data:
+        await move_category(session, category, update_data.pop("parent_id"))
     for key, value in update_data.items():
         setattr(category, key, value)
     
     session.add(category)
+    await bump_version(session, CATEGORY_TREE)
     await session.commit()
     await session.refresh(category)
+    category_tree_cache.invalidate()
     return category
 
 @router.delete("/categories/{category_id}", status_code=status.HTTP_204_NO_CONTENT, summary="Delete a category by ID")
@@ -73,6 +102,53 @@ async def delete_category(category_id: str, session: AsyncSession = Depends(get_
     category = await session.get(Category, category_id)
     if not category:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
-    session.delete(category)
+    await detach_category(session, category)
+    await session.delete(category)
+    await bump_version(session, CATEGORY_TREE)
     await session.commit()
-    return
\ No newline at end of file
+    category_tree_cache.invalidate()
+    return
+
+@router.get("/categories/{category_id}/subtree", response_model=list[CategoryRead], summary="Get a category and all of its descendants")
+async def read_category_subtree(category_id: str, session: AsyncSession = Depends(get_read_session)):
+    try:
+        category_id = UUID(category_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid UUID")
+
+    result = await session.exec(subtree_statement(category_id))
+    categories = result.all()
+    if not categories:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
+    return categories
+
+@router.get("/categories/{category_id}/ancestors", response_model=list[CategoryRead], summary="Get the breadcrumb trail from the root to a category")
+async def read_category_ancestors(category_id: str, session: AsyncSession = Depends(get_read_session)):
+    try:
+        category_id = UUID(category_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid UUID")
+
+    result = await session.exec(ancestors_statement(category_id))
+    categories = result.all()
+    if not categories:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
+    return categories
+
+@router.get("/categories/{category_id}/products", response_model=ProductPage, summary="Get products anywhere under a category")
+async def read_category_products(
+    category_id: str,
+    sort: ProductSort = Query(default=ProductSort.NEWEST),
+    cursor: Optional[str] = Query(default=None),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    session: AsyncSession = Depends(get_read_session)
+):
+    try:
+        category_id = UUID(category_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid UUID")
+
+    try:
+        return await list_products(session, ProductFilter(category_subtree_id=category_id), sort, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
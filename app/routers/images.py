@@ -0,0 +1,102 @@
+from typing import List
+from uuid import UUID
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.product import ProductImage
+from app.schemas.product_schema import MAX_BULK_WRITE, ProductImageBulkUpdate, ProductImageCreate, ProductImageRead
+from app.permissions import PermissionsType
+from app.security.auth import PermissionChecker
+from app.security.rate_limit import CATALOG, RateLimit
+from app.services.product_writes import (
+    create_images, delete_images, ensure_product, forget_products, reorder_images, touch_products, update_images
+)
+from app.db import get_read_session, get_session
+
+router = APIRouter(dependencies=[Depends(RateLimit(CATALOG))])
+
+async def _read_images(session: AsyncSession, product_id: UUID) -> List[ProductImage]:
+    result = await session.exec(
+        select(ProductImage)
+        .where(ProductImage.product_id == product_id)
+        .order_by(ProductImage.sort_order, ProductImage.id)
+        .execution_options(populate_existing=True)
+    )
+    return result.all()
+
+async def _commit(session: AsyncSession, product_id: UUID) -> List[ProductImage]:
+    """Commit the image changes and return the product's images"""
+    await touch_products(session, [product_id])
+    await session.commit()
+    forget_products([product_id])
+    return await _read_images(session, product_id)
+
+async def _reorder(session: AsyncSession, product_id: UUID, image_ids: List[UUID]) -> List[ProductImage]:
+    if len(set(image_ids)) != len(image_ids):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Each image may only appear once")
+    await ensure_product(session, product_id)
+    found = await reorder_images(session, product_id, image_ids)
+    if not set(image_ids) <= set(found):
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Image not found")
+    return await _commit(session, product_id)
+
+@router.get("/products/{product_id}/images", response_model=List[ProductImageRead], summary="Get a product's images in display order")
+async def read_images(product_id: UUID, session: AsyncSession = Depends(get_read_session)):
+    await ensure_product(session, product_id)
+    return await _read_images(session, product_id)
+
+@router.post("/products/{product_id}/images", response_model=List[ProductImageRead], status_code=status.HTTP_201_CREATED, summary="Add images to a product", dependencies=[Depends(PermissionChecker([PermissionsType.PRODUCT_MANAGE_IMAGES]))])
+async def add_images(
+    product_id: UUID,
+    images: List[ProductImageCreate] = Body(min_length=1, max_length=MAX_BULK_WRITE),
+    session: AsyncSession = Depends(get_session)
+):
+    """Returns all of the product's images, new ones included"""
+    await ensure_product(session, product_id)
+    await create_images(session, product_id, images)
+    return await _commit(session, product_id)
+
+@router.patch("/products/{product_id}/images", response_model=List[ProductImageRead], summary="Update many images of a product", dependencies=[Depends(PermissionChecker([PermissionsType.PRODUCT_MANAGE_IMAGES]))])
+async def edit_images(
+    product_id: UUID,
+    changes: List[ProductImageBulkUpdate] = Body(min_length=1, max_length=MAX_BULK_WRITE),
+    session: AsyncSession = Depends(get_session)
+):
+    """Fields left out or null keep their value. Returns all of the product's images."""
+    image_ids = [change.id for change in changes]
+    if len(set(image_ids)) != len(image_ids):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Each image may only appear once")
+    await ensure_product(session, product_id)
+    updated = await update_images(session, product_id, changes)
+    if len(updated) != len(image_ids):
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Image not found")
+    return await _commit(session, product_id)
+
+@router.delete("/products/{product_id}/images", status_code=status.HTTP_204_NO_CONTENT, summary="Delete many images of a product", dependencies=[Depends(PermissionChecker([PermissionsType.PRODUCT_MANAGE_IMAGES]))])
+async def remove_images(
+    product_id: UUID,
+    ids: List[UUID] = Query(min_length=1, max_length=MAX_BULK_WRITE),
+    session: AsyncSession = Depends(get_session)
+):
+    await ensure_product(session, product_id)
+    deleted = await delete_images(session, product_id, set(ids))
+    if len(deleted) != len(set(ids)):
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Image not found")
+    await _commit(session, product_id)
+    return
+
+@router.put("/products/{product_id}/images/order", response_model=List[ProductImageRead], summary="Reorder a product's images", dependencies=[Depends(PermissionChecker([PermissionsType.PRODUCT_MANAGE_IMAGES]))])
+async def order_images(
+    product_id: UUID,
+    image_ids: List[UUID] = Body(min_length=1, max_length=MAX_BULK_WRITE),
+    session: AsyncSession = Depends(get_session)
+):
+    """Put the listed images first, in that order; the rest follow in their current order"""
+    return await _reorder(session, product_id, image_ids)
+
+@router.post("/products/{product_id}/images/{image_id}/primary", response_model=List[ProductImageRead], summary="Make an image the product's main image", dependencies=[Depends(PermissionChecker([PermissionsType.PRODUCT_MANAGE_IMAGES]))])
+async def set_primary_image(product_id: UUID, image_id: UUID, session: AsyncSession = Depends(get_session)):
+    return await _reorder(session, product_id, [image_id])
@@ -1,5 +1,115 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from app.security.auth import RoleType
-from app.security.auth import get_current_user
-from app.models.user import User
-from app.models.order import Order
\ No newline at end of file
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db import get_read_session, get_session
+from app.models.order import Order, OrderItem
+from app.models.user import Principal
+from app.permissions import PermissionsType
+from app.schemas.order_schema import CheckoutCreate, OrderFilter, OrderListRead, OrderPage, OrderRead, OrderStatus
+from app.security.auth import PermissionChecker, get_current_user
+from app.services.inventory import InsufficientStock, VariantUnavailable, take_stock
+from app.services.order_query import ORDER_EXPORT_COLUMNS, export_orders, list_orders
+from app.utils.export import ExportFormat, export_response
+from app.utils.json_response import FastJSONResponse
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+router = APIRouter()
+
+def order_filter_params(
+    status_: Optional[List[OrderStatus]] = Query(default=None, alias="status"),
+    created_from: Optional[datetime] = Query(default=None, description="Inclusive lower bound on created_at"),
+    created_to: Optional[datetime] = Query(default=None, description="Exclusive upper bound on created_at"),
+    unpaid: Optional[bool] = Query(default=None, description="true: orders with an amount due, false: paid in full")
+) -> OrderFilter:
+    """Collect the order filter query parameters"""
+    return OrderFilter(statuses=status_, created_from=created_from, created_to=created_to, unpaid=unpaid)
+
+@router.post("/orders/checkout", response_model=OrderRead, status_code=status.HTTP_201_CREATED, summary="Place an order")
+async def checkout(
+    checkout_in: CheckoutCreate,
+    principal: Principal = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Create an order and take its stock in a single transaction, converting the caller's reservations"""
+    quantities = Counter()
+    for item in checkout_in.items:
+        quantities[item.variant_id] += item.quantity
+
+    try:
+        prices = await take_stock(session, quantities, user_id=principal.id)
+    except VariantUnavailable as e:
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except InsufficientStock as e:
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    items = [
+        OrderItem(variant_id=variant_id, quantity=quantity, price_at_purchase=prices[variant_id])
+        for variant_id, quantity in quantities.items()
+    ]
+    order = Order(
+        user_id=principal.id,
+        total_amount=sum(item.total_price for item in items),
+        status=OrderStatus.PENDING,
+        shipping_address=checkout_in.shipping_address,
+        items=items
+    )
+    session.add(order)
+    await session.commit()
+    return OrderRead.model_validate(order)
+
+@router.get("/orders", response_model=OrderPage, summary="Get a page of orders", dependencies=[Depends(PermissionChecker([PermissionsType.ORDER_READ]))])
+async def read_orders(
+    order_filter: OrderFilter = Depends(order_filter_params),
+    user_id: Optional[UUID] = Query(default=None),
+    cursor: Optional[str] = Query(default=None, description="Cursor returned as next_cursor by the previous page"),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    session: AsyncSession = Depends(get_read_session)
+):
+    """List orders newest first, keyset-paginated on (created_at, id)"""
+    order_filter.user_id = user_id
+    return await _order_page(session, order_filter, cursor, limit)
+
+@router.get("/orders/me", response_model=OrderPage, summary="Get a page of the current user's orders")
+async def read_my_orders(
+    order_filter: OrderFilter = Depends(order_filter_params),
+    cursor: Optional[str] = Query(default=None, description="Cursor returned as next_cursor by the previous page"),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    principal: Principal = Depends(get_current_user),
+    session: AsyncSession = Depends(get_read_session)
+):
+    order_filter.user_id = principal.id
+    return await _order_page(session, order_filter, cursor, limit)
+
+@router.get("/orders/export", summary="Export orders as CSV, NDJSON or Parquet", dependencies=[Depends(PermissionChecker([PermissionsType.REPORT_EXPORT]))])
+async def export_orders_file(
+    order_filter: OrderFilter = Depends(order_filter_params),
+    user_id: Optional[UUID] = Query(default=None),
+    export_format: ExportFormat = Query(default=ExportFormat.NDJSON, alias="format"),
+    compress: bool = Query(default=False, alias="gzip")
+):
+    """Stream every matching order, oldest first, in constant memory"""
+    order_filter.user_id = user_id
+    return export_response(export_orders(order_filter), export_format, ORDER_EXPORT_COLUMNS, "orders", compress)
+
+@router.get("/orders/{order_id}", response_model=OrderListRead, summary="Get an order by ID")
+async def read_order(order_id: UUID, principal: Principal = Depends(get_current_user), session: AsyncSession = Depends(get_read_session)):
+    result = await session.exec(select(Order).where(Order.id == order_id).options(selectinload(Order.items)))
+    order = result.first()
+    # Other customers' orders are reported as missing rather than forbidden
+    if not order or (order.user_id != principal.id and not principal.has_permission(PermissionsType.ORDER_READ)):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
+    return order
+
+async def _order_page(session: AsyncSession, order_filter: OrderFilter, cursor: Optional[str], limit: int):
+    try:
+        page = await list_orders(session, order_filter, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return FastJSONResponse(page)
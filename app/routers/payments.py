@@ -0,0 +1,28 @@
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query
+from app.models.user import Principal
+from app.permissions import PermissionsType
+from app.schemas.payment_schema import PaymentStatus
+from app.security.auth import PermissionChecker
+from app.services.payment_query import PAYMENT_EXPORT_COLUMNS, PAYMENT_SENSITIVE_COLUMNS, export_payments
+from app.utils.export import ExportFormat, export_response
+
+router = APIRouter()
+
+@router.get("/payments/export", summary="Export payments as CSV, NDJSON or Parquet")
+async def export_payments_file(
+    status_: Optional[List[PaymentStatus]] = Query(default=None, alias="status"),
+    created_from: Optional[datetime] = Query(default=None, description="Inclusive lower bound on created_at"),
+    created_to: Optional[datetime] = Query(default=None, description="Exclusive upper bound on created_at"),
+    export_format: ExportFormat = Query(default=ExportFormat.NDJSON, alias="format"),
+    compress: bool = Query(default=False, alias="gzip"),
+    principal: Principal = Depends(PermissionChecker([PermissionsType.PAYMENT_EXPORT]))
+):
+    """Stream every matching payment, oldest first; transaction ids need the sensitive-data permission"""
+    columns = PAYMENT_EXPORT_COLUMNS
+    if principal.has_permission(PermissionsType.PAYMENT_VIEW_SENSITIVE):
+        columns += PAYMENT_SENSITIVE_COLUMNS
+    return export_response(
+        export_payments(status_, created_from, created_to), export_format, columns, "payments", compress
+    )
@@ -1,49 +1,229 @@
-from typing import List
+from decimal import Decimal
+from typing import List, Optional
 from uuid import UUID
-from fastapi import APIRouter, status, Depends, HTTPException
+from fastapi import APIRouter, status, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.exc import IntegrityError
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
-from app.models.product import Product, ProductCategory, Category
-from app.schemas.product_schema import ProductCreate, ProductRead, ProductUpdate
-from app.db import get_session
+from app.models.product import Product, ProductImage, ProductVariant, Category
+from app.schemas.product_schema import (
+    ProductCreate, ProductRead, ProductUpdate, ProductPage, ProductFilter, ProductSort, ProductStatus,
+    ProductBatchItem, ProductBatchRequest, ProductImportReport, ProductSearchResult, VariantStockRead, VariantStockSharding
+)
+from app.permissions import PermissionsType
+from app.security.auth import PermissionChecker
+from app.security.rate_limit import CATALOG, RateLimit
+from app.services.cache_versions import CATEGORY_TREE, PRODUCTS, bump_version, version_tracker
+from app.services.product_cache import product_cache
+from app.services.product_import import IMPORT_BATCH_SIZE, ImportFormat, import_products, parse_records
+from app.services.inventory import StockBusy, set_stock_shards, variant_stock
+from app.services.product_query import (
+    PRODUCT_EXPORT_COLUMNS, PRODUCT_EXPORT_FLAT_COLUMNS, PRODUCT_EXPORT_FLAT_TYPES, PRODUCT_LOAD_OPTIONS,
+    export_products, fetch_products, flatten_products, list_products, page_stock_digest, product_facets, stock_digest
+)
+from app.services.search import get_search_backend
+from app.utils.conditional import cache_headers, is_not_modified, make_etag
+from app.utils.datetime_now import datetime_now
+from app.utils.export import ExportFormat, export_response
+from app.utils.json_response import FastJSONResponse, dumps
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.db import get_read_session, get_session
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(RateLimit(CATALOG))])
+
+def product_filter_params(
+    status_: Optional[List[ProductStatus]] = Query(default=None, alias="status"),
+    min_price: Optional[Decimal] = Query(default=None, ge=0),
+    max_price: Optional[Decimal] = Query(default=None, ge=0),
+    category: Optional[List[UUID]] = Query(default=None),
+    category_tree: Optional[UUID] = Query(default=None, description="Match products anywhere under this category"),
+    attr: Optional[List[str]] = Query(default=None, description="Variant attribute filter as key:value")
+) -> ProductFilter:
+    """Collect the product filter query parameters"""
+    attributes = {}
+    for item in attr or []:
+        key, sep, value = item.partition(":")
+        if not sep or not key:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid attribute filter '{item}'")
+        attributes[key] = value
+
+    return ProductFilter(
+        statuses=status_,
+        min_price=min_price,
+        max_price=max_price,
+        category_ids=category,
+        category_subtree_id=category_tree,
+        attributes=attributes
+    )
 
 @router.post("/products", response_model=ProductRead, status_code=status.HTTP_201_CREATED, summary="Create a new product")
 async def create_product(product_in: ProductCreate, session: AsyncSession = Depends(get_session)):
-    product = Product.model_validate(product_in)
+    """Create a product with its variants, images and category links in one transaction"""
+    categories = []
+    if product_in.categories_ids:
+        category_ids = set(product_in.categories_ids)
+        result = await session.exec(select(Category).where(Category.id.in_(category_ids)))
+        categories = result.all()
+        if len(categories) != len(category_ids):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
+
+    product = Product.model_validate(product_in.model_dump(exclude={"variants", "images", "categories_ids"}))
+    product.categories = categories
+    product.variants = [
+        ProductVariant(**variant.model_dump(exclude={"product_id"})) for variant in product_in.variants or []
+    ]
+    product.images = [
+        ProductImage(**image.model_dump(exclude={"product_id"})) for image in product_in.images or []
+    ]
     session.add(product)
+    try:
+        await session.flush()
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A variant SKU already exists")
+
+    await get_search_backend(session).index_products(session, [product.id])
+    await bump_version(session, PRODUCTS)
     await session.commit()
-    await session.refresh(product)
-    
-    # Process category associations if provided
-    if product_in.categories_ids:
-        for category_id in product_in.categories_ids:
-            # Optionally, check if the category exists before association
-            category = await session.get(Category, category_id)
-            if not category:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
-            
-            # Create the association
-            session.add(ProductCategory(product_id=product.id, category_id=category_id))
-            
-        await session.commit()
-
-    # Refresh the product to get the updated relationships
-    await session.refresh(product)
-    return product
-
-@router.get("/products", response_model=List[ProductRead], summary="Get all products")
-async def read_products(session: AsyncSession = Depends(get_session)):
-    products = await session.exec(select(Product))
-    return products.all()
+    version_tracker.invalidate(PRODUCTS)
+
+    result = await session.exec(
+        select(Product).where(Product.id == product.id).options(*PRODUCT_LOAD_OPTIONS).execution_options(populate_existing=True)
+    )
+    return result.one()
+
+@router.post("/products/import", response_model=ProductImportReport, summary="Bulk import products from CSV or NDJSON", dependencies=[Depends(PermissionChecker([PermissionsType.PRODUCT_WRITE]))])
+async def import_products_file(
+    request: Request,
+    import_format: ImportFormat = Query(default=ImportFormat.NDJSON, alias="format"),
+    batch_size: int = Query(default=IMPORT_BATCH_SIZE, ge=1, le=5000),
+    session: AsyncSession = Depends(get_session)
+):
+    """Stream the request body into the catalog in batches.
+
+    Products are upserted by id (or matched through their variants' SKUs) and
+    variants by SKU. Rejected records are listed in the report with their line
+    numbers; they never abort the rest of the import.
+    """
+    return await import_products(session, parse_records(request.stream(), import_format), batch_size)
+
+@router.get("/products", response_model=ProductPage, summary="Get a page of products")
+async def read_products(
+    request: Request,
+    product_filter: ProductFilter = Depends(product_filter_params),
+    sort: ProductSort = Query(default=ProductSort.NEWEST),
+    cursor: Optional[str] = Query(default=None, description="Cursor returned as next_cursor by the previous page"),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    facets: bool = Query(default=False, description="Include facet counts for the filtered products"),
+    session: AsyncSession = Depends(get_read_session)
+):
+    """List products matching the filters, keyset-paginated on the sort key and id.
+
+    Pages are validated by the product and category versions plus a digest
+    of the page's stock, which checkouts and reservations change without
+    touching any version. A repeat request answers 304 after one query over
+    the page's ids and variant stock, loading nothing else. There is no
+    Last-Modified: stock changes carry no timestamp.
+    """
+    products_version, _ = await version_tracker.get(session, PRODUCTS)
+    categories_version, _ = await version_tracker.get(session, CATEGORY_TREE)
+    try:
+        stock = await page_stock_digest(session, product_filter, sort, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    etag = make_etag(products_version, categories_version, stock)
+    headers = cache_headers("products", etag, None)
+    if is_not_modified(request, etag, None):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    page = await list_products(session, product_filter, sort, cursor, limit)
+
+    if facets:
+        page.facets = await product_facets(session, product_filter)
+    # The page is already validated, so serialize it directly instead of through response_model
+    return FastJSONResponse(page, headers=headers)
+
+@router.post("/products/batch", response_model=List[ProductBatchItem], summary="Get many products by id or SKU")
+async def read_product_batch(batch: ProductBatchRequest, session: AsyncSession = Depends(get_read_session)):
+    """Up to MAX_PRODUCT_BATCH products in one request, in the order asked for.
+
+    Keys that match no product come back with found=false instead of failing the batch.
+    """
+    return FastJSONResponse(await fetch_products(session, batch.ids, batch.skus))
+
+@router.get("/products/search", response_model=List[ProductSearchResult], summary="Search products")
+async def search_products(
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    session: AsyncSession = Depends(get_read_session)
+):
+    """Ranked full-text search over product names, descriptions, SKUs and variant attributes"""
+    hits = await get_search_backend(session).search(session, q, limit)
+    if not hits:
+        return []
+
+    result = await session.exec(
+        select(Product).where(Product.id.in_([product_id for product_id, _ in hits])).options(*PRODUCT_LOAD_OPTIONS)
+    )
+    products = {product.id: product for product in result.all()}
+    return FastJSONResponse([
+        ProductSearchResult(product=products[product_id], score=score)
+        for product_id, score in hits
+        if product_id in products
+    ])
+
+@router.get("/products/export", summary="Export products as CSV, NDJSON or Parquet", dependencies=[Depends(PermissionChecker([PermissionsType.REPORT_EXPORT]))])
+async def export_products_file(
+    product_filter: ProductFilter = Depends(product_filter_params),
+    export_format: ExportFormat = Query(default=ExportFormat.NDJSON, alias="format"),
+    compress: bool = Query(default=False, alias="gzip")
+):
+    """Stream every matching product, oldest first, in a layout the bulk import accepts.
+
+    NDJSON nests variants, images and category ids in one record per product;
+    CSV and Parquet have one row per variant.
+    """
+    records = export_products(product_filter)
+    if export_format == ExportFormat.NDJSON:
+        return export_response(records, export_format, PRODUCT_EXPORT_COLUMNS, "products", compress)
+    return export_response(
+        flatten_products(records), export_format, PRODUCT_EXPORT_FLAT_COLUMNS, "products", compress, PRODUCT_EXPORT_FLAT_TYPES
+    )
 
 @router.get("/products/{product_id}", response_model=ProductRead, summary="Get a product by ID")
-async def read_product(product_id: UUID, session: AsyncSession = Depends(get_session)):
-    product = await session.get(Product, product_id)
-    if not product:
+async def read_product(product_id: UUID, request: Request, session: AsyncSession = Depends(get_read_session)):
+    """Validated by the product's own timestamp, the category version and a digest of its variants' stock;
+    a 304 loads no relationships. There is no Last-Modified: stock changes carry no timestamp.
+
+    Bodies come from the product cache, keyed by the same ETag, which shares one load between concurrent misses.
+    """
+    categories_version, _ = await version_tracker.get(session, CATEGORY_TREE)
+    result = await session.exec(
+        select(
+            Product.updated_at,
+            Product.created_at,
+            stock_digest(ProductVariant.product_id == Product.id).label("stock")
+        ).where(Product.id == product_id)
+    )
+    row = result.first()
+    if not row:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+
+    changed = row.updated_at or row.created_at
+    etag = make_etag(int(changed.timestamp() * 1_000_000), categories_version, row.stock)
+    headers = cache_headers("product", etag, None)
+    if is_not_modified(request, etag, None):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    async def load() -> Optional[bytes]:
+        result = await session.exec(select(Product).where(Product.id == product_id).options(*PRODUCT_LOAD_OPTIONS))
+        product = result.first()
+        return dumps(ProductRead.model_validate(product)) if product else None
+
+    body = await product_cache.get(product_id, etag, load)
+    if body is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-    return product
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.patch("/products/{product_id}", response_model=ProductRead, summary="Update a product by ID")
 async def update_product(product_id: UUID, product_in: ProductUpdate, session: AsyncSession = Depends(get_session)):
@@ -54,17 +234,57 @@ async def update_product(product_id: UUID, product_in: ProductUpdate, session: A
     update_data = product_in.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(product, key, value)
+    product.updated_at = datetime_now()
     
     session.add(product)
+    await session.flush()
+    await get_search_backend(session).index_products(session, [product.id])
+    await bump_version(session, PRODUCTS)
     await session.commit()
-    await session.refresh(product)
-    return product
+    version_tracker.invalidate(PRODUCTS)
+
+    result = await session.exec(
+        select(Product).where(Product.id == product_id).options(*PRODUCT_LOAD_OPTIONS).execution_options(populate_existing=True)
+    )
+    return result.one()
 
 @router.delete("/products/{product_id}", status_code=status.HTTP_204_NO_CONTENT, summary="Delete a product by ID")
 async def delete_product(product_id: UUID, session: AsyncSession = Depends(get_session)):
     product = await session.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-    session.delete(product)
+    await session.delete(product)
+    await bump_version(session, PRODUCTS)
+    await session.commit()
+    version_tracker.invalidate(PRODUCTS)
+    return
+
+@router.get("/variants/{variant_id}/stock", response_model=VariantStockRead, summary="Get a variant's stock, including its shards", dependencies=[Depends(PermissionChecker([PermissionsType.PRODUCT_MANAGE_INVENTORY]))])
+async def read_variant_stock(variant_id: UUID, session: AsyncSession = Depends(get_session)):
+    stock = await variant_stock(session, variant_id)
+    if stock is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Variant not found")
+    return stock
+
+@router.put("/variants/{variant_id}/stock-shards", response_model=VariantStockRead, summary="Shard a hot variant's stock, or fold it back with 0", dependencies=[Depends(PermissionChecker([PermissionsType.PRODUCT_MANAGE_INVENTORY]))])
+async def update_variant_stock_shards(variant_id: UUID, sharding: VariantStockSharding, session: AsyncSession = Depends(get_session)):
+    """Spread unreserved stock over N shard rows so concurrent checkouts stop queueing on one row lock"""
+    return await _reshard(session, variant_id, sharding.shards)
+
+@router.post("/variants/{variant_id}/stock-shards/rebalance", response_model=VariantStockRead, summary="Even out a sharded variant's stock across its shards", dependencies=[Depends(PermissionChecker([PermissionsType.PRODUCT_MANAGE_INVENTORY]))])
+async def rebalance_variant_stock_shards(variant_id: UUID, session: AsyncSession = Depends(get_session)):
+    return await _reshard(session, variant_id)
+
+async def _reshard(session: AsyncSession, variant_id: UUID, shards: Optional[int] = None) -> VariantStockRead:
+    """Redistribute a variant's stock over `shards` shards (its current count when None)"""
+    stock = await variant_stock(session, variant_id)
+    if stock is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Variant not found")
+    try:
+        await set_stock_shards(session, variant_id, stock.stock_shards if shards is None else shards)
+    except StockBusy as e:
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     await session.commit()
-    return
\ No newline at end of file
+    session.expunge_all()
+    return await variant_stock(session, variant_id)
@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from uuid import UUID
 from typing import List
-from app.security.auth import PermissionChecker, RoleManager
-from app.security.hashing import get_password_hash
+from app.security.auth import PermissionChecker, RoleManager, invalidate_principal
+from app.security.hashing import password_hasher
 from app.models.user import User, Role
 from app.db import get_session
 from sqlmodel.ext.asyncio.session import AsyncSession
@@ -18,7 +18,7 @@ router = APIRouter()
 async def create_user(user_in: UserCreate, session: AsyncSession = Depends(get_session)):
     """Create a new user"""
     user_data = user_in.model_dump()
-    user_data["hashed_password"] = get_password_hash(user_in.password)
+    user_data["hashed_password"] = await password_hasher.hash(user_in.password)
 
     user_data.pop("password", None)
 
@@ -72,11 +72,13 @@ async def update_user(user_id: str, user_in: UserUpdate, session: AsyncSession =
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
+    previous_email = user.email
     update_data = user_in.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(user, key, value)
     
     await session.commit()
+    invalidate_principal(previous_email)
     await session.refresh(user)
     return user
 
@@ -91,8 +93,9 @@ async def delete_user(user_id: str, session: AsyncSession = Depends(get_session)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
-    session.delete(user)
+    await session.delete(user)
     await session.commit()
+    invalidate_principal(user.email)
     return
 
 @router.post("/users/{user_id}/permissions", dependencies=[Depends(PermissionChecker([PermissionsType.USER_MANAGE]))])
@@ -112,6 +115,7 @@ async def grant_permission(user_id: str, permission: str, session: AsyncSession
     
     session.add(user)
     await session.commit()
+    invalidate_principal(user.email)
     return {"message": f"Permission '{permission}' granted to {user.email}"}
 
 @router.post("/users/{user_id}/roles", dependencies=[Depends(PermissionChecker([PermissionsType.USER_MANAGE_ROLES]))])
@@ -0,0 +1,122 @@
+from typing import List
+from uuid import UUID
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.product import ProductVariant
+from app.schemas.product_schema import (
+    MAX_BULK_WRITE, MAX_STOCK_ADJUSTMENTS, ProductVariantBulkUpdate, ProductVariantCreate, ProductVariantRead,
+    StockAdjustment, StockAdjustmentReport
+)
+from app.permissions import PermissionsType
+from app.security.auth import PermissionChecker
+from app.security.rate_limit import CATALOG, RateLimit
+from app.services.product_cache import product_cache
+from app.services.product_writes import (
+    adjust_stock, create_variants, delete_variants, ensure_product, forget_products, touch_products, update_variants
+)
+from app.db import get_read_session, get_session
+
+router = APIRouter(dependencies=[Depends(RateLimit(CATALOG))])
+
+async def _read_variants(session: AsyncSession, product_id: UUID, variant_ids: List[UUID]) -> List[ProductVariant]:
+    """The product's variants with the given ids, in that order"""
+    result = await session.exec(
+        select(ProductVariant)
+        .where(ProductVariant.product_id == product_id, ProductVariant.id.in_(variant_ids))
+        .options(joinedload(ProductVariant.product))
+        .execution_options(populate_existing=True)
+    )
+    variants = {variant.id: variant for variant in result.all()}
+    return [variants[variant_id] for variant_id in variant_ids]
+
+async def _commit(session: AsyncSession, product_id: UUID) -> None:
+    await touch_products(session, [product_id])
+    await session.commit()
+    forget_products([product_id])
+
+def _conflict(e: IntegrityError) -> HTTPException:
+    if "ck_product_variant_reserved_within_stock" in str(e.orig):
+        return HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Stock cannot drop below the reserved quantity")
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A variant SKU already exists")
+
+@router.post("/variants/stock-adjustments", response_model=StockAdjustmentReport, summary="Adjust the stock of many SKUs at once", dependencies=[Depends(PermissionChecker([PermissionsType.PRODUCT_MANAGE_INVENTORY]))])
+async def adjust_variant_stock(
+    adjustments: List[StockAdjustment] = Body(min_length=1, max_length=MAX_STOCK_ADJUSTMENTS),
+    session: AsyncSession = Depends(get_session)
+):
+    """Apply stock deltas by SKU in one statement, e.g. from a warehouse sync.
+
+    SKUs that are unknown or would fall below their reserved stock are
+    reported and left unchanged; the rest are applied.
+    """
+    report, product_ids = await adjust_stock(session, adjustments)
+    await session.commit()
+    # The stock digest in the ETag already retires cached bodies; this only frees them early
+    product_cache.invalidate(product_ids)
+    return report
+
+@router.get("/products/{product_id}/variants", response_model=List[ProductVariantRead], summary="Get a product's variants")
+async def read_variants(product_id: UUID, session: AsyncSession = Depends(get_read_session)):
+    await ensure_product(session, product_id)
+    result = await session.exec(
+        select(ProductVariant)
+        .where(ProductVariant.product_id == product_id)
+        .options(joinedload(ProductVariant.product))
+        .order_by(ProductVariant.sku)
+    )
+    return result.all()
+
+@router.post("/products/{product_id}/variants", response_model=List[ProductVariantRead], status_code=status.HTTP_201_CREATED, summary="Add variants to a product", dependencies=[Depends(PermissionChecker([PermissionsType.PRODUCT_MANAGE_VARIANTS]))])
+async def add_variants(
+    product_id: UUID,
+    variants: List[ProductVariantCreate] = Body(min_length=1, max_length=MAX_BULK_WRITE),
+    session: AsyncSession = Depends(get_session)
+):
+    await ensure_product(session, product_id)
+    try:
+        variant_ids = await create_variants(session, product_id, variants)
+    except IntegrityError as e:
+        await session.rollback()
+        raise _conflict(e)
+    await _commit(session, product_id)
+    return await _read_variants(session, product_id, variant_ids)
+
+@router.patch("/products/{product_id}/variants", response_model=List[ProductVariantRead], summary="Update many variants of a product", dependencies=[Depends(PermissionChecker([PermissionsType.PRODUCT_MANAGE_VARIANTS]))])
+async def edit_variants(
+    product_id: UUID,
+    changes: List[ProductVariantBulkUpdate] = Body(min_length=1, max_length=MAX_BULK_WRITE),
+    session: AsyncSession = Depends(get_session)
+):
+    """Fields left out or null keep their value; stock of sharded variants is only changed through the stock endpoints"""
+    variant_ids = [change.id for change in changes]
+    if len(set(variant_ids)) != len(variant_ids):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Each variant may only appear once")
+    await ensure_product(session, product_id)
+    try:
+        updated = await update_variants(session, product_id, changes)
+    except IntegrityError as e:
+        await session.rollback()
+        raise _conflict(e)
+    if len(updated) != len(variant_ids):
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Variant not found")
+    await _commit(session, product_id)
+    return await _read_variants(session, product_id, variant_ids)
+
+@router.delete("/products/{product_id}/variants", status_code=status.HTTP_204_NO_CONTENT, summary="Delete many variants of a product", dependencies=[Depends(PermissionChecker([PermissionsType.PRODUCT_MANAGE_VARIANTS]))])
+async def remove_variants(
+    product_id: UUID,
+    ids: List[UUID] = Query(min_length=1, max_length=MAX_BULK_WRITE),
+    session: AsyncSession = Depends(get_session)
+):
+    """Order lines keep their price but lose the link to the variant; its live reservations are dropped"""
+    await ensure_product(session, product_id)
+    deleted = await delete_variants(session, product_id, set(ids))
+    if len(deleted) != len(set(ids)):
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Variant not found")
+    await _commit(session, product_id)
+    return
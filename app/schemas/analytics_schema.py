@@ -0,0 +1,38 @@
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Dict, List, Optional
+from uuid import UUID
+from sqlmodel import SQLModel
+from app.schemas.order_schema import OrderStatus
+
+class RollupGranularity(str, Enum):
+    HOUR = "hour"
+    DAY = "day"
+
+class SalesBucket(SQLModel):
+    bucket_start: datetime
+    order_count: int = 0
+    # Units, revenue and payments exclude cancelled orders
+    units_sold: int = 0
+    revenue: Decimal = Decimal(0)
+    paid_amount: Decimal = Decimal(0)
+    orders_by_status: Dict[OrderStatus, int] = {}
+
+class SalesSeries(SQLModel):
+    granularity: RollupGranularity
+    start: datetime
+    end: datetime
+    buckets: List[SalesBucket] = []
+
+class TopVariant(SQLModel):
+    variant_id: UUID
+    sku: Optional[str] = None
+    units_sold: int
+    revenue: Decimal
+
+class TopCategory(SQLModel):
+    category_id: UUID
+    name: Optional[str] = None
+    units_sold: int
+    revenue: Decimal
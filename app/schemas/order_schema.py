@@ -1,6 +1,10 @@
+from datetime import datetime
 from decimal import Decimal
 from enum import Enum
+from typing import List, Optional
+from uuid import UUID
 from sqlmodel import SQLModel, Field, Column, Numeric
+from pydantic import ConfigDict
 from sqlalchemy.dialects.postgresql import ENUM
 
 order_status_enum = ENUM(
@@ -27,4 +31,67 @@ class OrderBase(SQLModel):
             server_default=OrderStatus.PENDING.value
         )
     )
-    shipping_address: str
\ No newline at end of file
+    shipping_address: str
+
+class CheckoutItem(SQLModel):
+    variant_id: UUID
+    quantity: int = Field(ge=1, le=1000)
+
+class CheckoutCreate(SQLModel):
+    shipping_address: str = Field(min_length=1, max_length=500)
+    items: List[CheckoutItem] = Field(min_length=1, max_length=100)
+
+class ReservationItem(SQLModel):
+    variant_id: UUID
+    # 0 releases the reservation
+    quantity: int = Field(ge=0, le=1000)
+
+class ReservationRead(SQLModel):
+    variant_id: UUID
+    quantity: int
+    expires_at: datetime
+    model_config = ConfigDict(
+        from_attributes=True,
+        arbitrary_types_allowed=True
+    )
+
+class OrderItemRead(SQLModel):
+    id: UUID
+    variant_id: Optional[UUID] = None
+    quantity: int
+    price_at_purchase: Decimal
+    model_config = ConfigDict(
+        from_attributes=True,
+        arbitrary_types_allowed=True
+    )
+
+class OrderRead(SQLModel):
+    id: UUID
+    user_id: Optional[UUID] = None
+    total_amount: Decimal
+    status: OrderStatus
+    shipping_address: str
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    items: List[OrderItemRead] = []
+    model_config = ConfigDict(
+        from_attributes=True,
+        arbitrary_types_allowed=True
+    )
+
+class OrderListRead(OrderRead):
+    total_paid: Decimal
+    total_due: Decimal
+    is_fully_paid: bool
+
+class OrderFilter(SQLModel):
+    statuses: Optional[List[OrderStatus]] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+    user_id: Optional[UUID] = None
+    # True: orders with an amount due, False: paid in full
+    unpaid: Optional[bool] = None
+
+class OrderPage(SQLModel):
+    items: List[OrderListRead] = []
+    next_cursor: Optional[str] = None
@@ -4,7 +4,7 @@ from uuid import UUID
 from enum import Enum
 from decimal import Decimal
 from sqlmodel import SQLModel, Field, Column, Numeric
-from pydantic import ConfigDict, field_validator
+from pydantic import AliasChoices, ConfigDict, Field as PydanticField, field_validator, model_validator
 from sqlalchemy.dialects.postgresql import ENUM
 
 class ProductStatus(str, Enum):
@@ -38,6 +38,32 @@ class ProductCreate(ProductBase):
     # Use a list of UUID to associate existing categories
     categories_ids: Optional[List[UUID]] = None
 
+class ProductImportRecord(ProductCreate):
+    """One product in a bulk import"""
+    # Product to update; when omitted the product is matched through its variants' SKUs, or created
+    id: Optional[UUID] = None
+    status: ProductStatus = ProductStatus.DRAFT
+
+    @field_validator("variants")
+    def validate_unique_skus(cls, v):
+        skus = [variant.sku for variant in v or []]
+        if len(skus) != len(set(skus)):
+            raise ValueError("Variant SKUs must be unique")
+        return v
+
+class ImportRowError(SQLModel):
+    # Line the record starts on, counting from 1
+    row: int
+    message: str
+
+class ProductImportReport(SQLModel):
+    processed: int = 0
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    # Capped; `failed` counts every rejected record
+    errors: List[ImportRowError] = []
+
 class ProductReadBase(SQLModel):
     id: UUID
     name: str
@@ -62,6 +88,70 @@ class ProductRead(ProductReadBase):
         }
     )
 
+class ProductSort(str, Enum):
+    NEWEST = "newest"
+    OLDEST = "oldest"
+    PRICE_ASC = "price_asc"
+    PRICE_DESC = "price_desc"
+    NAME_ASC = "name_asc"
+    NAME_DESC = "name_desc"
+
+class ProductFilter(SQLModel):
+    statuses: Optional[List[ProductStatus]] = None
+    min_price: Optional[Decimal] = None
+    max_price: Optional[Decimal] = None
+    category_ids: Optional[List[UUID]] = None
+    # Match products in this category or any of its descendants
+    category_subtree_id: Optional[UUID] = None
+    # Products match when at least one variant carries all of these attributes
+    attributes: Dict[str, str] = {}
+
+class PriceBucketCount(SQLModel):
+    min_price: Decimal
+    max_price: Optional[Decimal] = None
+    count: int
+
+class ProductFacets(SQLModel):
+    categories: Dict[UUID, int] = {}
+    statuses: Dict[ProductStatus, int] = {}
+    price_buckets: List[PriceBucketCount] = []
+
+class ProductPage(SQLModel):
+    items: List[ProductRead] = []
+    next_cursor: Optional[str] = None
+    facets: Optional[ProductFacets] = None
+
+class ProductSearchResult(SQLModel):
+    product: ProductRead
+    score: float
+
+# Most keys one batch fetch may ask for
+MAX_PRODUCT_BATCH = 100
+
+# Most variants or images one bulk create, update or delete may carry
+MAX_BULK_WRITE = 500
+
+# Most SKUs one stock adjustment request may carry
+MAX_STOCK_ADJUSTMENTS = 10_000
+
+class ProductBatchRequest(SQLModel):
+    """Products to fetch, either by id or by the SKU of one of their variants"""
+    ids: List[UUID] = PydanticField(default=[], max_length=MAX_PRODUCT_BATCH)
+    skus: List[str] = PydanticField(default=[], max_length=MAX_PRODUCT_BATCH)
+
+    @model_validator(mode="after")
+    def validate_one_kind(self):
+        if bool(self.ids) == bool(self.skus):
+            raise ValueError("Send either ids or skus")
+        return self
+
+class ProductBatchItem(SQLModel):
+    """One requested key and its product; product is null when nothing matched the key"""
+    id: Optional[UUID] = None
+    sku: Optional[str] = None
+    found: bool
+    product: Optional[ProductRead] = None
+
 class ProductUpdate(SQLModel):
     name: Optional[str] = None
     description: Optional[str] = None
@@ -69,35 +159,73 @@ class ProductUpdate(SQLModel):
     status: Optional[ProductStatus] = None
 
 class ProductVariantCreate(SQLModel):
-    product_id: UUID
-    sku: str
+    # Omitted when the variant is created together with its product
+    product_id: Optional[UUID] = None
+    sku: str = Field(min_length=1, max_length=50)
     attributes: Optional[Dict[str, str]] = {}
-    price_offset: Optional[Decimal] = 0.00
-    stock_quantity: int
+    price_offset: Optional[Decimal] = Decimal("0.00")
+    stock_quantity: int = Field(ge=0)
 
 class ProductVariantRead(SQLModel):
     id: UUID
     sku: str
     attributes: Dict[str, str]
     price_offset: Decimal
-    stock_quantity: int
+    # Includes stock held in shards
+    stock_quantity: int = PydanticField(validation_alias=AliasChoices("total_stock", "stock_quantity"))
+    available_quantity: int
     final_price: Decimal  # Include computed property
     model_config = ConfigDict(
         from_attributes=True,
         arbitrary_types_allowed=True
     )
 
+class VariantStockSharding(SQLModel):
+    # 0 turns sharding off
+    shards: int = Field(ge=0, le=64)
+
+class VariantStockRead(SQLModel):
+    variant_id: UUID
+    stock_shards: int
+    stock_quantity: int
+    reserved_quantity: int
+    available_quantity: int
+    # Unreserved stock per shard, in shard order
+    shard_quantities: List[int] = []
+
 class ProductVariantUpdate(SQLModel):
     sku: Optional[str] = Field(default=None, max_length=50)
     attributes: Optional[Dict[str, str]] = None
     price_offset: Optional[Decimal] = Field(default=None, max_digits=10, decimal_places=2)
     stock_quantity: Optional[int] = Field(default=None, ge=0)
 
+class ProductVariantBulkUpdate(ProductVariantUpdate):
+    """One variant's changes in a bulk update; fields left out or null keep their value"""
+    id: UUID
+
+class StockAdjustment(SQLModel):
+    sku: str = Field(min_length=1, max_length=50)
+    # Units to add, or remove when negative
+    delta: int
+
+class AdjustedStock(SQLModel):
+    sku: str
+    # Stock on the variant row after the adjustment (shards not included)
+    stock_quantity: int
+    reserved_quantity: int
+
+class StockAdjustmentReport(SQLModel):
+    adjusted: List[AdjustedStock] = []
+    unknown_skus: List[str] = []
+    # Removing this much would take the variant below its reserved quantity
+    insufficient_skus: List[str] = []
+
 class ProductImageCreate(SQLModel):
-    product_id: UUID
-    image_url: str
-    image_alt: str
-    caption: Optional[str] = None
+    # Omitted when the image is created together with its product
+    product_id: Optional[UUID] = None
+    image_url: str = Field(max_length=500)
+    image_alt: str = Field(max_length=100)
+    caption: Optional[str] = Field(default=None, max_length=100)
     sort_order: Optional[int] = 0
 
 class ProductImageRead(SQLModel):
@@ -118,6 +246,10 @@ class ProductImageUpdate(SQLModel):
     caption: Optional[str] = Field(default=None, max_length=100)
     sort_order: Optional[int] = Field(default=None)
 
+class ProductImageBulkUpdate(ProductImageUpdate):
+    """One image's changes in a bulk update; fields left out or null keep their value"""
+    id: UUID
+
 class CategoryCreate(SQLModel):
     name: str
     parent_id: Optional[UUID] = None
@@ -137,13 +269,25 @@ class CategoryRead(SQLModel):
     id: UUID
     name: str
     parent_id: Optional[UUID] = None
+    depth: int = 0
     model_config = ConfigDict(
         from_attributes=True,
         arbitrary_types_allowed=True
     )
 
+class CategoryTreeNode(SQLModel):
+    id: UUID
+    name: str
+    children: List["CategoryTreeNode"] = []
+
 
+ProductCreate.model_rebuild()
+ProductImportRecord.model_rebuild()
 ProductRead.model_rebuild()
+ProductPage.model_rebuild()
+ProductSearchResult.model_rebuild()
+ProductBatchItem.model_rebuild()
 ProductVariantRead.model_rebuild()
 ProductImageRead.model_rebuild()
-CategoryRead.model_rebuild()
\ No newline at end of file
+CategoryRead.model_rebuild()
+CategoryTreeNode.model_rebuild()
\ No newline at end of file
@@ -3,7 +3,7 @@ from typing import Optional, List
 from uuid import UUID
 from sqlmodel import SQLModel, Field, Column
 from pydantic import ConfigDict, field_validator, EmailStr
-from app.permissions import RoleType
+from app.permissions import RoleType, PermissionsType
 
 
 class UserBase(SQLModel):
@@ -67,3 +67,7 @@ class LoginAccessTokenRead(SQLModel):
     refresh_token: str
     token_type: str
 
+class EffectivePermissionsRead(SQLModel):
+    user_id: UUID
+    roles: List[RoleType]
+    permissions: List[PermissionsType]
@@ -0,0 +1,87 @@
+"""Compare FastAPI's default response serialization with FastJSONResponse on a large product page.
+
+    python -m app.scripts.bench_json [--products 10000] [--repeat 5]
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from uuid import uuid4
+from fastapi.encoders import jsonable_encoder
+from app.schemas.product_schema import ProductPage, ProductStatus
+from app.utils.json_response import FastJSONResponse, orjson
+
+def build_page(count: int) -> ProductPage:
+    now = datetime.now(timezone.utc)
+    items = []
+    for i in range(count):
+        product_id = uuid4()
+        items.append({
+            "id": product_id,
+            "name": f"Product {i}",
+            "description": "A reasonably sized description for benchmarking purposes",
+            "base_price": Decimal("19.99"),
+            "status": ProductStatus.ACTIVE,
+            "created_at": now,
+            "updated_at": now,
+            "variants": [
+                {
+                    "id": uuid4(),
+                    "sku": f"SKU-{i}-{v}",
+                    "attributes": {"color": "red", "size": str(v)},
+                    "price_offset": Decimal("1.50"),
+                    "stock_quantity": 10,
+                    "available_quantity": 8,
+                    "final_price": Decimal("21.49"),
+                }
+                for v in range(2)
+            ],
+            "images": [
+                {
+                    "id": uuid4(),
+                    "product_id": product_id,
+                    "image_url": f"https://cdn.example.com/{i}.jpg",
+                    "image_alt": f"Product {i}",
+                    "sort_order": 0,
+                }
+            ],
+            "categories": [{"id": uuid4(), "name": "Category", "parent_id": None, "depth": 0}],
+        })
+    return ProductPage.model_validate({"items": items})
+
+def default_path(page: ProductPage) -> bytes:
+    """What FastAPI does for a returned model with response_model set"""
+    revalidated = ProductPage.model_validate(page.model_dump())
+    content = jsonable_encoder(revalidated)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+def fast_path(page: ProductPage) -> bytes:
+    return FastJSONResponse(page).body
+
+def timed(fn, page: ProductPage, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(page)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    page = build_page(args.products)
+    assert json.loads(default_path(page)) == json.loads(fast_path(page))
+
+    default_time = timed(default_path, page, args.repeat)
+    fast_time = timed(fast_path, page, args.repeat)
+    print(f"products: {args.products} (orjson {'available' if orjson else 'unavailable'})")
+    print(f"default response path: {default_time * 1000:9.1f} ms")
+    print(f"FastJSONResponse:      {fast_time * 1000:9.1f} ms")
+    print(f"speedup:               {default_time / fast_time:9.1f}x")
+
+if __name__ == "__main__":
+    main()
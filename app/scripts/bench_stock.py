@@ -0,0 +1,95 @@
+"""Checkout throughput on one hot variant: single stock row vs sharded stock.
+
+Runs against the configured database (development only) on a throwaway
+product that is removed afterwards.
+
+    python -m app.scripts.bench_stock [--shards 16] [--concurrency 1 8 32] [--checkouts 500] [--hold-ms 5]
+"""
+import argparse
+import asyncio
+import time
+from uuid import UUID
+from sqlalchemy import delete
+from app.config import Environment, get_settings
+from app.db import AsyncSessionLocal, async_engine
+from app.models.order import Order, OrderItem
+from app.models.product import Product, ProductVariant
+from app.schemas.order_schema import OrderStatus
+from app.schemas.product_schema import ProductStatus
+from app.services.inventory import InsufficientStock, set_stock_shards, take_stock
+
+settings = get_settings()
+
+async def create_variant(stock: int, shards: int) -> UUID:
+    async with AsyncSessionLocal() as session:
+        product = Product(name="bench_stock", base_price=10, status=ProductStatus.ACTIVE)
+        session.add(product)
+        await session.flush()
+        variant = ProductVariant(product_id=product.id, sku=f"bench-{product.id.hex[:12]}", stock_quantity=stock)
+        session.add(variant)
+        await session.flush()
+        if shards:
+            await set_stock_shards(session, variant.id, shards)
+        await session.commit()
+        return variant.id
+
+async def checkout(variant_id: UUID, hold: float) -> bool:
+    async with AsyncSessionLocal() as session:
+        try:
+            prices = await take_stock(session, {variant_id: 1})
+        except InsufficientStock:
+            await session.rollback()
+            return False
+        # Stand-in for the rest of a real checkout (network round trips, payment calls) while the lock is held
+        await asyncio.sleep(hold)
+        item = OrderItem(variant_id=variant_id, quantity=1, price_at_purchase=prices[variant_id])
+        session.add(Order(total_amount=item.total_price, status=OrderStatus.PENDING, shipping_address="bench", items=[item]))
+        await session.commit()
+        return True
+
+async def run(variant_id: UUID, concurrency: int, checkouts: int, hold: float) -> tuple[float, int]:
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(checkouts):
+        queue.put_nowait(None)
+    succeeded = 0
+
+    async def worker():
+        nonlocal succeeded
+        while not queue.empty():
+            queue.get_nowait()
+            if await checkout(variant_id, hold):
+                succeeded += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, succeeded
+
+async def cleanup() -> None:
+    async with AsyncSessionLocal() as session:
+        await session.exec(delete(Order).where(Order.shipping_address == "bench"))
+        await session.exec(delete(Product).where(Product.name == "bench_stock"))
+        await session.commit()
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--checkouts", type=int, default=500)
+    parser.add_argument("--hold-ms", type=float, default=5.0, help="Extra time each checkout transaction stays open")
+    args = parser.parse_args()
+    if settings.environment != Environment.DEV:
+        raise RuntimeError("Benchmarks only run against a development database")
+
+    try:
+        print(f"{'concurrency':>11} {'mode':>12} {'checkouts/s':>12} {'sold':>6}")
+        for concurrency in args.concurrency:
+            for label, shards in (("single row", 0), (f"{args.shards} shards", args.shards)):
+                variant_id = await create_variant(args.checkouts, shards)
+                elapsed, sold = await run(variant_id, concurrency, args.checkouts, args.hold_ms / 1000)
+                print(f"{concurrency:>11} {label:>12} {args.checkouts / elapsed:>12.0f} {sold:>6}")
+    finally:
+        await cleanup()
+        await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,49 @@
+"""Bulk import products from a CSV or NDJSON file into the configured database.
+
+The file is read in chunks and written in batches, so memory stays flat
+however large it is. Rejected records are printed with their line numbers.
+
+    python -m app.scripts.import_products catalog.ndjson [--format ndjson] [--batch-size 500]
+"""
+import argparse
+import asyncio
+import time
+from pathlib import Path
+from typing import AsyncIterator
+from app.db import AsyncSessionLocal, async_engine
+from app.services.product_import import IMPORT_BATCH_SIZE, ImportFormat, import_products, parse_records
+
+# Bytes read from the file at a time
+READ_SIZE = 1024 * 1024
+
+async def read_chunks(path: Path) -> AsyncIterator[bytes]:
+    with path.open("rb") as file:
+        while chunk := file.read(READ_SIZE):
+            yield chunk
+
+async def main(path: Path, import_format: ImportFormat, batch_size: int) -> None:
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as session:
+        report = await import_products(session, parse_records(read_chunks(path), import_format), batch_size)
+    await async_engine.dispose()
+
+    elapsed = time.perf_counter() - start
+    for error in report.errors:
+        print(f"line {error.row}: {error.message}")
+    if report.failed > len(report.errors):
+        print(f"... and {report.failed - len(report.errors)} more rejected records")
+    print(
+        f"{report.processed} records in {elapsed:.1f}s: {report.created} created, "
+        f"{report.updated} updated, {report.failed} rejected"
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--format", type=ImportFormat, choices=list(ImportFormat), default=None,
+                        help="Defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    import_format = args.format or ImportFormat(args.path.suffix.lstrip(".").lower() or ImportFormat.NDJSON.value)
+    asyncio.run(main(args.path, import_format, args.batch_size))
@@ -4,11 +4,14 @@ from uuid import UUID
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
+from starlette.requests import HTTPConnection
 from app.config import get_settings
 from app.db import get_session
-from app.models.user import User, TokenData, Role, UserRole
+from app.models.user import User, TokenData, Role, UserRole, Principal
 from sqlmodel.ext.asyncio.session import AsyncSession
-from app.permissions import PermissionsType, RoleType
+from app.permissions import PermissionsType, RoleType, permission_mask
+from app.security.permission_matrix import permission_matrix
+from app.utils.ttl_cache import TTLCache
 from sqlmodel import select
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
@@ -19,6 +22,12 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 15  # Short expiration for security
 REFRESH_TOKEN_EXPIRE_DAYS = 7  # Long expiration for convenience
 ALGORITHM = "HS256"
 
+# Token subject (email) -> resolved principal
+principal_cache: TTLCache[str, Principal] = TTLCache(
+    maxsize=settings.principal_cache_size,
+    ttl=settings.principal_cache_ttl_seconds
+)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Generate a JWT access token"""
     to_encode = data.copy()
@@ -35,8 +44,44 @@ def create_refresh_token(data: dict) -> str:
     return create_access_token(data, expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
 
 
-async def get_current_user(session: AsyncSession = Depends(get_session), token: str = Depends(oauth2_scheme)) -> User:
-    """Get the current user from the database using the token"""
+async def load_principal(session: AsyncSession, email: str) -> Optional[Principal]:
+    """Resolve a user and its roles in a single query"""
+    result = await session.exec(
+        select(User.id, User.email, User.is_active, Role.name)
+        .outerjoin(UserRole, UserRole.user_id == User.id)
+        .outerjoin(Role, Role.id == UserRole.role_id)
+        .where(User.email == email)
+    )
+    rows = result.all()
+    if not rows:
+        return None
+
+    user_id, user_email, is_active = rows[0][:3]
+    roles = frozenset(row[3] for row in rows if row[3] is not None)
+    return Principal(
+        id=user_id,
+        email=user_email,
+        is_active=is_active,
+        roles=roles,
+        permission_mask=permission_matrix.mask_for(roles)
+    )
+
+def invalidate_principal(email: str) -> None:
+    """Drop a cached principal after its user, roles or permissions change"""
+    principal_cache.pop(email)
+
+def token_subject(connection: HTTPConnection) -> Optional[str]:
+    """Subject of the request's bearer token if it is valid; None otherwise, without touching the database"""
+    scheme, _, token = connection.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.decode(token, settings.secret_key, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+async def get_current_user(session: AsyncSession = Depends(get_session), token: str = Depends(oauth2_scheme)) -> Principal:
+    """Resolve the token's user, from the principal cache when possible"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -55,12 +100,20 @@ async def get_current_user(session: AsyncSession = Depends(get_session), token:
         if not token_data.sub:
             raise credentials_exception
 
-        result = await session.exec(select(User).where(User.email == token_data.sub))
-        user = result.first()
+        if await permission_matrix.ensure_current(session):
+            # Cached masks were compiled from the previous matrix
+            principal_cache.clear()
 
-        if not user:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-        return user
+        principal = principal_cache.get(token_data.sub)
+        if principal is None:
+            principal = await load_principal(session, token_data.sub)
+            if not principal:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+            principal_cache.set(token_data.sub, principal)
+
+        if not principal.is_active:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user")
+        return principal
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     except ValueError:
@@ -99,6 +152,7 @@ class RoleManager:
         user_role = UserRole(user_id=user_id, role_id=role.id)
         self.session.add(user_role)
         await self.session.commit()
+        invalidate_principal(user.email)
 
     async def remove_role(self, user_id: UUID, role_type: RoleType) -> None:
         """Remove a role from a user"""
@@ -115,25 +169,22 @@ class RoleManager:
         if not user_role:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Role not assigned to user")
 
-        self.session.delete(user_role)
+        await self.session.delete(user_role)
         await self.session.commit()
+        invalidate_principal(user.email)
     
 class PermissionChecker:
     """Utility class to check if a user has a permission"""
     def __init__(self, required_permissions: List[PermissionsType], require_all: bool = False):
         self.required_permissions = required_permissions
+        self.required_mask = permission_mask(required_permissions)
         self.require_all = require_all
 
-    async def __call__(self, user: Annotated[User, Depends(get_current_user)]):
-        # Collect permissions from all roles
-        user_permissions = set()
-        for role in user.roles:
-            user_permissions.update(permission.name for permission in role.permissions)
-
+    async def __call__(self, user: Annotated[Principal, Depends(get_current_user)]):
         if self.require_all:
-            has_permissions = all(permission in user_permissions for permission in self.required_permissions)
+            has_permissions = user.permission_mask & self.required_mask == self.required_mask
         else:
-            has_permissions = any(permission in user_permissions for permission in self.required_permissions)
+            has_permissions = user.permission_mask & self.required_mask != 0
 
         # Check if user has required permissions
         if not has_permissions:
@@ -0,0 +1,123 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, Mapping, Set, Tuple
+from sqlalchemy.orm import aliased
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.config import get_settings
+from app.logging_config.logger import logger
+from app.models.user import Role, RolePermission, Permission, RoleHierarchy
+from app.permissions import DEFAULT_ROLE_PERMISSIONS, PermissionsType, RoleType, permission_mask
+from app.services.cache_versions import bump_version, get_version
+
+settings = get_settings()
+
+PERMISSION_MATRIX = "permission_matrix"
+
+def compile_role_masks(
+    role_permissions: Mapping[RoleType, Iterable[PermissionsType]],
+    hierarchy: Iterable[Tuple[RoleType, RoleType]]
+) -> Dict[RoleType, int]:
+    """Compile each role into a permission bitmask, folding in the roles it inherits.
+
+    `hierarchy` holds (parent, child) pairs; a parent role is granted
+    everything its child roles are, transitively.
+    """
+    direct = {role: permission_mask(role_permissions.get(role, ())) for role in RoleType}
+    children: Dict[RoleType, Set[RoleType]] = defaultdict(set)
+    for parent, child in hierarchy:
+        children[parent].add(child)
+
+    masks: Dict[RoleType, int] = {}
+
+    def resolve(role: RoleType, visiting: Set[RoleType]) -> int:
+        if role in masks:
+            return masks[role]
+        mask = direct[role]
+        visiting.add(role)
+        for child in children[role]:
+            if child in visiting:
+                logger.warning(f"Ignoring cyclic role inheritance {role.value} -> {child.value}")
+                continue
+            mask |= resolve(child, visiting)
+        visiting.discard(role)
+        masks[role] = mask
+        return mask
+
+    for role in RoleType:
+        resolve(role, set())
+    return masks
+
+
+class PermissionMatrix:
+    """Role -> permission bitmask table shared by every permission check.
+
+    Starts from DEFAULT_ROLE_PERMISSIONS; `reload` replaces it with the
+    Role/Permission/RoleHierarchy tables. Roles with no permissions in the
+    database keep their defaults. Other workers pick up a reload through the
+    `permission_matrix` version row.
+    """
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self._role_masks = compile_role_masks(DEFAULT_ROLE_PERMISSIONS, ())
+        self._version = -1
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def mask_for(self, roles: Iterable[RoleType]) -> int:
+        mask = 0
+        for role in roles:
+            mask |= self._role_masks.get(role, 0)
+        return mask
+
+    async def reload(self, session: AsyncSession) -> None:
+        """Recompile every role mask from the database"""
+        version, _ = await get_version(session, PERMISSION_MATRIX)
+
+        result = await session.exec(
+            select(Role.name, Permission.name)
+            .join(RolePermission, RolePermission.role_id == Role.id)
+            .join(Permission, Permission.id == RolePermission.permission_id)
+        )
+        role_permissions: Dict[RoleType, list] = defaultdict(list)
+        for role, permission in result.all():
+            role_permissions[role].append(permission)
+        for role, defaults in DEFAULT_ROLE_PERMISSIONS.items():
+            role_permissions.setdefault(role, defaults)
+
+        parent_role, child_role = aliased(Role), aliased(Role)
+        result = await session.exec(
+            select(parent_role.name, child_role.name)
+            .join(RoleHierarchy, RoleHierarchy.parent_role_id == parent_role.id)
+            .join(child_role, child_role.id == RoleHierarchy.child_role_id)
+        )
+
+        self._role_masks = compile_role_masks(role_permissions, result.all())
+        self._version = version
+        self._checked_at = time.monotonic()
+
+    async def publish(self, session: AsyncSession) -> None:
+        """Reload after an admin change and tell the other workers to do the same"""
+        await bump_version(session, PERMISSION_MATRIX)
+        await session.commit()
+        await self.reload(session)
+
+    async def ensure_current(self, session: AsyncSession) -> bool:
+        """Reload if another worker published a newer matrix; True if a reload happened"""
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return False
+
+        async with self._lock:
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return False
+            version, _ = await get_version(session, PERMISSION_MATRIX)
+            if version == self._version:
+                self._checked_at = time.monotonic()
+                return False
+            await self.reload(session)
+            return True
+
+
+permission_matrix = PermissionMatrix(settings.cache_version_check_seconds)
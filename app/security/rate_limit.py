@@ -0,0 +1,274 @@
+import hashlib
+import math
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from fastapi import HTTPException, Request, status
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import get_settings
+from app.db import async_engine
+from app.logging_config.logger import logger
+from app.models.rate_limit import RateLimitBucket
+
+settings = get_settings()
+
+PERIODS = {"second": 1.0, "minute": 60.0, "hour": 3600.0}
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    """`limit` requests per `period` seconds per key, refilled continuously"""
+    name: str
+    limit: int
+    period: float
+
+    @classmethod
+    def parse(cls, name: str, spec: str) -> "RateLimitPolicy":
+        """Build a policy from a spec such as "20/minute" """
+        count, _, unit = spec.partition("/")
+        return cls(name, int(count), PERIODS[unit.strip()])
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.period
+
+class RateLimitState(NamedTuple):
+    policy: RateLimitPolicy
+    allowed: bool
+    remaining: int
+    # Seconds until the bucket is full again
+    reset_after: float
+    # Seconds until a request would be allowed; 0 when this one was
+    retry_after: float
+
+
+class RateLimitBackend(ABC):
+    # Buckets other workers also draw from; the limiter leases them in batches
+    shared = False
+
+    @abstractmethod
+    async def take(self, policy: RateLimitPolicy, key: str, tokens: int) -> Tuple[int, float]:
+        """Take up to `tokens` from `key`'s bucket; returns (taken, tokens left)"""
+
+class LocalBackend(RateLimitBackend):
+    """Buckets in this worker's memory; every worker enforces the full limit on its own"""
+
+    # Full buckets are forgotten once this many keys are tracked
+    MAX_KEYS = 100_000
+
+    def __init__(self):
+        # key -> [tokens, monotonic time of the last take]
+        self._buckets: Dict[str, List[float]] = {}
+
+    async def take(self, policy: RateLimitPolicy, key: str, tokens: int) -> Tuple[int, float]:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.MAX_KEYS:
+                self._prune(now)
+            bucket = self._buckets[key] = [float(policy.limit), now]
+        else:
+            bucket[0] = min(policy.limit, bucket[0] + (now - bucket[1]) * policy.rate)
+            bucket[1] = now
+        taken = min(tokens, int(bucket[0]))
+        bucket[0] -= taken
+        return taken, bucket[0]
+
+    def _prune(self, now: float) -> None:
+        # Buckets untouched for a whole hour are full under any policy, so dropping them changes nothing
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < PERIODS["hour"]}
+        if len(self._buckets) >= self.MAX_KEYS:
+            self._buckets.clear()
+
+class DatabaseBackend(RateLimitBackend):
+    """Buckets in the rate_limit_bucket table, shared by every worker; one upsert per take"""
+
+    shared = True
+    # Rows idle longer than the longest period are full buckets and are deleted this often
+    PRUNE_INTERVAL_SECONDS = 300.0
+
+    def __init__(self):
+        self._pruned_at = time.monotonic()
+
+    async def take(self, policy: RateLimitPolicy, key: str, tokens: int) -> Tuple[int, float]:
+        table = RateLimitBucket.__table__
+        elapsed = func.extract("epoch", func.now() - table.c.updated_at)
+        available = func.least(policy.limit, table.c.tokens + elapsed * policy.rate)
+        taken = func.least(tokens, func.floor(available))
+        first_take = min(tokens, policy.limit)
+        statement = insert(table).values(
+            key=key, tokens=policy.limit - first_take, granted=first_take, updated_at=func.now()
+        ).on_conflict_do_update(
+            index_elements=[table.c.key],
+            # Every expression here reads the row as it was before the update
+            set_={"tokens": available - taken, "granted": taken, "updated_at": func.now()}
+        ).returning(table.c.granted, table.c.tokens)
+
+        async with async_engine.begin() as conn:
+            row = (await conn.execute(statement)).one()
+            if time.monotonic() - self._pruned_at > self.PRUNE_INTERVAL_SECONDS:
+                self._pruned_at = time.monotonic()
+                await conn.execute(delete(table).where(
+                    table.c.updated_at < func.now() - timedelta(seconds=PERIODS["hour"])
+                ))
+        return row.granted, row.tokens
+
+
+class RateLimiter:
+    """Token buckets per policy and key, kept by a backend.
+
+    With a shared backend each worker leases tokens in batches and serves
+    requests from its lease without I/O. The lease doubles while a key keeps
+    using it up and drops back to one token once it expires unused, so quiet
+    keys waste nothing and busy ones rarely reach the backend. A denial is
+    also remembered until the next token is due. If the backend fails,
+    requests are let through rather than rejected.
+    """
+
+    # Largest share of a policy's limit one worker leases at a time
+    MAX_LEASE_FRACTION = 0.1
+    # Leased tokens still unused after this long are dropped, so no worker sits on them
+    LEASE_SECONDS = 1.0
+    # Expired leases are forgotten once this many keys are tracked
+    MAX_LEASES = 100_000
+
+    def __init__(self, backend: RateLimitBackend):
+        self.backend = backend
+        # key -> [tokens left in the lease, expires at, backend tokens left, lease size, denied]
+        self._leases: Dict[str, List[Any]] = {}
+        self.allowed = 0
+        self.denied = 0
+        self.backend_calls = 0
+        self.backend_errors = 0
+
+    async def hit(self, policy: RateLimitPolicy, key: str) -> RateLimitState:
+        """Spend one token from `key`'s bucket under `policy`"""
+        key = f"{policy.name}:{key}"
+        if not self.backend.shared:
+            taken, left = await self.backend.take(policy, key, 1)
+            return self._state(policy, taken == 1, left)
+
+        now = time.monotonic()
+        lease = self._leases.get(key)
+        if lease is not None and now < lease[1]:
+            if lease[0] >= 1:
+                lease[0] -= 1
+                return self._state(policy, True, lease[2] + lease[0])
+            if lease[4]:
+                return self._state(policy, False, lease[2], lease[1] - now)
+
+        size = 1
+        if lease is not None:
+            used_up = not lease[4] and now < lease[1]
+            size = min(max(1, int(policy.limit * self.MAX_LEASE_FRACTION)), lease[3] * 2) if used_up else 1
+
+        self.backend_calls += 1
+        try:
+            taken, left = await self.backend.take(policy, key, size)
+        except SQLAlchemyError as e:
+            self.backend_errors += 1
+            logger.warning(f"Rate limit backend failed; allowing the request: {e}")
+            return self._state(policy, True, policy.limit)
+
+        if len(self._leases) >= self.MAX_LEASES:
+            self._leases = {k: v for k, v in self._leases.items() if now < v[1]}
+        if taken:
+            self._leases[key] = [taken - 1, now + self.LEASE_SECONDS, left, size, False]
+            return self._state(policy, True, left + taken - 1)
+        retry_after = (1 - left) / policy.rate
+        self._leases[key] = [0, now + retry_after, left, size, True]
+        return self._state(policy, False, left, retry_after)
+
+    def _state(self, policy: RateLimitPolicy, allowed: bool, left: float, retry_after: Optional[float] = None) -> RateLimitState:
+        if allowed:
+            self.allowed += 1
+            retry_after = 0.0
+        else:
+            self.denied += 1
+            if retry_after is None:
+                retry_after = (1 - left) / policy.rate
+        return RateLimitState(policy, allowed, int(left), (policy.limit - left) / policy.rate, retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__,
+            "allowed": self.allowed,
+            "denied": self.denied,
+            "backend_calls": self.backend_calls,
+            "backend_errors": self.backend_errors,
+        }
+
+
+rate_limiter = RateLimiter(DatabaseBackend() if settings.rate_limit_backend == "database" else LocalBackend())
+
+LOGIN_PER_IP = RateLimitPolicy.parse("login_ip", settings.rate_limit_login_per_ip)
+LOGIN_PER_ACCOUNT = RateLimitPolicy.parse("login_account", settings.rate_limit_login_per_account)
+CATALOG = RateLimitPolicy.parse("catalog", settings.rate_limit_catalog)
+
+async def enforce(request: Request, policy: RateLimitPolicy, key: str) -> None:
+    """Spend a token for `key`, or reject the request with 429 when none is left"""
+    if not settings.rate_limit_enabled:
+        return
+    state = await rate_limiter.hit(policy, key)
+    # Headers describe the policy closest to rejecting the request
+    current = getattr(request.state, "rate_limit", None)
+    if current is None or not state.allowed or state.remaining < current.remaining:
+        request.state.rate_limit = state
+    if not state.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers={"Retry-After": str(math.ceil(state.retry_after))}
+        )
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+def caller_key(request: Request) -> str:
+    """The caller's bearer token (hashed), or their IP when anonymous"""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        return hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+    return client_ip(request)
+
+class RateLimit:
+    """Dependency applying `policy` per caller, or per client IP with `per_ip`"""
+
+    def __init__(self, policy: RateLimitPolicy, per_ip: bool = False):
+        self.policy = policy
+        self.per_ip = per_ip
+
+    async def __call__(self, request: Request) -> None:
+        await enforce(request, self.policy, client_ip(request) if self.per_ip else caller_key(request))
+
+
+class RateLimitHeadersMiddleware:
+    """Adds RateLimit-* headers describing the limit a request was checked against"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                state: Optional[RateLimitState] = scope.get("state", {}).get("rate_limit")
+                if state is not None:
+                    policy = state.policy
+                    message = {**message, "headers": [
+                        *message.get("headers", []),
+                        (b"ratelimit-limit", str(policy.limit).encode()),
+                        (b"ratelimit-remaining", str(state.remaining).encode()),
+                        (b"ratelimit-reset", str(math.ceil(state.reset_after)).encode()),
+                        (b"ratelimit-policy", f"{policy.limit};w={int(policy.period)}".encode()),
+                    ]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,300 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence
+from sqlalchemy import DateTime, and_, column, delete, func, literal, select, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.config import get_settings
+from app.db import AsyncSessionLocal
+from app.logging_config.logger import logger
+from app.models.analytics import CategorySalesRollup, RollupWatermark, SalesRollup, VariantSalesRollup
+from app.models.order import Order, OrderItem
+from app.models.payment import Payment
+from app.models.product import Category, ProductCategory, ProductVariant
+from app.schemas.analytics_schema import RollupGranularity, SalesBucket, TopCategory, TopVariant
+from app.schemas.order_schema import OrderStatus
+from app.utils.export import RecordStream, stream_records
+
+settings = get_settings()
+
+SALES_ROLLUP = "sales_rollup"
+
+# Start of time for a watermark that has never advanced
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+BUCKET_SIZES = {
+    RollupGranularity.HOUR: timedelta(hours=1),
+    RollupGranularity.DAY: timedelta(days=1),
+}
+
+SALES_EXPORT_COLUMNS = (
+    "bucket_start", "status", "order_count", "units_sold", "revenue", "paid_amount",
+)
+
+def truncate(value, granularity: RollupGranularity):
+    """SQL expression flooring a timestamptz to its UTC bucket"""
+    return func.date_trunc(granularity.value, value, "UTC")
+
+def floor_bucket(value: datetime, granularity: RollupGranularity) -> datetime:
+    value = value.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0) if granularity == RollupGranularity.DAY else value
+
+def _granularity(granularity: RollupGranularity):
+    # Typed so INSERT ... SELECT binds it as the enum rather than varchar
+    return literal(granularity, SalesRollup.__table__.c.granularity.type)
+
+def _buckets(name: str, starts: Sequence[datetime]):
+    return values(column("bucket_start", DateTime(timezone=True)), name=name).data([(start,) for start in starts])
+
+
+async def refresh_rollups(session: AsyncSession, batch_buckets: int) -> Optional[int]:
+    """Fold orders and payments changed since the watermark into the rollups.
+
+    Every hourly bucket holding a changed order is recomputed from the base
+    tables, then the days containing those hours are re-summed from the
+    hourly rows, so status changes and late payments land in the right
+    bucket. Returns the number of hours recomputed, or None when another
+    worker holds the watermark.
+    """
+    await session.exec(
+        insert(RollupWatermark).values(name=SALES_ROLLUP, watermark=EPOCH).on_conflict_do_nothing()
+    )
+    result = await session.exec(
+        select(RollupWatermark.watermark)
+        .where(RollupWatermark.name == SALES_ROLLUP)
+        .with_for_update(skip_locked=True)
+    )
+    since = result.scalar_one_or_none()
+    if since is None:
+        return None
+
+    result = await session.exec(select(func.now() - timedelta(seconds=settings.analytics_rollup_lag_seconds)))
+    upto = result.scalar_one()
+    if upto <= since:
+        return 0
+
+    changed_at = func.coalesce(Order.updated_at, Order.created_at)
+    hour = truncate(Order.created_at, RollupGranularity.HOUR)
+    result = await session.exec(
+        select(hour).where(changed_at > since, changed_at <= upto)
+        .union(
+            select(hour).join(Payment, Payment.order_id == Order.id)
+            .where(Payment.updated_at > since, Payment.updated_at <= upto)
+        )
+    )
+    hours = sorted(result.scalars().all())
+
+    for start in range(0, len(hours), batch_buckets):
+        await _recompute_hours(session, hours[start:start + batch_buckets])
+    days = sorted({floor_bucket(hour, RollupGranularity.DAY) for hour in hours})
+    for start in range(0, len(days), batch_buckets):
+        await _recompute_days(session, days[start:start + batch_buckets])
+
+    await session.exec(
+        RollupWatermark.__table__.update()
+        .where(RollupWatermark.name == SALES_ROLLUP)
+        .values(watermark=upto)
+    )
+    return len(hours)
+
+async def _recompute_hours(session: AsyncSession, hours: List[datetime]) -> None:
+    granularity = RollupGranularity.HOUR
+    for model in (SalesRollup, VariantSalesRollup, CategorySalesRollup):
+        await session.exec(delete(model).where(model.granularity == granularity, model.bucket_start.in_(hours)))
+
+    buckets = _buckets("dirty_hours", hours)
+    bucket = buckets.c.bucket_start
+    # Index range scan on created_at per dirty hour
+    in_bucket = and_(Order.created_at >= bucket, Order.created_at < bucket + BUCKET_SIZES[granularity])
+    units = (
+        select(func.coalesce(func.sum(OrderItem.quantity), 0))
+        .where(OrderItem.order_id == Order.id)
+        .correlate_except(OrderItem)
+        .scalar_subquery()
+    )
+    await session.exec(
+        insert(SalesRollup).from_select(
+            ["granularity", "bucket_start", "status", "order_count", "units_sold", "revenue", "paid_amount"],
+            select(
+                _granularity(granularity),
+                bucket,
+                Order.status,
+                func.count(),
+                func.sum(units),
+                func.sum(Order.total_amount),
+                func.sum(Order.total_paid)
+            )
+            .select_from(buckets)
+            .join(Order, in_bucket)
+            .group_by(bucket, Order.status)
+        )
+    )
+
+    sold = (
+        select(
+            bucket.label("bucket_start"),
+            OrderItem.variant_id,
+            OrderItem.quantity,
+            (OrderItem.quantity * OrderItem.price_at_purchase).label("revenue")
+        )
+        .select_from(buckets)
+        .join(Order, in_bucket)
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .where(Order.status != OrderStatus.CANCELLED, OrderItem.variant_id.is_not(None))
+        .subquery()
+    )
+    await session.exec(
+        insert(VariantSalesRollup).from_select(
+            ["granularity", "bucket_start", "variant_id", "units_sold", "revenue"],
+            select(_granularity(granularity), sold.c.bucket_start, sold.c.variant_id, func.sum(sold.c.quantity), func.sum(sold.c.revenue))
+            .group_by(sold.c.bucket_start, sold.c.variant_id)
+        )
+    )
+    # Sales count towards the categories the product is in now
+    await session.exec(
+        insert(CategorySalesRollup).from_select(
+            ["granularity", "bucket_start", "category_id", "units_sold", "revenue"],
+            select(_granularity(granularity), sold.c.bucket_start, ProductCategory.category_id, func.sum(sold.c.quantity), func.sum(sold.c.revenue))
+            .join(ProductVariant, ProductVariant.id == sold.c.variant_id)
+            .join(ProductCategory, ProductCategory.product_id == ProductVariant.product_id)
+            .group_by(sold.c.bucket_start, ProductCategory.category_id)
+        )
+    )
+
+async def _recompute_days(session: AsyncSession, days: List[datetime]) -> None:
+    """Re-sum whole days from their hourly rows"""
+    buckets = _buckets("dirty_days", days)
+    day = buckets.c.bucket_start
+    for model, keys, sums in (
+        (SalesRollup, ("status",), ("order_count", "units_sold", "revenue", "paid_amount")),
+        (VariantSalesRollup, ("variant_id",), ("units_sold", "revenue")),
+        (CategorySalesRollup, ("category_id",), ("units_sold", "revenue")),
+    ):
+        await session.exec(delete(model).where(model.granularity == RollupGranularity.DAY, model.bucket_start.in_(days)))
+        key_columns = [getattr(model, key) for key in keys]
+        await session.exec(
+            insert(model).from_select(
+                ["granularity", "bucket_start", *keys, *sums],
+                select(
+                    _granularity(RollupGranularity.DAY),
+                    day,
+                    *key_columns,
+                    *(func.sum(getattr(model, name)) for name in sums)
+                )
+                .select_from(buckets)
+                .join(model, and_(
+                    model.granularity == RollupGranularity.HOUR,
+                    model.bucket_start >= day,
+                    model.bucket_start < day + BUCKET_SIZES[RollupGranularity.DAY]
+                ))
+                .group_by(day, *key_columns)
+            )
+        )
+
+
+async def sales_series(session: AsyncSession, granularity: RollupGranularity, start: datetime, end: datetime) -> List[SalesBucket]:
+    """Sales per bucket in [start, end), read from the rollups; buckets without orders are omitted"""
+    result = await session.exec(
+        select(
+            SalesRollup.bucket_start, SalesRollup.status, SalesRollup.order_count,
+            SalesRollup.units_sold, SalesRollup.revenue, SalesRollup.paid_amount
+        )
+        .where(SalesRollup.granularity == granularity, SalesRollup.bucket_start >= start, SalesRollup.bucket_start < end)
+        .order_by(SalesRollup.bucket_start)
+    )
+    buckets: Dict[datetime, SalesBucket] = {}
+    for bucket_start, status, order_count, units_sold, revenue, paid_amount in result.all():
+        status = OrderStatus(status)
+        bucket = buckets.get(bucket_start)
+        if bucket is None:
+            bucket = buckets[bucket_start] = SalesBucket(bucket_start=bucket_start)
+        bucket.order_count += order_count
+        bucket.orders_by_status[status] = order_count
+        if status != OrderStatus.CANCELLED:
+            bucket.units_sold += units_sold
+            bucket.revenue += revenue
+            bucket.paid_amount += paid_amount
+    return list(buckets.values())
+
+async def top_variants(session: AsyncSession, granularity: RollupGranularity, start: datetime, end: datetime, limit: int) -> List[TopVariant]:
+    units = func.sum(VariantSalesRollup.units_sold).label("units_sold")
+    totals = (
+        select(VariantSalesRollup.variant_id, units, func.sum(VariantSalesRollup.revenue).label("revenue"))
+        .where(VariantSalesRollup.granularity == granularity, VariantSalesRollup.bucket_start >= start, VariantSalesRollup.bucket_start < end)
+        .group_by(VariantSalesRollup.variant_id)
+        .order_by(units.desc(), VariantSalesRollup.variant_id)
+        .limit(limit)
+        .subquery()
+    )
+    result = await session.exec(
+        select(totals.c.variant_id, ProductVariant.sku, totals.c.units_sold, totals.c.revenue)
+        .outerjoin(ProductVariant, ProductVariant.id == totals.c.variant_id)
+        .order_by(totals.c.units_sold.desc(), totals.c.variant_id)
+    )
+    return [TopVariant.model_validate(row._mapping) for row in result.all()]
+
+async def top_categories(session: AsyncSession, granularity: RollupGranularity, start: datetime, end: datetime, limit: int) -> List[TopCategory]:
+    revenue = func.sum(CategorySalesRollup.revenue).label("revenue")
+    totals = (
+        select(CategorySalesRollup.category_id, func.sum(CategorySalesRollup.units_sold).label("units_sold"), revenue)
+        .where(CategorySalesRollup.granularity == granularity, CategorySalesRollup.bucket_start >= start, CategorySalesRollup.bucket_start < end)
+        .group_by(CategorySalesRollup.category_id)
+        .order_by(revenue.desc(), CategorySalesRollup.category_id)
+        .limit(limit)
+        .subquery()
+    )
+    result = await session.exec(
+        select(totals.c.category_id, Category.name, totals.c.units_sold, totals.c.revenue)
+        .outerjoin(Category, Category.id == totals.c.category_id)
+        .order_by(totals.c.revenue.desc(), totals.c.category_id)
+    )
+    return [TopCategory.model_validate(row._mapping) for row in result.all()]
+
+def export_sales(granularity: RollupGranularity, start: datetime, end: datetime) -> RecordStream:
+    """Stream the sales rollup rows in [start, end), one per bucket and status"""
+    return stream_records(
+        select(*(getattr(SalesRollup, name) for name in SALES_EXPORT_COLUMNS))
+        .where(SalesRollup.granularity == granularity, SalesRollup.bucket_start >= start, SalesRollup.bucket_start < end)
+        .order_by(SalesRollup.bucket_start, SalesRollup.status)
+    )
+
+
+class RollupJob:
+    """Background task that brings the sales rollups up to date every `interval` seconds"""
+
+    def __init__(self, interval: float, batch_buckets: int):
+        self.interval = interval
+        self.batch_buckets = batch_buckets
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="analytics-rollup")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def refresh(self) -> Optional[int]:
+        async with AsyncSessionLocal() as session:
+            hours = await refresh_rollups(session, self.batch_buckets)
+            await session.commit()
+        return hours
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                hours = await self.refresh()
+                if hours:
+                    logger.info(f"Recomputed {hours} hourly sales rollup buckets")
+            except Exception as e:
+                logger.exception(f"Sales rollup refresh failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+rollup_job = RollupJob(settings.analytics_rollup_interval_seconds, settings.analytics_rollup_batch_buckets)
@@ -0,0 +1,65 @@
+import time
+from typing import Any, Dict, Optional, Tuple
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.config import get_settings
+from app.models.cache import CacheVersion
+
+settings = get_settings()
+
+CATEGORY_TREE = "category_tree"
+PRODUCTS = "products"
+
+async def bump_version(session: AsyncSession, name: str) -> int:
+    """Increment the version of `name` as part of the current transaction"""
+    statement = insert(CacheVersion).values(name=name, version=1, updated_at=func.now())
+    result = await session.exec(
+        statement.on_conflict_do_update(
+            index_elements=["name"],
+            set_={"version": CacheVersion.version + 1, "updated_at": func.now()}
+        ).returning(CacheVersion.version)
+    )
+    return result.scalar_one()
+
+async def get_version(session: AsyncSession, name: str) -> Tuple[int, Optional[datetime]]:
+    """Current (version, updated_at) of `name`; (0, None) if it was never written"""
+    result = await session.exec(
+        select(CacheVersion.version, CacheVersion.updated_at).where(CacheVersion.name == name)
+    )
+    row = result.first()
+    return (row[0], row[1]) if row else (0, None)
+
+
+class VersionTracker:
+    """Last known version of each name, re-read at most once per `check_interval`.
+
+    Entries are kept per database the session is bound to, so a version read
+    from a replica is only ever compared with rows from that replica. Read
+    the version before the rows it describes: the rows are then at least as
+    new as the version, never older.
+    """
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        # (name, bind) -> (monotonic time of the read, version, updated_at)
+        self._entries: Dict[Tuple[str, Any], Tuple[float, int, Optional[datetime]]] = {}
+
+    async def get(self, session: AsyncSession, name: str) -> Tuple[int, Optional[datetime]]:
+        key = (name, session.bind)
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.check_interval:
+            return entry[1], entry[2]
+        version, updated_at = await get_version(session, name)
+        self._entries[key] = (time.monotonic(), version, updated_at)
+        return version, updated_at
+
+    def invalidate(self, name: str) -> None:
+        """Force the next read of `name` to go to the database, e.g. after this worker wrote it"""
+        for key in [key for key in self._entries if key[0] == name]:
+            del self._entries[key]
+
+
+version_tracker = VersionTracker(settings.cache_version_check_seconds)
@@ -0,0 +1,60 @@
+import asyncio
+from typing import Any, Dict, List, Tuple
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.product import Category
+from app.services.cache_versions import CATEGORY_TREE, version_tracker
+from app.utils.json_response import dumps
+
+class CategoryTreeCache:
+    """The full category tree, serialized once and reused until its version changes.
+
+    Every category write bumps the `category_tree` version row. Each worker
+    compares its copy against that row through the version tracker, so other
+    workers' writes become visible within `cache_version_check_seconds` and
+    this worker's own writes immediately. Like the version tracker, a copy is
+    kept per database, so a lagging replica's tree never replaces the
+    primary's.
+    """
+
+    def __init__(self):
+        # bind -> (version, body)
+        self._entries: Dict[Any, Tuple[int, bytes]] = {}
+        self._lock = asyncio.Lock()
+
+    async def get(self, session: AsyncSession) -> bytes:
+        # Read the version before the rows: a concurrent write then at worst
+        # leaves newer rows under an older version, which the next check repairs
+        version, _ = await version_tracker.get(session, CATEGORY_TREE)
+        entry = self._entries.get(session.bind)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+
+        async with self._lock:
+            # Another request may have rebuilt the tree while we waited
+            entry = self._entries.get(session.bind)
+            if entry is None or entry[0] != version:
+                entry = self._entries[session.bind] = (version, await self._build(session))
+            return entry[1]
+
+    def invalidate(self) -> None:
+        """Force the next read to re-check the version row"""
+        version_tracker.invalidate(CATEGORY_TREE)
+
+    @staticmethod
+    async def _build(session: AsyncSession) -> bytes:
+        result = await session.exec(
+            select(Category.id, Category.name, Category.parent_id).order_by(Category.path)
+        )
+        roots: List[dict] = []
+        nodes: Dict = {}
+        # Ordering by path guarantees parents are seen before their children
+        for category_id, name, parent_id in result.all():
+            node = {"id": str(category_id), "name": name, "children": []}
+            nodes[category_id] = node
+            parent = nodes.get(parent_id)
+            (parent["children"] if parent else roots).append(node)
+        return dumps(roots)
+
+
+category_tree_cache = CategoryTreeCache()
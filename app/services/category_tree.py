@@ -0,0 +1,147 @@
+from typing import List, Optional
+from uuid import UUID
+from fastapi import HTTPException, status
+from sqlalchemy import any_, cast, func, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PGUUID
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql import ColumnElement, Select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.product import Category, ProductCategory
+from app.utils.export import RecordStream, stream_records
+
+CATEGORY_EXPORT_COLUMNS = ("id", "name", "parent_id", "depth", "product_count")
+
+PATH_SEPARATOR = "/"
+# Sorts after every character a path can contain (hex digits and the separator)
+PATH_UPPER_BOUND = "~"
+
+def path_segment(category_id: UUID) -> str:
+    return f"{category_id.hex}{PATH_SEPARATOR}"
+
+def _path_of(category_id: UUID):
+    """Scalar subquery selecting the path of `category_id`"""
+    target = aliased(Category)
+    return select(target.path).where(target.id == category_id).scalar_subquery()
+
+def in_subtree(category_id: UUID) -> ColumnElement[bool]:
+    """Condition matching `category_id` and all of its descendants.
+
+    Expressed as a range rather than LIKE so the path index is usable even
+    though the prefix is only known at execution time.
+    """
+    prefix = _path_of(category_id)
+    return (Category.path >= prefix) & (Category.path < func.concat(prefix, PATH_UPPER_BOUND))
+
+def subtree_statement(category_id: UUID) -> Select:
+    return select(Category).where(in_subtree(category_id)).order_by(Category.path)
+
+def ancestors_statement(category_id: UUID) -> Select:
+    """Categories from the root down to `category_id` (inclusive), resolved from its path"""
+    ancestor_ids = cast(
+        func.string_to_array(func.rtrim(_path_of(category_id), PATH_SEPARATOR), PATH_SEPARATOR),
+        ARRAY(PGUUID(as_uuid=True))
+    )
+    return select(Category).where(Category.id == any_(ancestor_ids)).order_by(Category.depth)
+
+def export_categories() -> RecordStream:
+    """Stream every category with its direct product count, parents before their children"""
+    product_count = (
+        select(func.count())
+        .where(ProductCategory.category_id == Category.id)
+        .correlate_except(ProductCategory)
+        .scalar_subquery()
+    )
+    return stream_records(
+        select(Category.id, Category.name, Category.parent_id, Category.depth, product_count.label("product_count"))
+        .order_by(Category.path)
+    )
+
+async def _get_parent(session: AsyncSession, parent_id: UUID) -> Category:
+    parent = await session.get(Category, parent_id)
+    if not parent:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parent category not found")
+    return parent
+
+async def place_category(session: AsyncSession, category: Category) -> None:
+    """Compute path and depth for a new category from its parent_id"""
+    parent = await _get_parent(session, category.parent_id) if category.parent_id else None
+    category.path = (parent.path if parent else "") + path_segment(category.id)
+    category.depth = parent.depth + 1 if parent else 0
+
+def _path_ids(path: str) -> List[UUID]:
+    """Ids of the categories along a materialized path, root first"""
+    return [UUID(segment) for segment in path.split(PATH_SEPARATOR) if segment]
+
+async def _lock_for_move(session: AsyncSession, category: Category, parent_id: Optional[UUID]) -> Optional[Category]:
+    """Lock `category` and the new parent's ancestor chain in id order, and reload them.
+
+    Moving any of those ancestors also locks it, so while these locks are
+    held no concurrent move can put the new parent under `category`. The
+    chain is read before it is locked, so it is read again until it is
+    unchanged. Returns the new parent.
+    """
+    parent = await _get_parent(session, parent_id) if parent_id else None
+    while True:
+        chain = {category.id, *(_path_ids(parent.path) if parent else ())}
+        result = await session.exec(
+            select(Category)
+            .where(Category.id.in_(chain))
+            .order_by(Category.id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        locked = {row.id: row for row in result.all()}
+        if category.id not in locked:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
+        if parent is None:
+            return None
+        if parent.id not in locked:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parent category not found")
+        if set(_path_ids(parent.path)) <= locked.keys():
+            return parent
+
+async def move_category(session: AsyncSession, category: Category, parent_id: Optional[UUID]) -> None:
+    """Re-parent `category`, rewriting the paths of its whole subtree in one statement"""
+    if parent_id == category.parent_id:
+        return
+
+    parent = await _lock_for_move(session, category, parent_id)
+    if parent_id == category.parent_id:
+        return
+    if parent and parent.path.startswith(category.path):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="A category cannot be moved under itself or its descendants")
+
+    old_path = category.path
+    new_path = (parent.path if parent else "") + path_segment(category.id)
+    depth_delta = (parent.depth + 1 if parent else 0) - category.depth
+    await _rewrite_prefix(session, old_path, new_path, depth_delta)
+
+    category.parent_id = parent_id
+    category.path = new_path
+    category.depth += depth_delta
+
+async def detach_category(session: AsyncSession, category: Category) -> None:
+    """Hand the children of a category about to be deleted to its parent"""
+    await session.exec(
+        update(Category)
+        .where(Category.parent_id == category.id)
+        .values(parent_id=category.parent_id)
+        .execution_options(synchronize_session=False)
+    )
+    parent_path = category.path[:-len(path_segment(category.id))]
+    await _rewrite_prefix(session, category.path, parent_path, -1, include_root=False)
+
+async def _rewrite_prefix(session: AsyncSession, old_prefix: str, new_prefix: str, depth_delta: int, include_root: bool = True) -> None:
+    condition = Category.path.startswith(old_prefix, autoescape=True)
+    if not include_root:
+        condition = condition & (Category.path != old_prefix)
+    await session.exec(
+        update(Category)
+        .where(condition)
+        .values(
+            path=func.concat(new_prefix, func.substr(Category.path, len(old_prefix) + 1)),
+            depth=Category.depth + depth_delta
+        )
+        .execution_options(synchronize_session=False)
+    )
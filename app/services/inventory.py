@@ -0,0 +1,332 @@
+from decimal import Decimal
+from typing import Collection, Dict, List, Mapping, Optional
+from uuid import UUID
+from sqlalchemy import Integer, Row, column, delete, func, insert, update, values
+from sqlalchemy.dialects.postgresql import UUID as PGUUID
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.product import Product, ProductVariant, VariantStockShard
+from app.models.reservation import StockReservation
+from app.schemas.product_schema import ProductStatus, VariantStockRead
+
+# Times a checkout queues on a busy shard that turns out to be drained before giving up on shards
+SHARD_RETRIES = 3
+
+class VariantUnavailable(LookupError):
+    """Some requested variants do not exist or belong to a product that is not on sale"""
+
+    def __init__(self, variant_ids: List[UUID]):
+        super().__init__(f"Variants not available: {', '.join(map(str, variant_ids))}")
+        self.variant_ids = variant_ids
+
+
+class StockBusy(RuntimeError):
+    """The variant's shards are in use by concurrent checkouts"""
+
+    def __init__(self, variant_id: UUID):
+        super().__init__(f"Stock of variant {variant_id} is being updated, retry shortly")
+        self.variant_id = variant_id
+
+
+class InsufficientStock(ValueError):
+    """Some requested variants do not have enough stock"""
+
+    def __init__(self, variant_ids: List[UUID]):
+        super().__init__(f"Insufficient stock for variants: {', '.join(map(str, variant_ids))}")
+        self.variant_ids = variant_ids
+
+
+async def lock_variants(session: AsyncSession, variant_ids: List[UUID], off_sale_ok: Collection[UUID] = ()) -> Dict[UUID, Row]:
+    """Lock variant rows in id order; raise VariantUnavailable for missing or off-sale ones.
+
+    Variants in `off_sale_ok` only need to exist. Every writer of stock or
+    reservation counts takes these locks in the same order, so overlapping
+    transactions queue up instead of deadlocking. Shard rows, by contrast,
+    are only ever locked with SKIP LOCKED, so nobody waits on them.
+    Returns the locked (stock_quantity, reserved_quantity, stock_shards) per variant.
+    """
+    result = await session.exec(
+        select(
+            ProductVariant.id,
+            Product.status,
+            ProductVariant.stock_quantity,
+            ProductVariant.reserved_quantity,
+            ProductVariant.stock_shards
+        )
+        .join(Product, Product.id == ProductVariant.product_id)
+        .where(ProductVariant.id.in_(variant_ids))
+        .order_by(ProductVariant.id)
+        .with_for_update(of=ProductVariant)
+    )
+    rows = {
+        row.id: row for row in result.all()
+        if row.status == ProductStatus.ACTIVE or row.id in off_sale_ok
+    }
+    missing = set(variant_ids) - set(rows)
+    if missing:
+        raise VariantUnavailable(sorted(missing))
+    return rows
+
+async def take_stock(session: AsyncSession, quantities: Mapping[UUID, int], user_id: Optional[UUID] = None) -> Dict[UUID, Decimal]:
+    """Decrement stock for every variant in `quantities` and return their unit prices.
+
+    Only unreserved stock can be taken, except that the reservations `user_id`
+    holds on these variants are converted: they are deleted and their
+    quantities count towards the order. Sharded variants are served from a
+    single shard when one has enough stock. Everything else is taken by one
+    conditional UPDATE on the variant rows, after topping them up from their
+    shards where needed; a variant without enough stock is simply not
+    updated. Either every variant is decremented or an exception is raised,
+    and the caller must roll back the transaction (earlier statements may
+    already have touched other rows).
+    """
+    variant_ids = sorted(quantities)
+    if not variant_ids:
+        return {}
+
+    released: Dict[UUID, int] = {}
+    if user_id is not None:
+        released = await release_reservations(session, user_id, variant_ids)
+
+    # Sharded variants first try a single shard, without touching the hot variant row
+    prices: Dict[UUID, Decimal] = {}
+    result = await session.exec(
+        select(ProductVariant.id)
+        .where(ProductVariant.id.in_(variant_ids), ProductVariant.stock_shards > 0)
+        .order_by(ProductVariant.id)
+    )
+    for variant_id in result.all():
+        if variant_id not in released:
+            price = await _take_from_any_shard(session, variant_id, quantities[variant_id])
+            if price is not None:
+                prices[variant_id] = price
+
+    variant_ids = [variant_id for variant_id in variant_ids if variant_id not in prices]
+    if not variant_ids:
+        return prices
+    rows = await lock_variants(session, variant_ids)
+    for variant_id, row in rows.items():
+        shortfall = quantities[variant_id] - (row.stock_quantity - row.reserved_quantity + released.get(variant_id, 0))
+        if row.stock_shards and shortfall > 0:
+            await pull_from_shards(session, variant_id, shortfall)
+
+    requested = values(
+        column("variant_id", PGUUID(as_uuid=True)),
+        column("quantity", Integer),
+        column("released", Integer),
+        name="requested"
+    ).data([(variant_id, quantities[variant_id], released.get(variant_id, 0)) for variant_id in variant_ids])
+
+    result = await session.exec(
+        update(ProductVariant)
+        .where(
+            ProductVariant.id == requested.c.variant_id,
+            Product.id == ProductVariant.product_id,
+            ProductVariant.stock_quantity - ProductVariant.reserved_quantity + requested.c.released >= requested.c.quantity
+        )
+        .values(
+            stock_quantity=ProductVariant.stock_quantity - requested.c.quantity,
+            reserved_quantity=ProductVariant.reserved_quantity - requested.c.released
+        )
+        .returning(ProductVariant.id, Product.base_price + ProductVariant.price_offset)
+        .execution_options(synchronize_session=False)
+    )
+    prices.update(result.all())
+
+    short = [variant_id for variant_id in variant_ids if variant_id not in prices]
+    if short:
+        raise InsufficientStock(short)
+    return prices
+
+async def release_reservations(session: AsyncSession, user_id: UUID, variant_ids: Optional[List[UUID]] = None) -> Dict[UUID, int]:
+    """Delete the user's reservations (all, or on `variant_ids`) and return the quantities they held.
+
+    The caller is responsible for taking the quantities out of
+    ProductVariant.reserved_quantity, or converting them into an order.
+    """
+    held = (
+        select(StockReservation.variant_id)
+        .where(StockReservation.user_id == user_id)
+        .order_by(StockReservation.variant_id)
+        .with_for_update()
+    )
+    if variant_ids is not None:
+        held = held.where(StockReservation.variant_id.in_(variant_ids))
+
+    result = await session.exec(
+        delete(StockReservation)
+        .where(StockReservation.user_id == user_id, StockReservation.variant_id.in_(held))
+        .returning(StockReservation.variant_id, StockReservation.quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return dict(result.all())
+
+async def adjust_reserved(session: AsyncSession, deltas: Mapping[UUID, int]) -> List[UUID]:
+    """Add `deltas` to reserved_quantity in one statement, where enough stock is unreserved.
+
+    The variants must already be locked. Returns the variants that could not
+    be adjusted.
+    """
+    deltas = {variant_id: delta for variant_id, delta in deltas.items() if delta}
+    if not deltas:
+        return []
+
+    requested = values(
+        column("variant_id", PGUUID(as_uuid=True)),
+        column("delta", Integer),
+        name="requested"
+    ).data(sorted(deltas.items()))
+
+    result = await session.exec(
+        update(ProductVariant)
+        .where(
+            ProductVariant.id == requested.c.variant_id,
+            ProductVariant.stock_quantity - ProductVariant.reserved_quantity >= requested.c.delta
+        )
+        .values(reserved_quantity=ProductVariant.reserved_quantity + requested.c.delta)
+        .returning(ProductVariant.id)
+        .execution_options(synchronize_session=False)
+    )
+    adjusted = set(result.scalars().all())
+    return sorted(variant_id for variant_id in deltas if variant_id not in adjusted)
+
+async def _take_from_any_shard(session: AsyncSession, variant_id: UUID, quantity: int) -> Optional[Decimal]:
+    """Take `quantity` from a single shard; returns the unit price, or None if no shard holds enough.
+
+    Tries a random unlocked shard first. When every suitable shard is locked,
+    it queues on one of them instead. That wait cannot deadlock: sharded
+    variants are taken in id order before any variant row is locked, and
+    transactions holding variant rows never wait on shards.
+    """
+    shard = (
+        select(VariantStockShard.shard)
+        .where(VariantStockShard.variant_id == variant_id, VariantStockShard.quantity >= quantity)
+        .order_by(func.random())
+        .limit(1)
+    )
+    price = await _take_from_shard(session, variant_id, quantity, shard.with_for_update(skip_locked=True))
+    for _ in range(SHARD_RETRIES):
+        if price is not None:
+            return price
+        # Committed state, ignoring locks: is any shard worth queueing on?
+        result = await session.exec(shard)
+        busy_shard = result.first()
+        if busy_shard is None:
+            return None
+        price = await _take_from_shard(session, variant_id, quantity, busy_shard)
+    return price
+
+async def _take_from_shard(session: AsyncSession, variant_id: UUID, quantity: int, shard) -> Optional[Decimal]:
+    """Decrement `shard` (a number or a subquery picking one) if it still holds `quantity`"""
+    result = await session.exec(
+        update(VariantStockShard)
+        .where(
+            VariantStockShard.variant_id == variant_id,
+            VariantStockShard.shard == shard if isinstance(shard, int) else VariantStockShard.shard.in_(shard),
+            VariantStockShard.quantity >= quantity,
+            ProductVariant.id == VariantStockShard.variant_id,
+            Product.id == ProductVariant.product_id,
+            Product.status == ProductStatus.ACTIVE
+        )
+        .values(quantity=VariantStockShard.quantity - quantity)
+        .returning(Product.base_price + ProductVariant.price_offset)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalar_one_or_none()
+
+async def pull_from_shards(session: AsyncSession, variant_id: UUID, needed: int) -> int:
+    """Move up to `needed` units from unlocked shards onto the (locked) variant row; returns the units moved"""
+    result = await session.exec(
+        select(VariantStockShard.shard, VariantStockShard.quantity)
+        .where(VariantStockShard.variant_id == variant_id, VariantStockShard.quantity > 0)
+        .order_by(VariantStockShard.quantity.desc())
+        .with_for_update(skip_locked=True)
+    )
+    takes: Dict[int, int] = {}
+    for shard, quantity in result.all():
+        if needed <= 0:
+            break
+        takes[shard] = min(quantity, needed)
+        needed -= takes[shard]
+    if not takes:
+        return 0
+
+    taken = values(
+        column("shard", Integer),
+        column("quantity", Integer),
+        name="taken"
+    ).data(sorted(takes.items()))
+    await session.exec(
+        update(VariantStockShard)
+        .where(VariantStockShard.variant_id == variant_id, VariantStockShard.shard == taken.c.shard)
+        .values(quantity=VariantStockShard.quantity - taken.c.quantity)
+        .execution_options(synchronize_session=False)
+    )
+    moved = sum(takes.values())
+    await session.exec(
+        update(ProductVariant)
+        .where(ProductVariant.id == variant_id)
+        .values(stock_quantity=ProductVariant.stock_quantity + moved)
+        .execution_options(synchronize_session=False)
+    )
+    return moved
+
+async def set_stock_shards(session: AsyncSession, variant_id: UUID, shards: int) -> None:
+    """Spread the variant's unreserved stock evenly over `shards` shard rows (0 folds it back onto the variant row).
+
+    Also used to rebalance a sharded variant. Reserved stock always stays on
+    the variant row. Raises StockBusy if a checkout holds one of the current
+    shards; the caller should roll back and retry.
+    """
+    row = (await lock_variants(session, [variant_id], off_sale_ok={variant_id}))[variant_id]
+    result = await session.exec(
+        select(VariantStockShard.quantity)
+        .where(VariantStockShard.variant_id == variant_id)
+        .with_for_update(skip_locked=True)
+    )
+    held = result.all()
+    if len(held) < row.stock_shards:
+        raise StockBusy(variant_id)
+
+    unreserved = row.stock_quantity - row.reserved_quantity + sum(held)
+    await session.exec(
+        delete(VariantStockShard)
+        .where(VariantStockShard.variant_id == variant_id)
+        .execution_options(synchronize_session=False)
+    )
+    if shards:
+        share, extra = divmod(unreserved, shards)
+        await session.exec(
+            insert(VariantStockShard).values([
+                {"variant_id": variant_id, "shard": shard, "quantity": share + (1 if shard < extra else 0)}
+                for shard in range(shards)
+            ])
+        )
+    await session.exec(
+        update(ProductVariant)
+        .where(ProductVariant.id == variant_id)
+        .values(
+            stock_quantity=row.reserved_quantity + (0 if shards else unreserved),
+            stock_shards=shards
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+async def variant_stock(session: AsyncSession, variant_id: UUID) -> Optional[VariantStockRead]:
+    """Stock of a variant, summed over its shards"""
+    variant = await session.get(ProductVariant, variant_id)
+    if variant is None:
+        return None
+    result = await session.exec(
+        select(VariantStockShard.quantity)
+        .where(VariantStockShard.variant_id == variant_id)
+        .order_by(VariantStockShard.shard)
+    )
+    return VariantStockRead(
+        variant_id=variant.id,
+        stock_shards=variant.stock_shards,
+        stock_quantity=variant.total_stock,
+        reserved_quantity=variant.reserved_quantity,
+        available_quantity=variant.available_quantity,
+        shard_quantities=result.all()
+    )
@@ -0,0 +1,74 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import selectinload
+from sqlalchemy.sql import Select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.order import Order, OrderItem
+from app.schemas.order_schema import OrderFilter, OrderPage
+from app.utils.export import RecordStream, stream_records
+from app.utils.pagination import encode_cursor, decode_cursor
+
+ORDER_EXPORT_COLUMNS = (
+    "id", "user_id", "status", "total_amount", "total_paid", "total_due",
+    "item_count", "shipping_address", "created_at", "updated_at",
+)
+
+def apply_order_filter(statement: Select, order_filter: OrderFilter) -> Select:
+    """Compile an OrderFilter into WHERE clauses on `statement`"""
+    if order_filter.statuses:
+        statement = statement.where(Order.status.in_(order_filter.statuses))
+    if order_filter.created_from is not None:
+        statement = statement.where(Order.created_at >= order_filter.created_from)
+    if order_filter.created_to is not None:
+        statement = statement.where(Order.created_at < order_filter.created_to)
+    if order_filter.user_id is not None:
+        statement = statement.where(Order.user_id == order_filter.user_id)
+    if order_filter.unpaid is not None:
+        statement = statement.where(Order.is_fully_paid.is_(not order_filter.unpaid))
+    return statement
+
+async def list_orders(session: AsyncSession, order_filter: OrderFilter, cursor: Optional[str], limit: int) -> OrderPage:
+    """Fetch one keyset page of matching orders, newest first, with their items.
+
+    Raises ValueError for an invalid cursor.
+    """
+    statement = apply_order_filter(select(Order), order_filter).order_by(Order.created_at.desc(), Order.id.desc())
+    if cursor:
+        created_at, order_id = decode_cursor(cursor, datetime, UUID)
+        statement = statement.where(tuple_(Order.created_at, Order.id) < tuple_(created_at, order_id))
+
+    result = await session.exec(statement.options(selectinload(Order.items)).limit(limit + 1))
+    orders = result.all()
+
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = encode_cursor(orders[-1].created_at, orders[-1].id)
+    return OrderPage(items=orders, next_cursor=next_cursor)
+
+def export_orders(order_filter: OrderFilter) -> RecordStream:
+    """Stream every matching order as a flat record, oldest first"""
+    item_count = (
+        select(func.count(OrderItem.id))
+        .where(OrderItem.order_id == Order.id)
+        .correlate_except(OrderItem)
+        .scalar_subquery()
+    )
+    return stream_records(apply_order_filter(
+        select(
+            Order.id,
+            Order.user_id,
+            Order.status,
+            Order.total_amount,
+            Order.total_paid.label("total_paid"),
+            Order.total_due.label("total_due"),
+            item_count.label("item_count"),
+            Order.shipping_address,
+            Order.created_at,
+            Order.updated_at
+        ),
+        order_filter
+    ).order_by(Order.created_at, Order.id))
@@ -0,0 +1,30 @@
+from typing import List, Optional
+from datetime import datetime
+from sqlmodel import select
+from app.models.payment import Payment
+from app.schemas.payment_schema import PaymentStatus
+from app.utils.export import RecordStream, stream_records
+
+PAYMENT_EXPORT_COLUMNS = (
+    "id", "order_id", "amount", "method", "status", "created_at", "updated_at",
+)
+
+# Only exported to callers allowed to see sensitive payment data
+PAYMENT_SENSITIVE_COLUMNS = ("transaction_id",)
+
+def export_payments(
+    statuses: Optional[List[PaymentStatus]] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
+) -> RecordStream:
+    """Stream every matching payment, oldest first"""
+    statement = select(
+        *(getattr(Payment, column) for column in PAYMENT_EXPORT_COLUMNS + PAYMENT_SENSITIVE_COLUMNS)
+    ).order_by(Payment.created_at, Payment.id)
+    if statuses:
+        statement = statement.where(Payment.status.in_(statuses))
+    if created_from is not None:
+        statement = statement.where(Payment.created_at >= created_from)
+    if created_to is not None:
+        statement = statement.where(Payment.created_at < created_to)
+    return stream_records(statement)
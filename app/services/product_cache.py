@@ -0,0 +1,179 @@
+import asyncio
+import time
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+from uuid import UUID
+from sqlalchemy import delete, event, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import Session
+from app.config import get_settings
+from app.db import async_engine
+from app.logging_config.logger import logger
+from app.models.cache import ProductCacheEntry
+from app.models.product import Product, ProductImage, ProductVariant
+from app.utils.ttl_cache import TTLCache
+
+settings = get_settings()
+
+class SharedProductStore:
+    """Serialized products in the unlogged product_cache_entry table, shared by every worker"""
+
+    # Expired rows are deleted at most this often
+    PRUNE_INTERVAL_SECONDS = 300.0
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._pruned_at = time.monotonic()
+
+    async def get(self, product_id: UUID, etag: str) -> Optional[bytes]:
+        table = ProductCacheEntry.__table__
+        async with async_engine.connect() as conn:
+            result = await conn.execute(
+                select(table.c.body).where(
+                    table.c.product_id == product_id, table.c.etag == etag, table.c.expires_at > func.now()
+                )
+            )
+            return result.scalar()
+
+    async def set(self, product_id: UUID, etag: str, body: bytes) -> None:
+        table = ProductCacheEntry.__table__
+        values = {"etag": etag, "body": body, "expires_at": func.now() + timedelta(seconds=self.ttl)}
+        async with async_engine.begin() as conn:
+            await conn.execute(
+                insert(table).values(product_id=product_id, **values)
+                .on_conflict_do_update(index_elements=[table.c.product_id], set_=values)
+            )
+            if time.monotonic() - self._pruned_at > self.PRUNE_INTERVAL_SECONDS:
+                self._pruned_at = time.monotonic()
+                await conn.execute(delete(table).where(table.c.expires_at <= func.now()))
+
+
+class ProductCache:
+    """Read-through cache of serialized ProductRead bodies, keyed by product and ETag.
+
+    An entry only answers for the ETag it was built under, so a product
+    changed through any worker (which moves its timestamp or its stock
+    digest) is never served stale; `invalidate` just frees the memory early
+    and `ttl` bounds how long unused entries hold it.
+    Concurrent misses for the same product share a single load.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, shared: Optional[SharedProductStore] = None):
+        # product id -> (etag, body)
+        self._local: TTLCache[UUID, Tuple[str, bytes]] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._loading: Dict[Tuple[UUID, str], asyncio.Future] = {}
+        self.shared = shared
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    async def get(self, product_id: UUID, etag: str, load: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        """The body for `product_id` at `etag`, calling `load` on a miss; None if the product is gone"""
+        entry = self._local.get(product_id)
+        if entry is not None and entry[0] == etag:
+            self.hits += 1
+            return entry[1]
+
+        key = (product_id, etag)
+        loading = self._loading.get(key)
+        if loading is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(loading)
+            except asyncio.CancelledError:
+                if not loading.cancelled():
+                    raise
+                # The request doing the load went away; load for ourselves instead
+                return await self._fill(product_id, etag, load)
+
+        loading = self._loading[key] = asyncio.get_running_loop().create_future()
+        try:
+            body = await self._fill(product_id, etag, load)
+        except asyncio.CancelledError:
+            loading.cancel()
+            raise
+        except Exception as e:
+            loading.set_exception(e)
+            # Waiters re-raise it; without any, the future must not report it as unretrieved
+            loading.exception()
+            raise
+        else:
+            loading.set_result(body)
+            return body
+        finally:
+            del self._loading[key]
+
+    async def _fill(self, product_id: UUID, etag: str, load: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        if self.shared is not None:
+            body = await self._shared_call(self.shared.get(product_id, etag))
+            if body is not None:
+                self.shared_hits += 1
+                self._local.set(product_id, (etag, body))
+                return body
+
+        self.misses += 1
+        body = await load()
+        if body is not None:
+            self._local.set(product_id, (etag, body))
+            if self.shared is not None:
+                await self._shared_call(self.shared.set(product_id, etag, body))
+        return body
+
+    @staticmethod
+    async def _shared_call(call: Awaitable[Any]) -> Any:
+        # The shared store is only an optimisation; reads fall back to the database if it fails
+        try:
+            return await call
+        except SQLAlchemyError as e:
+            logger.warning(f"Shared product cache failed: {e}")
+            return None
+
+    def invalidate(self, product_ids: Iterable[UUID]) -> None:
+        for product_id in product_ids:
+            if self._local.pop(product_id) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.shared_hits + self.misses + self.coalesced
+        return {
+            "size": len(self._local),
+            "shared": self.shared is not None,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            "hit_ratio": (lookups - self.misses) / lookups if lookups else 0.0,
+        }
+
+
+product_cache = ProductCache(
+    settings.product_cache_size,
+    settings.product_cache_ttl_seconds,
+    SharedProductStore(settings.product_cache_ttl_seconds) if settings.product_cache_shared else None
+)
+
+# Products written through the ORM are dropped from this worker's cache when their transaction commits.
+# Core statements (bulk import, stock updates) bypass these hooks and call product_cache.invalidate themselves.
+PRODUCT_IDS_KEY = "written_product_ids"
+
+@event.listens_for(Session, "after_flush")
+def _collect_written_products(session, flush_context) -> None:
+    written: Set[UUID] = session.info.setdefault(PRODUCT_IDS_KEY, set())
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, Product):
+            written.add(instance.id)
+        elif isinstance(instance, (ProductVariant, ProductImage)):
+            written.add(instance.product_id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_written_products(session) -> None:
+    product_cache.invalidate(session.info.pop(PRODUCT_IDS_KEY, ()))
+
+@event.listens_for(Session, "after_rollback")
+def _forget_written_products(session) -> None:
+    session.info.pop(PRODUCT_IDS_KEY, None)
@@ -0,0 +1,383 @@
+import csv
+import io
+import json
+from enum import Enum
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional, Set, Tuple
+from uuid import UUID, uuid4
+from pydantic import ValidationError
+from sqlalchemy import case, delete, func, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.product import Category, Product, ProductCategory, ProductImage, ProductVariant
+from app.schemas.product_schema import ImportRowError, ProductImportRecord, ProductImportReport, ProductStatus
+from app.services.cache_versions import PRODUCTS, bump_version, version_tracker
+from app.services.product_cache import product_cache
+from app.services.search import get_search_backend
+from app.utils.datetime_now import datetime_now
+
+# Core tables: bulk statements against them skip the ORM's per-row bookkeeping
+product_table = Product.__table__
+product_category_table = ProductCategory.__table__
+variant_table = ProductVariant.__table__
+image_table = ProductImage.__table__
+
+# Records validated and written per transaction
+IMPORT_BATCH_SIZE = 500
+
+# Row errors kept in the report; later ones are only counted
+MAX_REPORTED_ERRORS = 1000
+
+# Separates list items inside a CSV cell
+CSV_LIST_SEPARATOR = "|"
+
+class ImportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+# (row, record, error): exactly one of record and error is set
+ParsedRecord = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """Split a byte stream into numbered lines without holding more than one partial line"""
+    pending = b""
+    number = 0
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            number += 1
+            yield number, _decode(line, number)
+    if pending:
+        yield number + 1, _decode(pending, number + 1)
+
+def _decode(line: bytes, number: int) -> str:
+    text = line.decode("utf-8", errors="replace").rstrip("\r")
+    # Spreadsheet exports often start with a byte order mark
+    return text.lstrip("\ufeff") if number == 1 else text
+
+async def parse_ndjson(lines: AsyncIterable[Tuple[int, str]]) -> AsyncIterator[ParsedRecord]:
+    """One product object per line; blank lines are skipped"""
+    async for number, line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield number, None, "Expected a JSON object"
+            continue
+        yield number, record, None
+
+async def parse_csv(lines: AsyncIterable[Tuple[int, str]]) -> AsyncIterator[ParsedRecord]:
+    """One variant per row, with a header row.
+
+    Consecutive rows with the same `id` (or `name` when there is no id) make
+    up one product; its product columns are taken from the first of them.
+    Columns: id, name, description, base_price, status, categories_ids,
+    sku, attributes, price_offset, stock_quantity, image_urls. List cells
+    are `|`-separated and attributes are written as `key:value|key:value`.
+    """
+    header: Optional[List[str]] = None
+    group: Optional[Dict[str, Any]] = None
+    group_key = None
+    group_row = 0
+    group_error: Optional[str] = None
+    start, pending = 0, []
+
+    async for number, line in lines:
+        # A quoted cell may span lines; wait until its closing quote arrives
+        if not pending:
+            start = number
+        pending.append(line)
+        text = "\n".join(pending)
+        if text.count('"') % 2:
+            continue
+        pending = []
+        if not text.strip():
+            continue
+
+        cells = next(csv.reader(io.StringIO(text)))
+        if header is None:
+            header = [cell.strip() for cell in cells]
+            continue
+        row = {column: cell.strip() for column, cell in zip(header, cells) if cell.strip()}
+
+        key = row.get("id") or row.get("name")
+        if group is None or key != group_key:
+            if group is not None:
+                yield group_row, None if group_error else group, group_error
+            group, group_key, group_row, group_error = _csv_product(row), key, start, None
+        try:
+            _add_csv_row(group, row)
+        except ValueError as e:
+            group_error = group_error or f"Line {start}: {e}"
+
+    if pending:
+        group_error = group_error or f"Line {start}: unterminated quoted cell"
+    if group is not None:
+        yield group_row, None if group_error else group, group_error
+
+def _csv_product(row: Dict[str, str]) -> Dict[str, Any]:
+    product: Dict[str, Any] = {
+        key: row[key] for key in ("id", "name", "description", "base_price", "status") if key in row
+    }
+    if "categories_ids" in row:
+        product["categories_ids"] = _split(row["categories_ids"])
+    product["variants"] = []
+    return product
+
+def _add_csv_row(product: Dict[str, Any], row: Dict[str, str]) -> None:
+    if "sku" in row:
+        variant: Dict[str, Any] = {
+            key: row[key] for key in ("sku", "price_offset", "stock_quantity") if key in row
+        }
+        attributes = {}
+        for item in _split(row.get("attributes", "")):
+            key, sep, value = item.partition(":")
+            if not sep or not key:
+                raise ValueError(f"Invalid attribute '{item}', expected key:value")
+            attributes[key.strip()] = value.strip()
+        variant["attributes"] = attributes
+        product["variants"].append(variant)
+
+    if "image_urls" in row:
+        images = product.setdefault("images", [])
+        for url in _split(row["image_urls"]):
+            if all(image["image_url"] != url for image in images):
+                images.append({
+                    "image_url": url,
+                    "image_alt": product.get("name", "")[:100],
+                    "sort_order": len(images)
+                })
+
+def _split(cell: str) -> List[str]:
+    return [item.strip() for item in cell.split(CSV_LIST_SEPARATOR) if item.strip()]
+
+def parse_records(chunks: AsyncIterable[bytes], import_format: ImportFormat) -> AsyncIterator[ParsedRecord]:
+    lines = iter_lines(chunks)
+    return parse_csv(lines) if import_format == ImportFormat.CSV else parse_ndjson(lines)
+
+
+async def import_products(
+    session: AsyncSession,
+    records: AsyncIterable[ParsedRecord],
+    batch_size: int = IMPORT_BATCH_SIZE
+) -> ProductImportReport:
+    """Validate and upsert products in batches, committing after each batch.
+
+    A record that fails validation or its writes is reported in the result
+    and skipped; the rest of its batch is still imported. Products are
+    upserted by id, variants by SKU. Categories and images are replaced
+    when a record lists them; variants missing from a record are kept.
+    """
+    report = ProductImportReport()
+    batch: List[Tuple[int, ProductImportRecord]] = []
+
+    async for row, data, error in records:
+        report.processed += 1
+        if error is not None:
+            _reject(report, row, error)
+            continue
+        try:
+            batch.append((row, ProductImportRecord.model_validate(data)))
+        except ValidationError as e:
+            _reject(report, row, _validation_message(e))
+            continue
+
+        if len(batch) >= batch_size:
+            await _import_batch(session, batch, report)
+            batch = []
+
+    if batch:
+        await _import_batch(session, batch, report)
+    return report
+
+def _reject(report: ProductImportReport, row: int, message: str) -> None:
+    report.failed += 1
+    if len(report.errors) < MAX_REPORTED_ERRORS:
+        report.errors.append(ImportRowError(row=row, message=message))
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" if item["loc"] else item["msg"]
+        for item in error.errors()
+    )
+
+async def _import_batch(
+    session: AsyncSession,
+    batch: List[Tuple[int, ProductImportRecord]],
+    report: ProductImportReport
+) -> None:
+    resolved = await _resolve_batch(session, batch, report)
+    if not resolved:
+        return
+
+    # Write the whole batch at once; if any row breaks a constraint, retry row by row to isolate it
+    try:
+        async with session.begin_nested():
+            created = await _write_products(session, resolved)
+        written = resolved
+    except DBAPIError:
+        created, written = set(), []
+        for item in resolved:
+            try:
+                async with session.begin_nested():
+                    created |= await _write_products(session, [item])
+                written.append(item)
+            except DBAPIError as e:
+                # Keep the database's one-line reason, without the driver's exception class prefix
+                _reject(report, item[0], str(e.orig).splitlines()[0].rpartition(">: ")[2])
+
+    product_ids = [product_id for _, _, product_id in written]
+    await get_search_backend(session).index_products(session, product_ids)
+    if product_ids:
+        await bump_version(session, PRODUCTS)
+    await session.commit()
+    version_tracker.invalidate(PRODUCTS)
+    product_cache.invalidate(product_ids)
+    report.created += len(created)
+    report.updated += len(written) - len(created)
+
+async def _resolve_batch(
+    session: AsyncSession,
+    batch: List[Tuple[int, ProductImportRecord]],
+    report: ProductImportReport
+) -> List[Tuple[int, ProductImportRecord, UUID]]:
+    """Check categories and SKUs for the whole batch in two queries and pick each record's product id"""
+    category_ids = {category_id for _, record in batch for category_id in record.categories_ids or []}
+    known_categories: Set[UUID] = set()
+    if category_ids:
+        result = await session.exec(select(Category.id).where(Category.id.in_(category_ids)))
+        known_categories = set(result.all())
+
+    skus = {variant.sku for _, record in batch for variant in record.variants or []}
+    sku_owners: Dict[str, UUID] = {}
+    if skus:
+        result = await session.exec(select(ProductVariant.sku, ProductVariant.product_id).where(ProductVariant.sku.in_(skus)))
+        sku_owners = dict(result.all())
+
+    resolved = []
+    seen_skus: Set[str] = set()
+    seen_products: Set[UUID] = set()
+    for row, record in batch:
+        record_skus = [variant.sku for variant in record.variants or []]
+        unknown = set(record.categories_ids or []) - known_categories
+        owners = {sku_owners[sku] for sku in record_skus if sku in sku_owners}
+        if record.id is not None:
+            owners.discard(record.id)
+
+        if unknown:
+            _reject(report, row, f"Unknown categories: {', '.join(sorted(str(c) for c in unknown))}")
+        elif seen_skus.intersection(record_skus):
+            _reject(report, row, f"SKUs repeated from an earlier record in this batch: {', '.join(sorted(seen_skus.intersection(record_skus)))}")
+        elif owners and (record.id is not None or len(owners) > 1):
+            _reject(report, row, "SKUs belong to another product")
+        else:
+            product_id = record.id or (owners.pop() if owners else uuid4())
+            if product_id in seen_products:
+                _reject(report, row, "Product repeated from an earlier record in this batch")
+                continue
+            seen_products.add(product_id)
+            seen_skus.update(record_skus)
+            resolved.append((row, record, product_id))
+    return resolved
+
+async def _write_products(session: AsyncSession, items: List[Tuple[int, ProductImportRecord, UUID]]) -> Set[UUID]:
+    """Upsert products and their children with one batched statement per table; returns the ids created.
+
+    Rows are bound as executemany parameters against the plain tables, so
+    each statement compiles once and goes out as multi-row VALUES pages.
+    """
+    products = [
+        {
+            "id": product_id,
+            "name": record.name,
+            "description": record.description,
+            "base_price": record.base_price,
+            "status": record.status.value,
+            "created_at": datetime_now(),
+        }
+        for _, record, product_id in items
+    ]
+    statement = insert(product_table)
+    statement = statement.on_conflict_do_update(
+        index_elements=["id"],
+        set_={
+            "name": statement.excluded.name,
+            "description": statement.excluded.description,
+            "base_price": statement.excluded.base_price,
+            "status": statement.excluded.status,
+            "updated_at": func.now(),
+        }
+    )
+    # xmax is only zero on rows this statement inserted
+    result = await session.exec(statement.returning(product_table.c.id, literal_column("xmax = 0")), params=products)
+    created = {product_id for product_id, inserted in result.all() if inserted}
+
+    categorized = [(record, product_id) for _, record, product_id in items if record.categories_ids is not None]
+    if categorized:
+        await session.exec(
+            delete(ProductCategory).where(ProductCategory.product_id.in_([product_id for _, product_id in categorized]))
+        )
+        links = [
+            {"product_id": product_id, "category_id": category_id}
+            for record, product_id in categorized
+            for category_id in set(record.categories_ids)
+        ]
+        if links:
+            await session.exec(insert(product_category_table).on_conflict_do_nothing(), params=links)
+
+    variants = [
+        {
+            "product_id": product_id,
+            "sku": variant.sku,
+            "attributes": variant.attributes or {},
+            "price_offset": variant.price_offset or 0,
+            "stock_quantity": variant.stock_quantity,
+            "status": ProductStatus.ACTIVE,
+        }
+        for _, record, product_id in items
+        for variant in record.variants or []
+    ]
+    if variants:
+        statement = insert(variant_table)
+        await session.exec(
+            statement.on_conflict_do_update(
+                index_elements=["sku"],
+                set_={
+                    "attributes": statement.excluded.attributes,
+                    "price_offset": statement.excluded.price_offset,
+                    # Sharded stock is spread over shard rows; leave it to the stock endpoints
+                    "stock_quantity": case(
+                        (variant_table.c.stock_shards > 0, variant_table.c.stock_quantity),
+                        else_=statement.excluded.stock_quantity
+                    ),
+                }
+            ),
+            params=variants
+        )
+
+    imaged = [(record, product_id) for _, record, product_id in items if record.images is not None]
+    if imaged:
+        await session.exec(
+            delete(ProductImage).where(ProductImage.product_id.in_([product_id for _, product_id in imaged]))
+        )
+        images = [
+            {
+                "product_id": product_id,
+                "image_url": image.image_url,
+                "image_alt": image.image_alt,
+                "caption": image.caption,
+                "sort_order": image.sort_order or 0,
+            }
+            for record, product_id in imaged
+            for image in record.images
+        ]
+        if images:
+            await session.exec(insert(image_table), params=images)
+
+    return created
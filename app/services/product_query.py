@@ -0,0 +1,331 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, AsyncIterable, AsyncIterator, List, Mapping, Optional, Sequence, Tuple
+from uuid import UUID
+from sqlalchemy import Integer, Text, case, exists, func, literal_column, tuple_, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by
+from sqlalchemy.orm import selectinload
+from sqlalchemy.sql import Select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.product import Category, Product, ProductCategory, ProductImage, ProductVariant
+from app.schemas.product_schema import (
+    PriceBucketCount, ProductBatchItem, ProductFacets, ProductFilter, ProductPage, ProductRead, ProductSort, ProductStatus
+)
+from app.services.category_tree import in_subtree
+from app.utils.export import RecordStream, stream_records
+from app.utils.pagination import encode_cursor, decode_cursor
+
+# Load everything ProductRead touches in a fixed number of batched queries
+PRODUCT_LOAD_OPTIONS = (
+    selectinload(Product.variants),
+    selectinload(Product.images),
+    selectinload(Product.categories),
+)
+
+# Nested export records: one per product, in the bulk import's NDJSON layout
+PRODUCT_EXPORT_COLUMNS = (
+    "id", "name", "description", "base_price", "status", "categories_ids",
+    "variants", "images", "created_at", "updated_at",
+)
+
+# Flat export rows: one per variant, in the bulk import's CSV layout
+PRODUCT_EXPORT_FLAT_COLUMNS = (
+    "id", "name", "description", "base_price", "status", "categories_ids",
+    "sku", "attributes", "price_offset", "stock_quantity", "image_urls",
+)
+
+# SQL types of the flat columns, for Parquet; lists and attributes are joined into text
+PRODUCT_EXPORT_FLAT_TYPES = {
+    "id": Product.id.type,
+    "name": Product.name.type,
+    "description": Product.description.type,
+    "base_price": Product.base_price.type,
+    "status": Product.status.type,
+    "categories_ids": Text(),
+    "sku": ProductVariant.sku.type,
+    "attributes": Text(),
+    "price_offset": ProductVariant.price_offset.type,
+    "stock_quantity": Integer(),
+    "image_urls": Text(),
+}
+
+# Lower bounds of the price facet buckets; the last bucket is open-ended
+PRICE_BUCKETS: Tuple[Decimal, ...] = tuple(Decimal(b) for b in (0, 25, 50, 100, 250, 500, 1000))
+
+# sort -> (column, descending, python type of the column for cursors)
+SORT_KEYS: dict[ProductSort, Tuple[Any, bool, type]] = {
+    ProductSort.NEWEST: (Product.created_at, True, datetime),
+    ProductSort.OLDEST: (Product.created_at, False, datetime),
+    ProductSort.PRICE_ASC: (Product.base_price, False, Decimal),
+    ProductSort.PRICE_DESC: (Product.base_price, True, Decimal),
+    ProductSort.NAME_ASC: (Product.name, False, str),
+    ProductSort.NAME_DESC: (Product.name, True, str),
+}
+
+async def fetch_products(session: AsyncSession, ids: Sequence[UUID] = (), skus: Sequence[str] = ()) -> List[ProductBatchItem]:
+    """Products for each key, in request order, with one IN query per relationship.
+
+    Keys are ids, or SKUs resolved to the product owning that variant.
+    Repeated keys are answered again; unknown ones come back with found=False.
+    """
+    product_ids = list(ids)
+    if skus:
+        result = await session.exec(
+            select(ProductVariant.sku, ProductVariant.product_id).where(ProductVariant.sku.in_(set(skus)))
+        )
+        owners = dict(result.all())
+        product_ids = [owners.get(sku) for sku in skus]
+
+    wanted = {product_id for product_id in product_ids if product_id is not None}
+    products = {}
+    if wanted:
+        result = await session.exec(select(Product).where(Product.id.in_(wanted)).options(*PRODUCT_LOAD_OPTIONS))
+        products = {product.id: ProductRead.model_validate(product) for product in result.all()}
+
+    if skus:
+        return [
+            ProductBatchItem(sku=sku, found=product_id in products, product=products.get(product_id))
+            for sku, product_id in zip(skus, product_ids)
+        ]
+    return [
+        ProductBatchItem(id=product_id, found=product_id in products, product=products.get(product_id))
+        for product_id in product_ids
+    ]
+
+def apply_product_filter(statement: Select, product_filter: ProductFilter) -> Select:
+    """Compile a ProductFilter into WHERE clauses on `statement`"""
+    if product_filter.statuses:
+        statement = statement.where(Product.status.in_(product_filter.statuses))
+    if product_filter.min_price is not None:
+        statement = statement.where(Product.base_price >= product_filter.min_price)
+    if product_filter.max_price is not None:
+        statement = statement.where(Product.base_price <= product_filter.max_price)
+    if product_filter.category_ids:
+        statement = statement.where(
+            Product.id.in_(
+                select(ProductCategory.product_id)
+                .where(ProductCategory.category_id.in_(product_filter.category_ids))
+            )
+        )
+    if product_filter.category_subtree_id:
+        statement = statement.where(
+            Product.id.in_(
+                select(ProductCategory.product_id)
+                .join(Category, Category.id == ProductCategory.category_id)
+                .where(in_subtree(product_filter.category_subtree_id))
+            )
+        )
+    if product_filter.attributes:
+        statement = statement.where(
+            exists().where(
+                ProductVariant.product_id == Product.id,
+                type_coerce(ProductVariant.attributes, JSONB).contains(product_filter.attributes)
+            )
+        )
+    return statement
+
+def apply_sort(statement: Select, sort: ProductSort, cursor: Optional[str] = None) -> Select:
+    """Order `statement` by `sort` and resume after `cursor`.
+
+    Raises ValueError if the cursor is malformed or was issued for another sort.
+    """
+    column, descending, column_type = SORT_KEYS[sort]
+    if descending:
+        statement = statement.order_by(column.desc(), Product.id.desc())
+    else:
+        statement = statement.order_by(column.asc(), Product.id.asc())
+
+    if cursor:
+        cursor_sort, value, product_id = decode_cursor(cursor, str, column_type, UUID)
+        if cursor_sort != sort.value:
+            raise ValueError("Cursor was issued for a different sort")
+        key, after = tuple_(column, Product.id), tuple_(value, product_id)
+        statement = statement.where(key < after if descending else key > after)
+    return statement
+
+def cursor_for(product: Product, sort: ProductSort) -> str:
+    """Build the cursor that resumes a listing after `product`"""
+    column, _, _ = SORT_KEYS[sort]
+    return encode_cursor(sort.value, getattr(product, column.key), product.id)
+
+async def list_products(
+    session: AsyncSession,
+    product_filter: ProductFilter,
+    sort: ProductSort,
+    cursor: Optional[str],
+    limit: int
+) -> ProductPage:
+    """Fetch one keyset page of products matching `product_filter`.
+
+    Raises ValueError for an invalid cursor.
+    """
+    statement = apply_sort(apply_product_filter(select(Product), product_filter), sort, cursor)
+    result = await session.exec(statement.options(*PRODUCT_LOAD_OPTIONS).limit(limit + 1))
+    products = result.all()
+
+    next_cursor = None
+    if len(products) > limit:
+        products = products[:limit]
+        next_cursor = cursor_for(products[-1], sort)
+    return ProductPage(items=products, next_cursor=next_cursor)
+
+def stock_digest(condition) -> Any:
+    """Scalar subquery fingerprinting the stock shown for the variants matching `condition`.
+
+    Stock moves with checkouts, reservations and stock adjustments without
+    touching any version, so validators of bodies that show it include this.
+    """
+    figures = func.concat_ws(
+        ":",
+        ProductVariant.id,
+        ProductVariant.stock_quantity + ProductVariant.shard_quantity,
+        ProductVariant.reserved_quantity
+    )
+    return (
+        select(func.coalesce(func.md5(func.string_agg(figures, aggregate_order_by(",", ProductVariant.id))), ""))
+        .where(condition)
+        .scalar_subquery()
+    )
+
+async def page_stock_digest(
+    session: AsyncSession,
+    product_filter: ProductFilter,
+    sort: ProductSort,
+    cursor: Optional[str],
+    limit: int
+) -> str:
+    """stock_digest of the products list_products would return, without loading them.
+
+    Raises ValueError for an invalid cursor.
+    """
+    page = apply_sort(apply_product_filter(select(Product.id), product_filter), sort, cursor).limit(limit)
+    result = await session.exec(select(stock_digest(ProductVariant.product_id.in_(page))))
+    return result.one()
+
+async def product_facets(session: AsyncSession, product_filter: ProductFilter) -> ProductFacets:
+    """Count filtered products per category, status and price bucket in one query"""
+    price_bucket = case(
+        *[(Product.base_price < bound, i) for i, bound in enumerate(PRICE_BUCKETS[1:])],
+        else_=len(PRICE_BUCKETS) - 1
+    )
+    matching = apply_product_filter(
+        select(
+            Product.id.label("product_id"),
+            Product.status.label("status"),
+            price_bucket.label("price_bucket"),
+            ProductCategory.category_id.label("category_id")
+        ).outerjoin(ProductCategory, ProductCategory.product_id == Product.id),
+        product_filter
+    ).subquery()
+
+    statement = select(
+        matching.c.category_id,
+        matching.c.status,
+        matching.c.price_bucket,
+        func.grouping(matching.c.category_id, matching.c.status, matching.c.price_bucket),
+        func.count(func.distinct(matching.c.product_id))
+    ).group_by(
+        func.grouping_sets(
+            tuple_(matching.c.category_id),
+            tuple_(matching.c.status),
+            tuple_(matching.c.price_bucket)
+        )
+    )
+    result = await session.exec(statement)
+
+    facets = ProductFacets()
+    bucket_counts = {}
+    # grouping() sets a bit for every column *not* in the row's grouping set
+    for category_id, product_status, bucket, grouping, count in result.all():
+        if grouping == 0b011:
+            if category_id is not None:
+                facets.categories[category_id] = count
+        elif grouping == 0b101:
+            facets.statuses[ProductStatus(product_status)] = count
+        elif grouping == 0b110:
+            bucket_counts[bucket] = count
+
+    for i, lower in enumerate(PRICE_BUCKETS):
+        upper = PRICE_BUCKETS[i + 1] if i + 1 < len(PRICE_BUCKETS) else None
+        facets.price_buckets.append(
+            PriceBucketCount(min_price=lower, max_price=upper, count=bucket_counts.get(i, 0))
+        )
+    return facets
+
+def export_products(product_filter: ProductFilter) -> RecordStream:
+    """Stream every matching product with its categories, variants and images, oldest first.
+
+    Children are aggregated per product in SQL, so each product is a single
+    row from the server-side cursor.
+    """
+    categories_ids = (
+        select(func.coalesce(func.array_agg(aggregate_order_by(ProductCategory.category_id, ProductCategory.category_id)), literal_column("'{}'")))
+        .where(ProductCategory.product_id == Product.id)
+        .correlate_except(ProductCategory)
+        .scalar_subquery()
+    )
+    variant = func.jsonb_build_object(
+        "sku", ProductVariant.sku,
+        "attributes", ProductVariant.attributes,
+        "price_offset", ProductVariant.price_offset,
+        "stock_quantity", ProductVariant.stock_quantity + ProductVariant.shard_quantity
+    )
+    variants = (
+        select(func.coalesce(func.jsonb_agg(aggregate_order_by(variant, ProductVariant.sku)), literal_column("'[]'::jsonb"), type_=JSONB))
+        .where(ProductVariant.product_id == Product.id)
+        .correlate_except(ProductVariant)
+        .scalar_subquery()
+    )
+    image = func.jsonb_build_object(
+        "image_url", ProductImage.image_url,
+        "image_alt", ProductImage.image_alt,
+        "caption", ProductImage.caption,
+        "sort_order", ProductImage.sort_order
+    )
+    images = (
+        select(func.coalesce(func.jsonb_agg(aggregate_order_by(image, ProductImage.sort_order)), literal_column("'[]'::jsonb"), type_=JSONB))
+        .where(ProductImage.product_id == Product.id)
+        .correlate_except(ProductImage)
+        .scalar_subquery()
+    )
+    return stream_records(apply_product_filter(
+        select(
+            Product.id,
+            Product.name,
+            Product.description,
+            Product.base_price,
+            Product.status,
+            categories_ids.label("categories_ids"),
+            variants.label("variants"),
+            images.label("images"),
+            Product.created_at,
+            Product.updated_at
+        ),
+        product_filter
+    ).order_by(Product.created_at, Product.id))
+
+async def flatten_products(records: AsyncIterable[Mapping[str, Any]]) -> AsyncIterator[Mapping[str, Any]]:
+    """Turn nested product records into one row per variant, which the bulk import reads back"""
+    async for record in records:
+        product = {
+            "id": record["id"],
+            "name": record["name"],
+            "description": record["description"],
+            "base_price": record["base_price"],
+            "status": record["status"],
+            "categories_ids": "|".join(str(category_id) for category_id in record["categories_ids"]),
+        }
+        image_urls = "|".join(image["image_url"] for image in record["images"])
+        # A product without variants still gets a row
+        for i, variant in enumerate(record["variants"] or [None]):
+            row = dict(product, sku=None, attributes=None, price_offset=None, stock_quantity=None, image_urls=None if i else image_urls)
+            if variant is not None:
+                row.update(
+                    sku=variant["sku"],
+                    attributes="|".join(f"{key}:{value}" for key, value in variant["attributes"].items()),
+                    # Numbers come back from JSON as floats
+                    price_offset=Decimal(str(variant["price_offset"])),
+                    stock_quantity=variant["stock_quantity"]
+                )
+            yield row
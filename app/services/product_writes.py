@@ -0,0 +1,251 @@
+from decimal import Decimal
+from typing import Collection, Dict, List, Sequence, Set, Tuple
+from uuid import UUID, uuid4
+from fastapi import HTTPException, status
+from sqlalchemy import Integer, Numeric, String, case, cast, column, delete, func, insert, update, values
+from sqlalchemy.dialects.postgresql import JSONB, UUID as PGUUID
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.product import Product, ProductImage, ProductVariant
+from app.schemas.product_schema import (
+    AdjustedStock, ProductImageBulkUpdate, ProductImageCreate, ProductStatus,
+    ProductVariantBulkUpdate, ProductVariantCreate, StockAdjustment, StockAdjustmentReport
+)
+from app.services.cache_versions import PRODUCTS, bump_version, version_tracker
+from app.services.product_cache import product_cache
+from app.services.search import get_search_backend
+from app.utils.datetime_now import datetime_now
+
+# Every write below is one statement for the whole batch, whatever its size.
+# They bypass the ORM, so callers finish with touch_products before committing
+# and forget_products after.
+
+async def touch_products(session: AsyncSession, product_ids: Collection[UUID]) -> None:
+    """Stamp changed products, reindex them for search and move the catalog version"""
+    if not product_ids:
+        return
+    await session.exec(
+        update(Product)
+        .where(Product.id.in_(product_ids))
+        .values(updated_at=datetime_now())
+        .execution_options(synchronize_session=False)
+    )
+    await get_search_backend(session).index_products(session, product_ids)
+    await bump_version(session, PRODUCTS)
+
+async def ensure_product(session: AsyncSession, product_id: UUID) -> None:
+    """Raise 404 unless the product exists; sub-resource writes check this first"""
+    if await session.get(Product, product_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+
+def forget_products(product_ids: Collection[UUID]) -> None:
+    """Drop this worker's cached copies of changed products; call after commit"""
+    version_tracker.invalidate(PRODUCTS)
+    product_cache.invalidate(product_ids)
+
+def _new_or_current(value, current):
+    # NULLs in a VALUES list are untyped, so a column of nothing but NULLs comes out as text
+    return func.coalesce(cast(value, current.type), current)
+
+
+async def create_variants(session: AsyncSession, product_id: UUID, variants: Sequence[ProductVariantCreate]) -> List[UUID]:
+    """Insert variants of one product; returns their ids in request order"""
+    # Ids are made here: RETURNING server-made ones in order would cost a statement per row
+    rows = [
+        {
+            "id": uuid4(),
+            "product_id": product_id,
+            "sku": variant.sku,
+            "attributes": variant.attributes or {},
+            "price_offset": variant.price_offset if variant.price_offset is not None else Decimal(0),
+            "stock_quantity": variant.stock_quantity,
+            "status": ProductStatus.ACTIVE,
+        }
+        for variant in variants
+    ]
+    await session.exec(insert(ProductVariant.__table__), params=rows)
+    return [row["id"] for row in rows]
+
+async def update_variants(session: AsyncSession, product_id: UUID, changes: Sequence[ProductVariantBulkUpdate]) -> List[UUID]:
+    """Apply per-variant changes; returns the ids found on the product.
+
+    Null fields keep their value. Stock of sharded variants is left to the
+    stock endpoints, as in the product import.
+    """
+    requested = values(
+        column("id", PGUUID(as_uuid=True)),
+        column("sku", String),
+        column("attributes", JSONB(none_as_null=True)),
+        column("price_offset", Numeric(10, 2)),
+        column("stock_quantity", Integer),
+        name="requested"
+    ).data([
+        (change.id, change.sku, change.attributes, change.price_offset, change.stock_quantity)
+        for change in changes
+    ])
+    result = await session.exec(
+        update(ProductVariant)
+        .where(ProductVariant.id == requested.c.id, ProductVariant.product_id == product_id)
+        .values(
+            sku=_new_or_current(requested.c.sku, ProductVariant.sku),
+            attributes=_new_or_current(requested.c.attributes, ProductVariant.attributes),
+            price_offset=_new_or_current(requested.c.price_offset, ProductVariant.price_offset),
+            stock_quantity=case(
+                (ProductVariant.stock_shards > 0, ProductVariant.stock_quantity),
+                else_=_new_or_current(requested.c.stock_quantity, ProductVariant.stock_quantity)
+            )
+        )
+        .returning(ProductVariant.id)
+        .execution_options(synchronize_session=False)
+    )
+    return list(result.scalars())
+
+async def delete_variants(session: AsyncSession, product_id: UUID, variant_ids: Collection[UUID]) -> List[UUID]:
+    """Delete variants of one product; returns the ids that were found"""
+    result = await session.exec(
+        delete(ProductVariant)
+        .where(ProductVariant.product_id == product_id, ProductVariant.id.in_(variant_ids))
+        .returning(ProductVariant.id)
+        .execution_options(synchronize_session=False)
+    )
+    return list(result.scalars())
+
+async def adjust_stock(session: AsyncSession, adjustments: Sequence[StockAdjustment]) -> Tuple[StockAdjustmentReport, Set[UUID]]:
+    """Add each adjustment's delta to its SKU's stock in one statement.
+
+    Deltas for the same SKU are summed. A SKU is only adjusted when its stock
+    stays at or above its reserved quantity; for sharded variants only the
+    variant row's own stock counts. Rows are locked in id order like every
+    other stock writer, so concurrent adjustments and checkouts cannot
+    deadlock. Returns the report and the ids of the products that changed.
+    """
+    deltas: Dict[str, int] = {}
+    for adjustment in adjustments:
+        deltas[adjustment.sku] = deltas.get(adjustment.sku, 0) + adjustment.delta
+
+    requested = values(
+        column("sku", String(50)),
+        column("delta", Integer),
+        name="requested"
+    ).data(list(deltas.items()))
+    locked = (
+        select(ProductVariant.id, requested.c.delta)
+        .join(requested, ProductVariant.sku == requested.c.sku)
+        .order_by(ProductVariant.id)
+        .with_for_update(of=ProductVariant)
+        .cte("locked")
+        .prefix_with("MATERIALIZED")
+    )
+    result = await session.exec(
+        update(ProductVariant)
+        .where(
+            ProductVariant.id == locked.c.id,
+            ProductVariant.stock_quantity + locked.c.delta >= ProductVariant.reserved_quantity
+        )
+        .values(stock_quantity=ProductVariant.stock_quantity + locked.c.delta)
+        .returning(
+            ProductVariant.sku,
+            ProductVariant.stock_quantity,
+            ProductVariant.reserved_quantity,
+            ProductVariant.product_id
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    report, product_ids = StockAdjustmentReport(), set()
+    for row in result.all():
+        report.adjusted.append(AdjustedStock(
+            sku=row.sku, stock_quantity=row.stock_quantity, reserved_quantity=row.reserved_quantity
+        ))
+        product_ids.add(row.product_id)
+
+    failed = set(deltas) - {item.sku for item in report.adjusted}
+    if failed:
+        # Only reached when something was rejected: tell unknown SKUs from short ones
+        result = await session.exec(select(ProductVariant.sku).where(ProductVariant.sku.in_(failed)))
+        known = set(result.all())
+        report.unknown_skus = sorted(failed - known)
+        report.insufficient_skus = sorted(known)
+    return report, product_ids
+
+
+async def create_images(session: AsyncSession, product_id: UUID, images: Sequence[ProductImageCreate]) -> List[UUID]:
+    """Insert images of one product; returns their ids in request order"""
+    rows = [
+        {
+            "id": uuid4(),
+            "product_id": product_id,
+            "image_url": image.image_url,
+            "image_alt": image.image_alt,
+            "caption": image.caption,
+            "sort_order": image.sort_order or 0,
+        }
+        for image in images
+    ]
+    await session.exec(insert(ProductImage.__table__), params=rows)
+    return [row["id"] for row in rows]
+
+async def update_images(session: AsyncSession, product_id: UUID, changes: Sequence[ProductImageBulkUpdate]) -> List[UUID]:
+    """Apply per-image changes, null fields keeping their value; returns the ids found on the product"""
+    requested = values(
+        column("id", PGUUID(as_uuid=True)),
+        column("image_url", String),
+        column("image_alt", String),
+        column("caption", String),
+        column("sort_order", Integer),
+        name="requested"
+    ).data([
+        (change.id, change.image_url, change.image_alt, change.caption, change.sort_order)
+        for change in changes
+    ])
+    result = await session.exec(
+        update(ProductImage)
+        .where(ProductImage.id == requested.c.id, ProductImage.product_id == product_id)
+        .values(
+            image_url=_new_or_current(requested.c.image_url, ProductImage.image_url),
+            image_alt=_new_or_current(requested.c.image_alt, ProductImage.image_alt),
+            caption=_new_or_current(requested.c.caption, ProductImage.caption),
+            sort_order=_new_or_current(requested.c.sort_order, ProductImage.sort_order)
+        )
+        .returning(ProductImage.id)
+        .execution_options(synchronize_session=False)
+    )
+    return list(result.scalars())
+
+async def delete_images(session: AsyncSession, product_id: UUID, image_ids: Collection[UUID]) -> List[UUID]:
+    """Delete images of one product; returns the ids that were found"""
+    result = await session.exec(
+        delete(ProductImage)
+        .where(ProductImage.product_id == product_id, ProductImage.id.in_(image_ids))
+        .returning(ProductImage.id)
+        .execution_options(synchronize_session=False)
+    )
+    return list(result.scalars())
+
+async def reorder_images(session: AsyncSession, product_id: UUID, image_ids: Sequence[UUID]) -> List[UUID]:
+    """Renumber a product's images 0..n-1 with `image_ids` first, in that order.
+
+    The others keep their relative order after them, so reordering just one
+    image makes it the primary one. Returns the ids of all the product's images.
+    """
+    position = case(
+        {image_id: index for index, image_id in enumerate(image_ids)},
+        value=ProductImage.id,
+        else_=len(image_ids)
+    )
+    ranked = (
+        select(
+            ProductImage.id,
+            (func.row_number().over(order_by=(position, ProductImage.sort_order, ProductImage.id)) - 1).label("sort_order")
+        )
+        .where(ProductImage.product_id == product_id)
+        .subquery("ranked")
+    )
+    result = await session.exec(
+        update(ProductImage)
+        .where(ProductImage.id == ranked.c.id)
+        .values(sort_order=ranked.c.sort_order)
+        .returning(ProductImage.id)
+        .execution_options(synchronize_session=False)
+    )
+    return list(result.scalars())
@@ -0,0 +1,158 @@
+import asyncio
+from collections import Counter
+from datetime import timedelta
+from typing import List, Mapping, Optional
+from uuid import UUID
+from sqlalchemy import delete, func, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.config import get_settings
+from app.db import AsyncSessionLocal
+from app.logging_config.logger import logger
+from app.models.reservation import StockReservation
+from app.services.inventory import InsufficientStock, adjust_reserved, lock_variants, pull_from_shards, release_reservations
+from app.utils.datetime_now import datetime_now
+
+settings = get_settings()
+
+async def reserve_stock(session: AsyncSession, user_id: UUID, quantities: Mapping[UUID, int]) -> List[StockReservation]:
+    """Set the user's reservations on these variants to `quantities` (0 releases) and extend them all.
+
+    Raises VariantUnavailable or InsufficientStock; the caller must then roll back.
+    """
+    variant_ids = sorted(quantities)
+    # Every row of the cart is extended below, so lock them all now: reservations before variants,
+    # the same order the expiry sweep takes them in
+    result = await session.exec(
+        select(StockReservation.variant_id, StockReservation.quantity)
+        .where(StockReservation.user_id == user_id)
+        .order_by(StockReservation.variant_id)
+        .with_for_update()
+    )
+    held = dict(result.all())
+    deltas = {variant_id: quantities[variant_id] - held.get(variant_id, 0) for variant_id in variant_ids}
+
+    rows = await lock_variants(session, variant_ids, off_sale_ok={v for v, delta in deltas.items() if delta <= 0})
+    for variant_id, row in rows.items():
+        shortfall = deltas[variant_id] - (row.stock_quantity - row.reserved_quantity)
+        if row.stock_shards and shortfall > 0:
+            await pull_from_shards(session, variant_id, shortfall)
+    short = await adjust_reserved(session, deltas)
+    if short:
+        raise InsufficientStock(short)
+
+    expires_at = datetime_now() + timedelta(seconds=settings.reservation_ttl_seconds)
+    kept = [(variant_id, quantity) for variant_id, quantity in quantities.items() if quantity > 0]
+    if kept:
+        statement = insert(StockReservation).values([
+            {"user_id": user_id, "variant_id": variant_id, "quantity": quantity, "expires_at": expires_at}
+            for variant_id, quantity in kept
+        ])
+        await session.exec(
+            statement.on_conflict_do_update(
+                index_elements=["user_id", "variant_id"],
+                set_={"quantity": statement.excluded.quantity, "expires_at": statement.excluded.expires_at}
+            )
+        )
+    dropped = [variant_id for variant_id, quantity in quantities.items() if quantity <= 0]
+    if dropped:
+        await session.exec(
+            delete(StockReservation)
+            .where(StockReservation.user_id == user_id, StockReservation.variant_id.in_(dropped))
+            .execution_options(synchronize_session=False)
+        )
+
+    # Any cart activity keeps the whole cart alive
+    result = await session.exec(
+        update(StockReservation)
+        .where(StockReservation.user_id == user_id)
+        .values(expires_at=expires_at)
+        .returning(StockReservation)
+        .execution_options(synchronize_session=False)
+    )
+    return sorted(result.scalars().all(), key=lambda reservation: reservation.variant_id)
+
+async def release_all(session: AsyncSession, user_id: UUID) -> None:
+    """Drop every reservation the user holds and return the stock to sale"""
+    released = await release_reservations(session, user_id)
+    await _unreserve(session, released)
+
+async def expire_reservations(session: AsyncSession, batch_size: int) -> int:
+    """Release one batch of expired reservations; returns how many were released.
+
+    Walks the expires_at index, so each sweep only touches expired rows.
+    Rows locked by a concurrent checkout or cart update are skipped and
+    picked up by a later sweep.
+    """
+    expired = (
+        select(StockReservation.user_id, StockReservation.variant_id)
+        .where(StockReservation.expires_at <= func.now())
+        .order_by(StockReservation.expires_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    result = await session.exec(
+        delete(StockReservation)
+        .where(func.row(StockReservation.user_id, StockReservation.variant_id).in_(expired))
+        .returning(StockReservation.variant_id, StockReservation.quantity)
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    released = Counter()
+    for variant_id, quantity in rows:
+        released[variant_id] += quantity
+    await _unreserve(session, released)
+    return len(rows)
+
+async def _unreserve(session: AsyncSession, released: Mapping[UUID, int]) -> None:
+    if not released:
+        return
+    await lock_variants(session, sorted(released), off_sale_ok=released)
+    await adjust_reserved(session, {variant_id: -quantity for variant_id, quantity in released.items()})
+
+
+class ReservationSweeper:
+    """Background task that releases expired reservations every `interval` seconds"""
+
+    def __init__(self, interval: float, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="reservation-sweeper")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def sweep(self) -> int:
+        """Release expired reservations batch by batch until none are left"""
+        total = 0
+        while True:
+            async with AsyncSessionLocal() as session:
+                released = await expire_reservations(session, self.batch_size)
+                await session.commit()
+            total += released
+            if released < self.batch_size:
+                return total
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                released = await self.sweep()
+                if released:
+                    logger.info(f"Released {released} expired stock reservations")
+            except Exception as e:
+                logger.exception(f"Reservation sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+reservation_sweeper = ReservationSweeper(settings.reservation_sweep_interval_seconds, settings.reservation_sweep_batch_size)
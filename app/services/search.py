@@ -0,0 +1,236 @@
+import math
+import re
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+from sqlalchemy import Text, bindparam, cast, func, literal_column, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.logging_config.logger import logger
+from app.models.product import Product, ProductVariant, ProductSearchDocument
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(value: Optional[str]) -> List[str]:
+    """Split text into lowercase word tokens"""
+    return TOKEN_PATTERN.findall(value.lower()) if value else []
+
+
+class SearchBackend(ABC):
+    """Maintains the product search index and answers ranked queries"""
+
+    @abstractmethod
+    async def index_products(self, session: AsyncSession, product_ids: Iterable[UUID]) -> None:
+        """Rebuild the index entries of `product_ids` from their current rows"""
+
+    @abstractmethod
+    async def search(self, session: AsyncSession, query: str, limit: int) -> List[Tuple[UUID, float]]:
+        """Return up to `limit` (product_id, score) pairs, best match first"""
+
+
+class PostgresSearchBackend(SearchBackend):
+    """Full-text search over product_search_document.
+
+    Terms are matched as prefixes against a GIN-indexed tsvector. When the
+    pg_trgm extension is installed, word similarity on the raw document adds
+    typo tolerance.
+    """
+
+    def __init__(self):
+        self._has_trigram: Optional[bool] = None
+
+    async def index_products(self, session: AsyncSession, product_ids: Iterable[UUID]) -> None:
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+
+        variant_text = func.concat_ws(
+            " ",
+            ProductVariant.sku,
+            cast(func.jsonb_path_query_array(ProductVariant.attributes, literal_column("'$.*'")), Text)
+        )
+        documents = (
+            select(
+                Product.id,
+                func.concat_ws(" ", Product.name, Product.description, func.string_agg(variant_text, " "))
+            )
+            .outerjoin(ProductVariant, ProductVariant.product_id == Product.id)
+            .where(Product.id.in_(product_ids))
+            .group_by(Product.id)
+        )
+        statement = insert(ProductSearchDocument).from_select(["product_id", "document"], documents)
+        await session.exec(
+            statement.on_conflict_do_update(
+                index_elements=["product_id"],
+                set_={"document": statement.excluded.document}
+            )
+        )
+
+    async def search(self, session: AsyncSession, query: str, limit: int) -> List[Tuple[UUID, float]]:
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        raw_query = bindparam("raw_query", " ".join(terms))
+        vector = func.to_tsvector(literal_column("'simple'"), ProductSearchDocument.document)
+        prefix_query = func.to_tsquery(literal_column("'simple'"), bindparam("prefix_query", " & ".join(f"{t}:*" for t in terms)))
+        # Whole-word matches rank above matches on a longer word sharing the prefix
+        exact_query = func.plainto_tsquery(literal_column("'simple'"), raw_query)
+        score = func.ts_rank_cd(vector, prefix_query) + func.ts_rank_cd(vector, exact_query)
+        condition = vector.op("@@")(prefix_query)
+
+        if await self._trigram_available(session):
+            score = score + func.word_similarity(raw_query, ProductSearchDocument.document)
+            condition = condition | raw_query.op("<%")(ProductSearchDocument.document)
+
+        result = await session.exec(
+            select(ProductSearchDocument.product_id, score.label("score"))
+            .where(condition)
+            .order_by(literal_column("score").desc(), ProductSearchDocument.product_id)
+            .limit(limit)
+        )
+        return [(product_id, float(rank)) for product_id, rank in result.all()]
+
+    async def _trigram_available(self, session: AsyncSession) -> bool:
+        if self._has_trigram is None:
+            result = await session.exec(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"))
+            self._has_trigram = result.first() is not None
+        return self._has_trigram
+
+
+class InMemorySearchBackend(SearchBackend):
+    """In-process inverted index used where PostgreSQL full-text search is unavailable (e.g. SQLite test runs).
+
+    Query terms match exact tokens, token prefixes and, for terms of four or
+    more characters, tokens within one edit.
+    """
+
+    EXACT_WEIGHT = 1.0
+    PREFIX_WEIGHT = 0.7
+    FUZZY_WEIGHT = 0.4
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[UUID, int]] = defaultdict(dict)
+        self._documents: Dict[UUID, Set[str]] = {}
+        self._vocabulary: List[str] = []
+        self._vocabulary_dirty = False
+
+    async def index_products(self, session: AsyncSession, product_ids: Iterable[UUID]) -> None:
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+
+        result = await session.exec(
+            select(Product).where(Product.id.in_(product_ids)).options(selectinload(Product.variants))
+        )
+        products = {product.id: product for product in result.all()}
+        for product_id in product_ids:
+            self._remove(product_id)
+            product = products.get(product_id)
+            if product is not None:
+                self._add(product_id, self._document_tokens(product))
+
+    async def search(self, session: AsyncSession, query: str, limit: int) -> List[Tuple[UUID, float]]:
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        total = max(len(self._documents), 1)
+        scores: Dict[UUID, float] = defaultdict(float)
+        for term in terms:
+            for token, weight in self._expand(term):
+                postings = self._postings.get(token, {})
+                idf = math.log(1 + total / len(postings)) if postings else 0.0
+                for product_id, frequency in postings.items():
+                    scores[product_id] += weight * idf * (1 + math.log(frequency))
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], str(item[0])))
+        return ranked[:limit]
+
+    @staticmethod
+    def _document_tokens(product: Product) -> List[str]:
+        tokens = tokenize(product.name) + tokenize(product.description)
+        for variant in product.variants:
+            tokens += tokenize(variant.sku)
+            for value in (variant.attributes or {}).values():
+                tokens += tokenize(str(value))
+        return tokens
+
+    def _add(self, product_id: UUID, tokens: List[str]) -> None:
+        for token in tokens:
+            postings = self._postings[token]
+            postings[product_id] = postings.get(product_id, 0) + 1
+        self._documents[product_id] = set(tokens)
+        self._vocabulary_dirty = True
+
+    def _remove(self, product_id: UUID) -> None:
+        for token in self._documents.pop(product_id, ()):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(product_id, None)
+                if not postings:
+                    del self._postings[token]
+        self._vocabulary_dirty = True
+
+    def _expand(self, term: str) -> List[Tuple[str, float]]:
+        """Map a query term to the indexed tokens it matches and their weights"""
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+
+        matches = {}
+        if term in self._postings:
+            matches[term] = self.EXACT_WEIGHT
+
+        start = bisect_left(self._vocabulary, term)
+        for token in self._vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            matches.setdefault(token, self.PREFIX_WEIGHT)
+
+        if len(term) >= 4:
+            for token in self._vocabulary:
+                if token not in matches and abs(len(token) - len(term)) <= 1 and _within_one_edit(term, token):
+                    matches[token] = self.FUZZY_WEIGHT
+        return list(matches.items())
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """True if `a` and `b` differ by at most one insertion, deletion, substitution or transposition"""
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:] or (a[i:i + 2] == b[i:i + 2][::-1] and a[i + 2:] == b[i + 2:])
+    return a[i:] == b[i + 1:]
+
+
+postgres_search_backend = PostgresSearchBackend()
+in_memory_search_backend = InMemorySearchBackend()
+
+def get_search_backend(session: AsyncSession) -> SearchBackend:
+    """Pick the search backend matching the session's database"""
+    if session.bind.dialect.name == "postgresql":
+        return postgres_search_backend
+    return in_memory_search_backend
+
+async def setup_search_indexes(conn: AsyncConnection) -> None:
+    """Create the optional trigram index that enables typo-tolerant search"""
+    if conn.dialect.name != "postgresql":
+        return
+    try:
+        async with conn.begin_nested():
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            await conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_product_search_document_trgm "
+                "ON product_search_document USING gin (document gin_trgm_ops)"
+            ))
+    except Exception as e:
+        logger.warning(f"pg_trgm unavailable, product search will not be typo tolerant: {e}")
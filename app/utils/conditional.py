@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+from fastapi import Request
+from app.config import get_settings
+
+settings = get_settings()
+
+def make_etag(*parts) -> str:
+    """Weak entity tag from the versions a representation was built from.
+
+    Weak because it is derived from those sources rather than from the
+    serialized bytes.
+    """
+    return 'W/"' + ".".join(str(part) for part in parts) + '"'
+
+def cache_headers(route: str, etag: str, last_modified: Optional[datetime]) -> Dict[str, str]:
+    """Validators plus the Cache-Control configured for `route`"""
+    headers = {"ETag": etag, "Cache-Control": settings.cache_control.get(route, "no-cache")}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """Whether the client's copy is current, so a 304 can be sent instead of the body.
+
+    If-None-Match wins over If-Modified-Since when both are sent.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # GET uses weak comparison: W/"x" and "x" match
+        return etag.removeprefix("W/") in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have whole-second precision
+    return last_modified.replace(microsecond=0) <= since
@@ -0,0 +1,236 @@
+import csv
+import io
+import zlib
+from datetime import datetime
+from enum import Enum
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Mapping, Optional, Sequence
+from uuid import UUID
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import types
+from sqlalchemy.sql import Select
+from app.db import open_read_session
+from app.utils.json_response import dumps
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional; only needed for Parquet exports
+    pa = pq = None
+
+# Flush to the client once this much output has accumulated
+CHUNK_SIZE = 64 * 1024
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 1000
+
+# Rows per Parquet row group; each group is encoded and sent as it fills
+PARQUET_ROW_GROUP_SIZE = 10000
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+    PARQUET = "parquet"
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.CSV: "text/csv",
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+}
+
+class RecordStream:
+    """The rows of a SELECT as mappings, plus the SQL type of each selected column"""
+
+    def __init__(self, statement: Select):
+        self.statement = statement
+        self.column_types: Dict[str, types.TypeEngine] = {
+            column.key: column.type for column in statement.selected_columns
+        }
+
+    def __aiter__(self) -> AsyncIterator[Mapping[str, Any]]:
+        return self._rows()
+
+    async def _rows(self) -> AsyncIterator[Mapping[str, Any]]:
+        async with open_read_session() as session:
+            result = await session.stream(self.statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            async for row in result.mappings():
+                yield row
+
+def stream_records(statement: Select) -> RecordStream:
+    """Run `statement` on its own session through a server-side cursor.
+
+    Memory stays flat however many rows match, and the stream outlives the
+    request's session. Exports read from a replica when one is available,
+    unless the client wrote recently (see ReadYourWritesMiddleware).
+    """
+    return RecordStream(statement)
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return "" if value is None else value
+
+async def encode_records(
+    records: AsyncIterable[Mapping[str, Any]],
+    export_format: ExportFormat,
+    columns: Sequence[str],
+    schema: Optional["pa.Schema"] = None
+) -> AsyncIterator[bytes]:
+    """Encode records as CSV (with a header row), NDJSON or Parquet, in chunks of about CHUNK_SIZE bytes.
+
+    Parquet needs the `schema` of the columns (see parquet_schema). Only the
+    current chunk is held in memory, however many records there are.
+    """
+    if export_format == ExportFormat.PARQUET:
+        async for chunk in _encode_parquet(records, schema):
+            yield chunk
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    chunk = bytearray()
+
+    if export_format == ExportFormat.CSV:
+        writer.writerow(columns)
+        chunk += buffer.getvalue().encode()
+
+    async for record in records:
+        if export_format == ExportFormat.CSV:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerow([_csv_value(record[column]) for column in columns])
+            chunk += buffer.getvalue().encode()
+        else:
+            chunk += dumps({column: record[column] for column in columns})
+            chunk += b"\n"
+
+        if len(chunk) >= CHUNK_SIZE:
+            yield bytes(chunk)
+            chunk.clear()
+
+    if chunk:
+        yield bytes(chunk)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back what was written since the last take()"""
+
+    def __init__(self):
+        self._data = bytearray()
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._data += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data = bytes(self._data)
+        self._data.clear()
+        return data
+
+def _parquet_value(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, (dict, list)):
+        return dumps(value).decode()
+    return value
+
+def _arrow_type(sql_type: types.TypeEngine) -> "pa.DataType":
+    if isinstance(sql_type, types.TypeDecorator):
+        sql_type = sql_type.impl_instance
+    # Checked in this order: enums are strings, UUID columns may be emulated, floats are numerics
+    if isinstance(sql_type, (types.Enum, types.Uuid, types.String, types.JSON, types.ARRAY)):
+        # Enums and UUIDs are written as text, JSON and arrays as JSON text
+        return pa.string()
+    if isinstance(sql_type, types.Boolean):
+        return pa.bool_()
+    if isinstance(sql_type, types.Integer):
+        return pa.int64()
+    if isinstance(sql_type, types.Float):
+        return pa.float64()
+    if isinstance(sql_type, types.Numeric) and sql_type.scale is not None:
+        return pa.decimal128(38, sql_type.scale)
+    if isinstance(sql_type, types.DateTime):
+        return pa.timestamp("us", tz="UTC" if sql_type.timezone else None)
+    if isinstance(sql_type, types.Date):
+        return pa.date32()
+    raise TypeError(f"No Parquet type for SQL type {sql_type!r}")
+
+def parquet_schema(columns: Sequence[str], column_types: Mapping[str, types.TypeEngine]) -> "pa.Schema":
+    """Arrow schema of `columns` from their SQL types.
+
+    Declared up front rather than inferred from rows, so a column that is
+    null for the first row group still gets its real type. Raises TypeError
+    for a type with no Parquet equivalent.
+    """
+    return pa.schema([(column, _arrow_type(column_types[column])) for column in columns])
+
+async def _encode_parquet(records: AsyncIterable[Mapping[str, Any]], schema: "pa.Schema") -> AsyncIterator[bytes]:
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    rows: List[Dict[str, Any]] = []
+
+    async for record in records:
+        rows.append({column: _parquet_value(record[column]) for column in schema.names})
+        if len(rows) >= PARQUET_ROW_GROUP_SIZE:
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            rows.clear()
+            yield sink.take()
+
+    if rows:
+        writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+    writer.close()
+    yield sink.take()
+
+async def gzip_chunks(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """Compress a byte stream into a single gzip member, chunk by chunk"""
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def export_response(
+    records: AsyncIterable[Mapping[str, Any]],
+    export_format: ExportFormat,
+    columns: Sequence[str],
+    name: str,
+    compress: bool = False,
+    column_types: Optional[Mapping[str, types.TypeEngine]] = None
+) -> StreamingResponse:
+    """Stream records as a file download named `name`.<format>[.gz]
+
+    Parquet needs the SQL type of each column: `column_types`, or those of
+    the SELECT when `records` come from stream_records.
+    """
+    schema = None
+    if export_format == ExportFormat.PARQUET:
+        if pq is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Parquet export is not available on this server")
+        # Built before the response starts, so a type problem is an error rather than a truncated file
+        schema = parquet_schema(columns, column_types if column_types is not None else records.column_types)
+
+    body = encode_records(records, export_format, columns, schema)
+    filename = f"{name}.{export_format.value}"
+    media_type = EXPORT_MEDIA_TYPES[export_format]
+    if compress:
+        body = gzip_chunks(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,40 @@
+from decimal import Decimal
+from typing import Any
+from uuid import UUID
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+try:
+    import orjson
+except ImportError:  # optional speedup; pydantic_core is always available
+    orjson = None
+
+def _default(value: Any) -> Any:
+    # UUID subclasses such as asyncpg's are not handled natively by orjson
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact JSON bytes; UUID, datetime and Decimal (as a string) are handled natively"""
+    if isinstance(content, BaseModel):
+        return content.__pydantic_serializer__.to_json(content)
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return to_json(content)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that skips jsonable_encoder.
+
+    Returning one from an endpoint also skips FastAPI's re-validation
+    against `response_model`, so pass content that is already a validated
+    model (or plain JSON-able data). The decorator's `response_model` still
+    documents the schema.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
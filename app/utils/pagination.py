@@ -0,0 +1,48 @@
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Tuple
+from uuid import UUID
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+_DECODERS: dict[type, Callable[[Any], Any]] = {
+    datetime: datetime.fromisoformat,
+    UUID: UUID,
+    Decimal: Decimal,
+    str: str,
+    int: int,
+}
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    return value
+
+def encode_cursor(*values: Any) -> str:
+    """Encode the sort key of the last row of a page into an opaque cursor"""
+    payload = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, *types: type) -> Tuple[Any, ...]:
+    """Decode a cursor produced by `encode_cursor` back into typed values.
+
+    Raises ValueError if the cursor is malformed or does not match `types`.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError("Invalid cursor")
+
+    try:
+        return tuple(_DECODERS[t](v) for t, v in zip(types, values))
+    except (ValueError, TypeError, ArithmeticError) as e:
+        raise ValueError("Invalid cursor") from e
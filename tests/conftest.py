@@ -0,0 +1,7 @@
+import os
+
+# Settings the app requires at import; nothing in the tests connects with them
+os.environ.setdefault("ENVIRONMENT", "test")
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://localhost/test")
+os.environ.setdefault("SYNC_DATABASE_URL", "postgresql://localhost/test")
+os.environ.setdefault("SECRET_KEY", "test")
@@ -0,0 +1,159 @@
+import asyncio
+from types import SimpleNamespace
+from typing import List, Tuple
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+from sqlalchemy.exc import OperationalError
+from app.security import rate_limit
+from app.security.rate_limit import (
+    LocalBackend, RateLimit, RateLimitBackend, RateLimitHeadersMiddleware, RateLimitPolicy, RateLimiter
+)
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+class SharedBackend(LocalBackend):
+    """LocalBackend posing as a shared one, recording the size of every take"""
+
+    shared = True
+
+    def __init__(self):
+        super().__init__()
+        self.takes: List[int] = []
+
+    async def take(self, policy: RateLimitPolicy, key: str, tokens: int) -> Tuple[int, float]:
+        self.takes.append(tokens)
+        return await super().take(policy, key, tokens)
+
+class FailingBackend(RateLimitBackend):
+    shared = True
+
+    async def take(self, policy: RateLimitPolicy, key: str, tokens: int) -> Tuple[int, float]:
+        raise OperationalError("UPSERT", {}, Exception("connection refused"))
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+def hits(limiter: RateLimiter, policy: RateLimitPolicy, count: int, key: str = "caller"):
+    async def run():
+        return [await limiter.hit(policy, key) for _ in range(count)]
+    return asyncio.run(run())
+
+def test_local_backend_allows_the_limit_then_denies(clock):
+    policy = RateLimitPolicy.parse("test", "3/minute")
+    limiter = RateLimiter(LocalBackend())
+    states = hits(limiter, policy, 5)
+
+    assert [state.allowed for state in states] == [True, True, True, False, False]
+    assert [state.remaining for state in states] == [2, 1, 0, 0, 0]
+    assert [state.reset_after for state in states[:3]] == [20.0, 40.0, 60.0]
+    assert states[3].retry_after == 20.0
+    assert (limiter.allowed, limiter.denied) == (3, 2)
+
+    # One token refills every 20 seconds
+    clock.now += 20
+    assert [state.allowed for state in hits(limiter, policy, 2)] == [True, False]
+
+def test_keys_and_policies_have_separate_buckets(clock):
+    login = RateLimitPolicy.parse("login", "1/minute")
+    catalog = RateLimitPolicy.parse("catalog", "1/minute")
+    limiter = RateLimiter(LocalBackend())
+    assert hits(limiter, login, 1, "a")[0].allowed
+    assert hits(limiter, login, 1, "b")[0].allowed
+    assert hits(limiter, catalog, 1, "a")[0].allowed
+    assert not hits(limiter, login, 1, "a")[0].allowed
+
+def test_shared_backend_never_allows_more_than_the_limit(clock):
+    policy = RateLimitPolicy.parse("test", "50/minute")
+    backend = SharedBackend()
+    limiter = RateLimiter(backend)
+    states = hits(limiter, policy, 60)
+
+    assert sum(state.allowed for state in states) == 50
+    assert limiter.backend_calls < 50
+    assert all(not state.allowed for state in states[50:])
+
+def test_lease_doubles_while_used_up_and_is_capped(clock):
+    # The cap is MAX_LEASE_FRACTION of the limit: 10 tokens
+    policy = RateLimitPolicy.parse("test", "100/second")
+    backend = SharedBackend()
+    limiter = RateLimiter(backend)
+    states = hits(limiter, policy, 1 + 2 + 4 + 8 + 10 + 10)
+
+    assert all(state.allowed for state in states)
+    assert backend.takes == [1, 2, 4, 8, 10, 10]
+    assert limiter.backend_calls == 6
+
+def test_lease_drops_back_to_one_token_after_expiring(clock):
+    policy = RateLimitPolicy.parse("test", "100/second")
+    backend = SharedBackend()
+    limiter = RateLimiter(backend)
+    hits(limiter, policy, 1 + 2 + 4)
+    assert backend.takes == [1, 2, 4]
+
+    clock.now += RateLimiter.LEASE_SECONDS
+    hits(limiter, policy, 1)
+    assert backend.takes == [1, 2, 4, 1]
+
+def test_denial_is_remembered_until_the_next_token_is_due(clock):
+    policy = RateLimitPolicy.parse("test", "2/minute")
+    backend = SharedBackend()
+    limiter = RateLimiter(backend)
+    states = hits(limiter, policy, 5)
+    calls = limiter.backend_calls
+
+    assert [state.allowed for state in states] == [True, True, False, False, False]
+    # Two grants, then the first denial; the later ones never reached the backend
+    assert backend.takes == [1, 1, 1] and calls == 3
+    assert states[2].retry_after == 30.0
+    clock.now += 10
+    denied = hits(limiter, policy, 1)[0]
+    assert not denied.allowed and denied.retry_after == 20.0
+    assert limiter.backend_calls == calls
+
+    clock.now += 20
+    assert hits(limiter, policy, 1)[0].allowed
+    assert limiter.backend_calls == calls + 1
+
+def test_backend_failure_lets_the_request_through(clock):
+    policy = RateLimitPolicy.parse("test", "1/minute")
+    limiter = RateLimiter(FailingBackend())
+    states = hits(limiter, policy, 3)
+
+    assert all(state.allowed for state in states)
+    assert limiter.backend_errors == 3
+    assert states[0].remaining == policy.limit
+
+def test_headers_describe_the_limit(clock, monkeypatch):
+    policy = RateLimitPolicy.parse("test", "2/minute")
+    monkeypatch.setattr(rate_limit, "rate_limiter", RateLimiter(LocalBackend()))
+    monkeypatch.setattr(rate_limit.settings, "rate_limit_enabled", True)
+
+    app = FastAPI()
+    app.add_middleware(RateLimitHeadersMiddleware)
+
+    @app.get("/limited", dependencies=[Depends(RateLimit(policy))])
+    async def limited():
+        return {}
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.get("/limited") for _ in range(3)]
+    first, second, denied = asyncio.run(run())
+
+    assert [response.status_code for response in (first, second, denied)] == [200, 200, 429]
+    assert first.headers["ratelimit-limit"] == "2"
+    assert first.headers["ratelimit-policy"] == "2;w=60"
+    assert [response.headers["ratelimit-remaining"] for response in (first, second, denied)] == ["1", "0", "0"]
+    assert [response.headers["ratelimit-reset"] for response in (first, second, denied)] == ["30", "60", "60"]
+    assert "retry-after" not in first.headers
+    assert denied.headers["retry-after"] == "30"
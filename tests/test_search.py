@@ -0,0 +1,65 @@
+import asyncio
+from decimal import Decimal
+from uuid import uuid4
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+import app.models  # noqa: F401 - registers every table on the metadata
+from app.models.product import Product, ProductVariant
+from app.schemas.product_schema import ProductStatus
+from app.services.search import InMemorySearchBackend, get_search_backend, in_memory_search_backend
+
+CATALOG = {
+    "headphones": ("Wireless Headphones", "Over-ear, noise cancelling", [("HP-100", {"color": "black"})]),
+    "headset": ("Gaming Headset", "With microphone", [("HS-200", {"color": "red"})]),
+    "keyboard": ("Mechanical Keyboard", "Brown switches", [("KB-300", {"layout": "iso"})]),
+    "strap": ("Head Strap", "Adjustable", []),
+}
+
+async def _run(queries):
+    """Create the whole schema on SQLite, index CATALOG with the fallback backend and run `queries`"""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    names = {}
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        for name, description, variants in CATALOG.values():
+            product = Product(id=uuid4(), name=name, description=description, base_price=Decimal("10"), status=ProductStatus.ACTIVE)
+            session.add(product)
+            for sku, attributes in variants:
+                session.add(ProductVariant(id=uuid4(), product_id=product.id, sku=sku, attributes=attributes))
+            names[product.id] = name
+        await session.commit()
+
+        backend = get_search_backend(session)
+        assert backend is in_memory_search_backend
+        # A fresh index, so tests don't share state through the module-level one
+        backend = InMemorySearchBackend()
+        await backend.index_products(session, list(names))
+        results = [[names[product_id] for product_id, _ in await backend.search(session, query, 10)] for query in queries]
+    await engine.dispose()
+    return results
+
+def test_prefix_queries_match_the_start_of_words():
+    hea, switch, sku = asyncio.run(_run(["hea", "switch", "kb"]))
+    assert sorted(hea) == ["Gaming Headset", "Head Strap", "Wireless Headphones"]
+    assert switch == ["Mechanical Keyboard"]
+    assert sku == ["Mechanical Keyboard"]
+
+def test_typos_within_one_edit_still_match():
+    substituted, transposed, dropped = asyncio.run(_run(["headphonez", "keybaord", "mechanicl"]))
+    assert substituted == ["Wireless Headphones"]
+    assert transposed == ["Mechanical Keyboard"]
+    assert dropped == ["Mechanical Keyboard"]
+
+def test_exact_words_rank_above_prefixes():
+    (head,) = asyncio.run(_run(["head"]))
+    assert head[0] == "Head Strap"
+    assert sorted(head[1:]) == ["Gaming Headset", "Wireless Headphones"]
+
+def test_short_terms_are_not_fuzzy_and_unknown_terms_match_nothing():
+    short, unknown, empty = asyncio.run(_run(["kex", "toaster", "  "]))
+    assert short == []
+    assert unknown == []
+    assert empty == []